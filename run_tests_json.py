@@ -1,45 +1,99 @@
+import argparse
 import json
 import os
 import sys
+import time
 import unittest
+import zlib
 from pathlib import Path
 
 import django
 from django.conf import settings
-from django.test.runner import DiscoverRunner
+from django.test.runner import (
+    DiscoverRunner,
+    ParallelTestSuite,
+    RemoteTestResult,
+    RemoteTestRunner,
+    get_max_test_processes,
+    iter_test_cases,
+    parallel_type,
+)
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "todo.settings")
 django.setup()
 
+DEFAULT_OUTPUT = "result_test_auto.json"
+
+
+def get_test_case_id(test):
+    """Identifiant TCxxx posé par le décorateur ``tc`` (ou None)."""
+    # On récupère d'abord l'ID éventuel sur l'instance de test
+    test_case_id = getattr(test, "test_case_id", None)
+
+    # Si rien sur l'instance, on va chercher sur la méthode de test
+    if test_case_id is None:
+        method_name = getattr(test, "_testMethodName", None)
+        if method_name and hasattr(test, method_name):
+            method = getattr(test, method_name)
+            test_case_id = getattr(method, "test_case_id", None)
+    return test_case_id
+
+
+def shard_of(test, shard_count: int) -> int:
+    """
+    Shard (0..shard_count-1) d'un test, stable d'une machine et d'une
+    exécution à l'autre : crc32 de l'identifiant TCxxx, ou du nom complet
+    du test s'il n'en a pas (hash() est aléatoire par processus).
+    """
+    key = get_test_case_id(test) or test.id()
+    return zlib.crc32(key.encode("utf-8")) % shard_count
+
 
 class JsonTestResult(unittest.TextTestResult):
     """
     TestResult personnalisé qui enregistre le résultat des tests
     et peut les exporter en JSON (result_test_auto.json).
+
+    En mode parallèle, les événements des processus fils sont rejoués sur
+    ce résultat (voir ParallelTestSuite.run) : la durée de chaque test
+    arrive alors par l'événement ``addDuration`` mesuré dans le fils.
     """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.json_results = []
+        self._started_at = None
+        self._pending = []
 
     def _record(self, test, status):
-        # On récupère d'abord l'ID éventuel sur l'instance de test
-        test_case_id = getattr(test, "test_case_id", None)
-
-        # Si rien sur l'instance, on va chercher sur la méthode de test
-        if test_case_id is None:
-            method_name = getattr(test, "_testMethodName", None)
-            if method_name and hasattr(test, method_name):
-                method = getattr(test, method_name)
-                test_case_id = getattr(method, "test_case_id", None)
-
-        self.json_results.append(
-            {
-                "test_case_id": test_case_id,
-                "test_name": self.getDescription(test),
-                "status": status,
-            }
-        )
+        entry = {
+            "test_case_id": get_test_case_id(test),
+            "test_name": self.getDescription(test),
+            "status": status,
+            "duration": None,
+        }
+        self.json_results.append(entry)
+        self._pending.append(entry)
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._started_at = time.perf_counter()
+        self._pending = []
+
+    def addDuration(self, test, elapsed):
+        # Appelé par unittest (Python >= 3.12) ou rejoué depuis un fils
+        parent = getattr(super(), "addDuration", None)
+        if parent is not None:
+            parent(test, elapsed)
+        for entry in self._pending:
+            entry["duration"] = round(elapsed, 4)
+        self._pending = []
+
+    def stopTest(self, test):
+        if self._pending and self._started_at is not None:
+            self.addDuration(test, time.perf_counter() - self._started_at)
+        self._started_at = None
+        super().stopTest(test)
 
     def addSuccess(self, test):
         super().addSuccess(test)
@@ -62,12 +116,87 @@ class JsonTestResult(unittest.TextTestResult):
             json.dump(self.json_results, f, indent=2, ensure_ascii=False)
 
 
+class RemoteTestFailure(Exception):
+    """Erreur d'un processus fils, transmise sous forme de texte."""
+
+
+class JsonRemoteTestResult(RemoteTestResult):
+    """
+    Résultat des processus fils : ajoute aux événements renvoyés au parent
+    la durée mesurée de chaque test, juste avant ``stopTest``.
+
+    Sans tblib les tracebacks ne se picklent pas : l'erreur est alors
+    renvoyée déjà formatée, pour qu'un test en échec reste un échec dans
+    le JSON au lieu d'arrêter toute l'exécution.
+    """
+
+    def _portable(self, test, err):
+        try:
+            self._confirm_picklable(err)
+        except Exception:
+            # RemoteTestResult neutralise _exc_info_to_string
+            text = unittest.TestResult._exc_info_to_string(self, err, test)
+            return (RemoteTestFailure, RemoteTestFailure(text), None)
+        return err
+
+    def addError(self, test, err):
+        super().addError(test, self._portable(test, err))
+
+    def addFailure(self, test, err):
+        super().addFailure(test, self._portable(test, err))
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._started_at = time.perf_counter()
+
+    def stopTest(self, test):
+        elapsed = time.perf_counter() - self._started_at
+        self.events.append(("addDuration", self.test_index, elapsed))
+        super().stopTest(test)
+
+
+class JsonRemoteTestRunner(RemoteTestRunner):
+    resultclass = JsonRemoteTestResult
+
+
+class JsonParallelTestSuite(ParallelTestSuite):
+    runner_class = JsonRemoteTestRunner
+
+
 class JsonDiscoverRunner(DiscoverRunner):
     """
     Test runner Django custom qui utilise JsonTestResult
     et génère le fichier result_test_auto.json.
+
+    - ``parallel`` : nombre de processus (un sous-ensemble par TestCase,
+      comme ``manage.py test --parallel``), résultats fusionnés dans le
+      même fichier JSON ;
+    - ``shard_index`` / ``shard_count`` : ne garde que les tests de ce
+      shard, pour répartir la suite sur plusieurs nœuds de CI.
     """
 
+    parallel_test_suite = JsonParallelTestSuite
+
+    def __init__(self, shard_index=0, shard_count=1, output=DEFAULT_OUTPUT, **kwargs):
+        super().__init__(**kwargs)
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(
+                f"shard_index doit être compris entre 0 et {shard_count - 1}"
+            )
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.output = output
+
+    def load_tests_for_label(self, label, discover_kwargs):
+        tests = super().load_tests_for_label(label, discover_kwargs)
+        if self.shard_count == 1:
+            return tests
+        return unittest.TestSuite(
+            test
+            for test in iter_test_cases(tests)
+            if shard_of(test, self.shard_count) == self.shard_index
+        )
+
     def run_suite(self, suite, **kwargs):
         test_runner = unittest.TextTestRunner(
             verbosity=self.verbosity,
@@ -78,18 +207,59 @@ class JsonDiscoverRunner(DiscoverRunner):
         result: JsonTestResult = test_runner.run(suite)
 
         # Fichier JSON de sortie à la racine du projet
-        output_path = Path(settings.BASE_DIR) / "result_test_auto.json"
+        output_path = Path(settings.BASE_DIR) / self.output
         result.write_json(output_path)
         print(f"\n📄 Résultats JSON écrits dans {output_path}")
 
         return result
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Lance les tests de l'app tasks et écrit leurs résultats en JSON."
+    )
+    parser.add_argument(
+        "--parallel",
+        type=parallel_type,
+        default=int(os.environ.get("TEST_PARALLEL", 1)),
+        help="Nombre de processus, ou 'auto' (un par cœur).",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=int(os.environ.get("TEST_SHARD_INDEX", 0)),
+        help="Index (à partir de 0) du shard à exécuter sur ce nœud.",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=int(os.environ.get("TEST_SHARD_COUNT", 1)),
+        help="Nombre total de shards.",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help="Fichier JSON de sortie, relatif à la racine du projet.",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    parallel = args.parallel
+    if parallel == "auto":
+        parallel = get_max_test_processes()
+
     # On ne lance que les tests de l'app tasks
     test_labels = ["tasks"]
 
-    runner = JsonDiscoverRunner(verbosity=1)
+    runner = JsonDiscoverRunner(
+        verbosity=1,
+        parallel=parallel,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+        output=args.output,
+    )
     failures = runner.run_tests(test_labels)
 
     sys.exit(bool(failures))
@@ -1,20 +1,53 @@
-import json
-import time
+"""
+Tests E2E Selenium de la todo-list.
+
+Lancement : ``python selenium_e2e_test.py [--parallel N]``
+
+- le serveur Django est démarré par les tests eux-mêmes
+  (StaticLiveServerTestCase, base de test dédiée) : inutile de lancer
+  ``runserver`` avant ;
+- les sessions Chrome (headless par défaut, ``E2E_HEADLESS=0`` pour voir
+  le navigateur) sont gardées dans un pool et réutilisées d'une classe de
+  test à l'autre au lieu d'être relancées à chaque test ;
+- les pauses fixes sont remplacées par des attentes explicites ;
+- avec ``--parallel``, chaque classe de test peut tourner dans son propre
+  processus (son serveur, sa base et ses navigateurs) ;
+- le driver est cherché dans ``CHROMEDRIVER`` puis dans le PATH, et
+  webdriver-manager n'est utilisé qu'en dernier recours (hors ligne, un
+  chromedriver installé localement suffit).
+
+Les résultats sont écrits dans result_test_selenium.json.
+"""
+import argparse
+import os
+import queue
+import shutil
+import sys
 import unittest
+from functools import lru_cache
+from multiprocessing import util as mp_util
 from pathlib import Path
 
+# Import en premier : configure Django (django.setup())
+from run_tests_json import JsonDiscoverRunner, get_max_test_processes, parallel_type
+
+from django.contrib.staticfiles.testing import StaticLiveServerTestCase
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support.ui import WebDriverWait
 
+from tasks.cache import get_cache
 
-BASE_URL = "http://127.0.0.1:8000/"
 RESULT_PATH = Path(__file__).resolve().parent / "result_test_selenium.json"
 
+# Délai maximal des attentes explicites (secondes)
+WAIT_TIMEOUT = float(os.environ.get("E2E_WAIT_TIMEOUT", 5))
+HEADLESS = os.environ.get("E2E_HEADLESS", "1") != "0"
+
 
 def tc(test_id: str):
     """
@@ -29,69 +62,100 @@ def tc(test_id: str):
     return decorator
 
 
-class JsonSeleniumResult(unittest.TextTestResult):
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """Chemin du chromedriver, ou None pour laisser Selenium le trouver."""
+    path = os.environ.get("CHROMEDRIVER") or shutil.which("chromedriver")
+    if path:
+        return path
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        return ChromeDriverManager().install()
+    except Exception:
+        # webdriver-manager absent ou pas de réseau
+        return None
+
+
+def new_driver():
+    options = webdriver.ChromeOptions()
+    if HEADLESS:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,1024")
+    options.add_argument("--disable-dev-shm-usage")
+    service = Service(executable_path=chromedriver_path())
+    return webdriver.Chrome(service=service, options=options)
+
+
+class BrowserPool:
     """
-    Résultat de tests Selenium qui garde les infos dans une liste
-    et peut les écrire dans result_test_selenium.json.
+    Sessions Chrome du processus courant, créées à la demande et rendues au
+    pool (cookies effacés) en fin de classe de test. Elles sont fermées à
+    la sortie du processus, y compris dans les workers de --parallel.
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.json_results = []
-
-    def _record(self, test, status):
-        test_case_id = getattr(test, "test_case_id", None)
-
-        if test_case_id is None:
-            method_name = getattr(test, "_testMethodName", None)
-            if method_name and hasattr(test, method_name):
-                method = getattr(test, method_name)
-                test_case_id = getattr(method, "test_case_id", None)
-
-        self.json_results.append(
-            {
-                "test_case_id": test_case_id,
-                "test_name": self.getDescription(test),
-                "status": status,
-            }
-        )
+    def __init__(self):
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        driver = new_driver()
+        if not self._drivers:
+            # Les finaliseurs sont exécutés aussi à la sortie des workers
+            mp_util.Finalize(self, BrowserPool.close, args=(self,), exitpriority=10)
+        self._drivers.append(driver)
+        return driver
+
+    def release(self, driver):
+        try:
+            driver.delete_all_cookies()
+        except WebDriverException:
+            # Session morte : on ne la remet pas dans le pool
+            self._drivers.remove(driver)
+            return
+        self._idle.put(driver)
 
-    def addSuccess(self, test):
-        super().addSuccess(test)
-        self._record(test, "passed")
+    def close(self):
+        for driver in self._drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+        self._drivers = []
+        self._idle = queue.LifoQueue()
 
-    def addFailure(self, test, err):
-        super().addFailure(test, err)
-        self._record(test, "failed")
 
-    def addError(self, test, err):
-        super().addError(test, err)
-        self._record(test, "error")
+browsers = BrowserPool()
 
-    def addSkip(self, test, reason):
-        super().addSkip(test, reason)
-        self._record(test, "skipped")
 
-    def write_json(self, path: Path):
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(self.json_results, f, indent=2, ensure_ascii=False)
+class TodoListE2ETestCase(StaticLiveServerTestCase):
+    """Base des tests E2E : navigateur du pool et actions sur la liste."""
 
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.driver = browsers.acquire()
+        except WebDriverException as exc:
+            raise unittest.SkipTest(f"Navigateur indisponible : {exc.msg}")
+        super().setUpClass()
 
-class TodoListE2ETest(unittest.TestCase):
-    def setUp(self):
-        print("✅ setUp: lancement du navigateur")
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service)
-        self.driver.maximize_window()
-        self.wait = WebDriverWait(self.driver, 5)
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        browsers.release(cls.driver)
 
-    def tearDown(self):
-        print("✅ tearDown: fermeture du navigateur")
-        self.driver.quit()
+    def setUp(self):
+        # La base est vidée entre deux tests : le journal des modifications
+        # peut repartir à un numéro sous lequel un fragment est en cache
+        get_cache().clear()
+        self.wait = WebDriverWait(self.driver, WAIT_TIMEOUT)
 
     def _go_home(self):
-        print(f"▶️  Navigation vers {BASE_URL}")
-        self.driver.get(BASE_URL)
+        self.driver.get(f"{self.live_server_url}/")
         self.wait.until(
             EC.presence_of_element_located((By.CSS_SELECTOR, ".todo-list"))
         )
@@ -100,36 +164,49 @@ class TodoListE2ETest(unittest.TestCase):
         rows = self.driver.find_elements(By.CSS_SELECTOR, ".item-row")
         return len(rows)
 
+    def _wait_for_count(self, expected):
+        self.wait.until(lambda driver: self._count_tasks() == expected)
+
     def _create_task(self, title: str):
+        expected = self._count_tasks() + 1
         input_title = self.wait.until(
             EC.presence_of_element_located((By.NAME, "title"))
         )
         input_title.clear()
         input_title.send_keys(title)
         input_title.send_keys(Keys.RETURN)
-        self.wait.until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".item-row"))
-        )
+        # Attend la page rechargée après la redirection
+        self._wait_for_count(expected)
 
     def _delete_last_task(self):
         rows = self.driver.find_elements(By.CSS_SELECTOR, ".item-row")
         if not rows:
             return
+        expected = len(rows) - 1
         last_row = rows[-1]
         delete_link = last_row.find_element(By.LINK_TEXT, "Delete")
         delete_link.click()
 
+        # Confirmation dans la ligne (list.html avec JS) ou sur sa propre page
         confirm_button = self.wait.until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "input[type='submit'], button[type='submit']")
+            EC.element_to_be_clickable(
+                (
+                    By.CSS_SELECTOR,
+                    ".confirm-delete button[type='submit'], "
+                    "form:not(.create) input[type='submit']",
+                )
             )
         )
         confirm_button.click()
 
+        self.wait.until(EC.staleness_of(confirm_button))
         self.wait.until(
             EC.presence_of_element_located((By.CSS_SELECTOR, ".todo-list"))
         )
+        self._wait_for_count(expected)
+
 
+class TaskCountE2ETest(TodoListE2ETestCase):
     @tc("TC016")
     def test_create_and_delete_10_tasks_keeps_task_count(self):
         """
@@ -140,33 +217,28 @@ class TodoListE2ETest(unittest.TestCase):
         - Supprimer ces 10 tâches
         - Vérifier que le nombre final = nombre initial
         """
-        print("🚀 Début du test E2E Selenium")
         self._go_home()
 
         initial_count = self._count_tasks()
-        print(f"Nombre initial de tâches : {initial_count}")
 
         for i in range(10):
             self._create_task(f"E2E selenium task {i+1}")
-            time.sleep(0.2)
 
-        after_creation_count = self._count_tasks()
-        print(f"Nombre après création : {after_creation_count}")
+        self.assertEqual(self._count_tasks(), initial_count + 10)
 
         for _ in range(10):
             self._delete_last_task()
-            time.sleep(0.2)
 
         final_count = self._count_tasks()
-        print(f"Nombre final de tâches : {final_count}")
 
         self.assertEqual(
             initial_count,
             final_count,
             "Le nombre final de tâches devrait être égal au nombre initial.",
         )
-        print("✅ Test E2E terminé avec succès")
 
+
+class TaskDeletionE2ETest(TodoListE2ETestCase):
     @tc("TC017")
     def test_first_task_stays_when_deleting_second(self):
         """
@@ -177,22 +249,18 @@ class TodoListE2ETest(unittest.TestCase):
         - Supprimer la dernière tâche (B)
         - Vérifier que A est toujours présente dans la liste
         """
-        print("🚀 Début du test E2E Selenium TC017")
         self._go_home()
 
         # Créer une tâche A avec un titre unique
         task_a_title = "E2E impact A"
         self._create_task(task_a_title)
-        time.sleep(0.2)
 
         # Créer une tâche B
         task_b_title = "E2E impact B"
         self._create_task(task_b_title)
-        time.sleep(0.2)
 
         # Supprimer la dernière tâche créée (normalement B)
         self._delete_last_task()
-        time.sleep(0.2)
 
         # Vérifier que la tâche A est toujours présente dans la page
         elements_with_a = self.driver.find_elements(
@@ -202,25 +270,30 @@ class TodoListE2ETest(unittest.TestCase):
             elements_with_a,
             "La tâche A devrait toujours être présente après suppression de B.",
         )
-        print("✅ TC017 terminé avec succès : A est toujours présente")
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tests E2E Selenium.")
+    parser.add_argument(
+        "--parallel",
+        type=parallel_type,
+        default=1,
+        help="Nombre de processus (une classe de test par processus), ou 'auto'.",
+    )
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
     print("▶️ Lancement des tests Selenium (unittest avec JSON)...")
+    args = parse_args()
+    parallel = args.parallel
+    if parallel == "auto":
+        parallel = get_max_test_processes()
 
-    suite = unittest.defaultTestLoader.loadTestsFromTestCase(TodoListE2ETest)
-    runner = unittest.TextTestRunner(
-        verbosity=2,
-        resultclass=JsonSeleniumResult,
+    runner = JsonDiscoverRunner(
+        verbosity=2, parallel=parallel, output=RESULT_PATH.name
     )
-    result: JsonSeleniumResult = runner.run(suite)
-
-    # écriture du JSON
-    result.write_json(RESULT_PATH)
-    print(f"\n📄 Résultats Selenium JSON écrits dans : {RESULT_PATH}")
+    failures = runner.run_tests(["selenium_e2e_test"])
 
     # code de retour : 0 si tout passe, 1 sinon
-    import sys
-
-    sys.exit(not result.wasSuccessful())
+    sys.exit(bool(failures))
@@ -1,8 +1,48 @@
 from django.contrib import admin
 
-from .models import Task
+from .counters import list_summary
+from .models import Task, TaskList
 
 
-admin.site.register(Task)
+@admin.register(TaskList)
+class TaskListAdmin(admin.ModelAdmin):
+    list_display = ("name", "owner", "shard", "progress")
+    list_filter = ("shard",)
+
+    # Lu dans les compteurs (tasks.counters) : une ligne par liste affichée
+    @admin.display(description="Progress")
+    def progress(self, task_list):
+        return str(list_summary(task_list))
+
+
+# Tâches de la base principale seulement (premier shard, voir tasks.shards)
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("title", "list", "complete", "created")
+    list_filter = ("complete",)
+    actions = ["mark_complete", "mark_incomplete", "bulk_delete", "delete_completed"]
+
+    # Chaque action est une seule requête UPDATE / DELETE, y compris avec
+    # « sélectionner tous les objets » sur toutes les pages.
+
+    @admin.action(description="Marquer comme terminées")
+    def mark_complete(self, request, queryset):
+        count = queryset.bulk_complete()
+        self.message_user(request, f"{count} tâche(s) marquée(s) terminée(s).")
+
+    @admin.action(description="Marquer comme à faire")
+    def mark_incomplete(self, request, queryset):
+        count = queryset.bulk_complete(False)
+        self.message_user(request, f"{count} tâche(s) marquée(s) à faire.")
+
+    @admin.action(description="Supprimer immédiatement")
+    def bulk_delete(self, request, queryset):
+        count = queryset.bulk_delete()
+        self.message_user(request, f"{count} tâche(s) supprimée(s).")
+
+    @admin.action(description="Supprimer celles qui sont terminées")
+    def delete_completed(self, request, queryset):
+        count = queryset.filter(complete=True).bulk_delete()
+        self.message_user(request, f"{count} tâche(s) terminée(s) supprimée(s).")
 
 
@@ -0,0 +1,275 @@
+"""
+API JSON des tâches.
+
+- ``GET    /api/tasks/``          liste paginée par curseur (``?cursor=``),
+                                  ou recherche plein texte (``?q=``)
+- ``POST   /api/tasks/``          création d'une tâche
+- ``GET    /api/tasks/<id>/``     détail
+- ``PATCH  /api/tasks/<id>/``     mise à jour partielle
+- ``DELETE /api/tasks/<id>/``     suppression
+- ``POST   /api/tasks/batch/``    lot d'opérations appliqué en une transaction ::
+
+      {"create": [{"title": "..."}],
+       "update": [{"id": 1, "complete": true}],
+       "delete": [2, 3]}
+
+Les clients anonymes (liste publique) appellent l'API sans jeton CSRF. Une
+requête authentifiée par la session écrit dans la liste de l'utilisateur :
+elle doit envoyer le jeton CSRF (en-tête ``X-CSRFToken``), sinon n'importe
+quel site pourrait modifier cette liste depuis le navigateur de la victime.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .counters import counts_changed, counts_of
+from .forms import TaskForm
+from .models import Task
+from .pagination import InvalidCursor
+from .search import search_tasks
+from .shards import assign_list, current_list, list_tasks, read_db, shard_for
+from .signals import tasks_bulk_changed
+from .writebehind import save_task
+from .views import list_paginator
+
+
+class ApiError(Exception):
+    def __init__(self, status, payload):
+        super().__init__(payload)
+        self.status = status
+        self.payload = payload
+
+
+def task_to_dict(task):
+    return {
+        "id": task.id,
+        "title": task.title,
+        "complete": task.complete,
+        "priority": task.priority,
+        "created": task.created.isoformat() if task.created else None,
+    }
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+
+def _is_id(value) -> bool:
+    # bool est un sous-type d'int : true désignerait la tâche 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_session_csrf(request):
+    """Exige le jeton CSRF des écritures authentifiées par la session."""
+    if request.method in SAFE_METHODS:
+        return
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    if check.process_view(request, None, (), {}) is not None:
+        raise ApiError(403, {"error": "Jeton CSRF absent ou invalide"})
+
+
+def _error(status, message, **extra):
+    return JsonResponse({"error": message, **extra}, status=status)
+
+
+def _read_json(request):
+    try:
+        return json.loads(request.body or b"null")
+    except ValueError:
+        raise ApiError(400, {"error": "JSON invalide"})
+
+
+def _bound_form(payload, instance=None):
+    """
+    Formulaire TaskForm lié au payload. Pour une mise à jour partielle on
+    part des valeurs actuelles de la tâche : les champs absents du payload
+    restent inchangés.
+    """
+    if not isinstance(payload, dict):
+        raise ApiError(400, {"error": "Chaque tâche doit être un objet JSON"})
+    data = {}
+    if instance is not None:
+        data = model_to_dict(instance, fields=list(TaskForm.base_fields))
+    data.update(payload)
+    data.pop("id", None)
+    return TaskForm(data, instance=instance)
+
+
+def _api_view(view):
+    """Convertit les ApiError levées par une vue en réponse JSON."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            check_session_csrf(request)
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse(exc.payload, status=exc.status)
+
+    return wrapper
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@_api_view
+def task_list(request):
+    owner_list = current_list(request)
+    if request.method == "POST":
+        form = _bound_form(_read_json(request))
+        if not form.is_valid():
+            return _error(400, "Tâche invalide", errors=form.errors)
+        task = form.save(commit=False)
+        task = save_task(task, assign_list(task, owner_list))
+        return JsonResponse(task_to_dict(task), status=201)
+
+    query = request.GET.get("q", "").strip()
+    if query:
+        tasks = search_tasks(
+            query,
+            limit=settings.TASKS_PAGE_SIZE,
+            using=read_db(shard_for(owner_list)),
+            task_list=owner_list,
+        )
+        results = [task_to_dict(t) for t in tasks]
+        return JsonResponse({"results": results, "next": None, "previous": None})
+
+    try:
+        page = list_paginator(list_tasks(owner_list)).page(request.GET.get("cursor"))
+    except InvalidCursor:
+        return _error(400, "Curseur de pagination invalide")
+    return JsonResponse(
+        {
+            "results": [task_to_dict(t) for t in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+@csrf_exempt
+@require_http_methods(["GET", "PATCH", "DELETE"])
+@_api_view
+def task_detail(request, pk):
+    owner_list = current_list(request)
+    task = list_tasks(owner_list).filter(id=pk).first()
+    if task is None:
+        return _error(404, "Tâche introuvable")
+
+    if request.method == "DELETE":
+        task.delete()
+        return HttpResponse(status=204)
+
+    if request.method == "PATCH":
+        form = _bound_form(_read_json(request), instance=task)
+        if not form.is_valid():
+            return _error(400, "Tâche invalide", errors=form.errors)
+        task = save_task(form.save(commit=False), shard_for(owner_list))
+
+    return JsonResponse(task_to_dict(task))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@_api_view
+def task_batch(request):
+    """
+    Applique un lot de créations, mises à jour et suppressions en une
+    seule transaction : un ``bulk_create``, un ``bulk_update`` et un
+    ``DELETE ... WHERE id IN`` au lieu d'une requête HTTP par tâche.
+    Si une opération est invalide, rien n'est appliqué.
+    """
+    payload = _read_json(request)
+    if not isinstance(payload, dict):
+        return _error(400, "Le lot doit être un objet JSON")
+    creates = payload.get("create") or []
+    updates = payload.get("update") or []
+    deletes = payload.get("delete") or []
+    if not all(isinstance(ops, list) for ops in (creates, updates, deletes)):
+        return _error(400, "create, update et delete doivent être des listes")
+    if not all(_is_id(pk) for pk in deletes):
+        return _error(400, "delete doit être une liste d'identifiants")
+
+    size = len(creates) + len(updates) + len(deletes)
+    if size > settings.TASKS_API_MAX_BATCH:
+        return _error(
+            400, f"Lot trop grand ({size} > {settings.TASKS_API_MAX_BATCH})"
+        )
+
+    errors = {}
+
+    new_tasks = []
+    for i, item in enumerate(creates):
+        form = _bound_form(item)
+        if form.is_valid():
+            new_tasks.append(form.save(commit=False))
+        else:
+            errors[f"create[{i}]"] = form.errors
+
+    owner_list = current_list(request)
+    using = shard_for(owner_list)
+    tasks = list_tasks(owner_list, using)
+    for task in new_tasks:
+        assign_list(task, owner_list)
+
+    update_ids = [item.get("id") for item in updates if isinstance(item, dict)]
+    existing = tasks.in_bulk([pk for pk in update_ids if _is_id(pk)])
+    changed_tasks = []
+    for i, item in enumerate(updates):
+        task = None
+        if isinstance(item, dict) and _is_id(item.get("id")):
+            task = existing.get(item["id"])
+        if task is None:
+            errors[f"update[{i}]"] = "Tâche introuvable"
+            continue
+        form = _bound_form(item, instance=task)
+        if form.is_valid():
+            changed_tasks.append(form.save(commit=False))
+        else:
+            errors[f"update[{i}]"] = form.errors
+
+    if errors:
+        return _error(400, "Lot invalide", errors=errors)
+
+    with transaction.atomic(using=using):
+        created = Task.objects.using(using).bulk_create(new_tasks)
+        changed_counts = counts_changed(changed_tasks, using)
+        if changed_tasks:
+            Task.objects.using(using).bulk_update(
+                changed_tasks, list(TaskForm.base_fields)
+            )
+        deleted = 0
+        if deletes:
+            deleted = tasks.filter(id__in=deletes).bulk_delete()
+        # Les suppressions sont signalées par bulk_delete()
+        tasks_bulk_changed.send(
+            sender=Task,
+            op="create",
+            count=len(created),
+            using=using,
+            counts=counts_of(created, using),
+        )
+        tasks_bulk_changed.send(
+            sender=Task,
+            op="update",
+            count=len(changed_tasks),
+            using=using,
+            counts=changed_counts,
+        )
+
+    return JsonResponse(
+        {
+            "created": [task_to_dict(t) for t in created],
+            "updated": [task_to_dict(t) for t in changed_tasks],
+            "deleted": deleted,
+        }
+    )
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite
+        from .metrics import count_connection
+
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(count_connection)
@@ -0,0 +1,100 @@
+"""
+Archivage des tâches terminées dans une table froide.
+
+Les tâches terminées depuis plus de ``AFTER_DAYS`` jours (d'après leur date
+de création : aucune date de fin n'est enregistrée) sont déplacées de
+``tasks_task`` vers ``tasks_taskarchive`` par lots de ``BATCH_SIZE`` : un
+``INSERT ... SELECT`` puis un ``DELETE`` dans une même transaction courte,
+pour ne pas bloquer les écritures de l'application pendant l'archivage
+d'un gros arriéré. La table chaude, lue par la liste, reste ainsi petite.
+
+Chaque shard (tasks.shards) archive ses tâches dans sa propre table
+d'archive.
+
+Les triggers de ``tasks_task`` (recherche, journal des modifications)
+voient des suppressions ordinaires : les tâches archivées disparaissent de
+la recherche et des pages ouvertes.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .counters import counts_in
+from .models import Task, TaskArchive
+from .shards import task_shards
+from .signals import tasks_bulk_changed
+
+DEFAULT_CONFIG = {
+    # Âge (jours) à partir duquel une tâche terminée est archivée
+    "AFTER_DAYS": 30,
+    "BATCH_SIZE": 500,
+}
+
+# Colonnes recopiées telles quelles de tasks_task
+ARCHIVE_COLUMNS = ("id", "list_id", "title", "complete", "priority", "created")
+
+
+def archive_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "TASKS_ARCHIVE", {})}
+
+
+def archivable_tasks(after_days: float, now=None, using="default"):
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=after_days)
+    return Task.objects.using(using).filter(complete=True, created__lt=cutoff)
+
+
+def _copy_to_archive(ids, archived, using):
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(column) for column in ARCHIVE_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(ids))
+    sql = (
+        f"INSERT INTO {qn(TaskArchive._meta.db_table)} ({columns}, {qn('archived')}) "
+        f"SELECT {columns}, %s FROM {qn(Task._meta.db_table)} "
+        f"WHERE {qn('id')} IN ({placeholders})"
+    )
+    archived = connection.ops.adapt_datetimefield_value(archived)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [archived, *ids])
+
+
+def archive_tasks(after_days=None, batch_size=None, now=None, on_batch=None) -> int:
+    """
+    Déplace les tâches archivables de chaque shard dans ``TaskArchive``, un
+    lot par transaction. Retourne le nombre de tâches archivées.
+    """
+    config = archive_config()
+    if after_days is None:
+        after_days = config["AFTER_DAYS"]
+    if batch_size is None:
+        batch_size = config["BATCH_SIZE"]
+    now = now or timezone.now()
+
+    total = 0
+    for using in task_shards():
+        candidates = archivable_tasks(after_days, now, using).order_by("id")
+        last_id = 0
+        while True:
+            with transaction.atomic(using=using):
+                ids = list(
+                    candidates.filter(id__gt=last_id).values_list("id", flat=True)[
+                        :batch_size
+                    ]
+                )
+                if not ids:
+                    break
+                _copy_to_archive(ids, now, using)
+                batch = Task.objects.using(using).filter(id__in=ids)
+                counts = counts_in(batch, sign=-1)
+                batch._raw_delete(using)
+            last_id = ids[-1]
+            total += len(ids)
+            tasks_bulk_changed.send(
+                sender=Task, op="archive", count=len(ids), using=using, counts=counts
+            )
+            if on_batch is not None:
+                on_batch(total)
+    return total
@@ -0,0 +1,263 @@
+"""
+Versions async des vues de ``tasks.views`` et ``tasks.api``, activées par
+``TASKS_VIEWS_MODE = "async"`` (voir ``tasks.urls``). Servies par un
+serveur ASGI (``todo.asgi``), elles n'occupent pas de thread pendant
+qu'elles attendent la base ou un client lent.
+
+Les accès base passent par l'ORM async (``aget``, ``asave``, ``adelete``,
+itération ``async for``). La liste de l'appelant (tasks.shards) est
+résolue en premier, dans un thread : elle lit la session et la base, puis
+reste mémorisée sur la requête. Les décorateurs de Django 4.2 (``condition``,
+``csrf_exempt``, ``require_http_methods``) ne gèrent pas les coroutines :
+leur comportement est reproduit ici. Le lot ``/api/tasks/batch/`` reste
+la vue synchrone de ``tasks.api`` car les transactions n'existent pas
+dans l'ORM async ; Django l'exécute dans un thread.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response
+from django.utils.safestring import mark_safe
+
+from .api import (
+    ApiError,
+    _bound_form,
+    _error,
+    _read_json,
+    check_session_csrf,
+    task_to_dict,
+)
+from .cache import acached_fragment
+from .counters import list_summary
+from .forms import TaskForm
+from .pagination import InvalidCursor
+from .search import search_tasks
+from .shards import assign_list, current_list, list_tasks, read_db, shard_for
+from .views import (
+    list_etag,
+    list_paginator,
+    list_read_db,
+    list_seq,
+    list_variant,
+    task_etag,
+    task_list_html,
+    task_row,
+    wants_fragment,
+)
+from .writebehind import asave_task
+
+
+def _not_modified(request, etag):
+    """
+    Équivalent du décorateur ``condition`` : retourne une réponse 304/412
+    si l'ETag du client est à jour, sinon None.
+    """
+    return get_conditional_response(request, etag=etag)
+
+
+def _with_validators(request, response, etag):
+    if request.method in ("GET", "HEAD"):
+        if etag and not response.has_header("ETag"):
+            response.headers["ETag"] = etag
+    return response
+
+
+async def _page(request, queryset):
+    try:
+        return await list_paginator(queryset).apage(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Curseur de pagination invalide")
+
+
+acurrent_list = sync_to_async(current_list)
+
+
+async def render_task_list(request, task_list):
+    query = request.GET.get("q", "").strip()
+
+    async def render():
+        using = list_read_db(request)
+        if query:
+            tasks = await sync_to_async(search_tasks)(
+                query, limit=settings.TASKS_PAGE_SIZE, using=using, task_list=task_list
+            )
+            return task_list_html(request, tasks, None)
+        seq = await sync_to_async(list_seq)(request)
+        page = await _page(request, list_tasks(task_list, using))
+        summary = await sync_to_async(list_summary)(task_list, using)
+        return task_list_html(request, page, page, seq, summary)
+
+    seq = await sync_to_async(list_seq)(request)
+    return mark_safe(await acached_fragment(seq, list_variant(request), render))
+
+
+async def index(request):
+    task_list = await acurrent_list(request)
+    etag = await sync_to_async(list_etag)(request)
+    response = _not_modified(request, etag)
+    if response is not None:
+        return response
+
+    form = TaskForm()
+
+    if request.method == "POST":
+        form = TaskForm(request.POST)
+        if form.is_valid():
+            task = form.save(commit=False)
+            task = await asave_task(task, assign_list(task, task_list))
+            if wants_fragment(request):
+                return task_row(request, task, status=201)
+            return redirect("/")
+        if wants_fragment(request):
+            return HttpResponseBadRequest(form.errors.as_text())
+
+    context = {
+        "task_list": await render_task_list(request, task_list),
+        "form": form,
+        "query": request.GET.get("q", ""),
+        "Version": settings.VERSION,
+    }
+    response = render(request, "tasks/list.html", context)
+    return _with_validators(request, response, etag)
+
+
+async def _get_task(task_list, pk):
+    task = await list_tasks(task_list).filter(id=pk).afirst()
+    if task is None:
+        raise Http404("Tâche introuvable")
+    return task
+
+
+async def updateTask(request, pk):
+    task_list = await acurrent_list(request)
+    etag = await sync_to_async(task_etag)(request, pk)
+    response = _not_modified(request, etag)
+    if response is not None:
+        return response
+
+    task = await _get_task(task_list, pk)
+    form = TaskForm(instance=task)
+
+    if request.method == "POST":
+        form = TaskForm(request.POST, instance=task)
+        if form.is_valid():
+            task = await asave_task(form.save(commit=False), shard_for(task_list))
+            if wants_fragment(request):
+                return task_row(request, task)
+            return redirect("/")
+        if wants_fragment(request):
+            return HttpResponseBadRequest(form.errors.as_text())
+
+    context = {"form": form}
+    response = render(request, "tasks/update_task.html", context)
+    return _with_validators(request, response, etag)
+
+
+async def deleteTask(request, pk):
+    task_list = await acurrent_list(request)
+    etag = await sync_to_async(task_etag)(request, pk)
+    response = _not_modified(request, etag)
+    if response is not None:
+        return response
+
+    item = await _get_task(task_list, pk)
+
+    if request.method == "POST":
+        await item.adelete()
+        if wants_fragment(request):
+            return HttpResponse(status=204)
+        return redirect("/")
+
+    context = {"item": item}
+    response = render(request, "tasks/delete.html", context)
+    return _with_validators(request, response, etag)
+
+
+def _async_api_view(methods):
+    """
+    csrf_exempt (jeton exigé des seules sessions, voir ``tasks.api``) +
+    require_http_methods + gestion des ApiError, pour async.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                # Lit la session : dans un thread
+                await sync_to_async(check_session_csrf)(request)
+                return await view(request, *args, **kwargs)
+            except ApiError as exc:
+                return JsonResponse(exc.payload, status=exc.status)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+@_async_api_view(["GET", "POST"])
+async def task_list(request):
+    owner_list = await acurrent_list(request)
+    if request.method == "POST":
+        form = _bound_form(_read_json(request))
+        if not form.is_valid():
+            return _error(400, "Tâche invalide", errors=form.errors)
+        task = form.save(commit=False)
+        task = await asave_task(task, assign_list(task, owner_list))
+        return JsonResponse(task_to_dict(task), status=201)
+
+    query = request.GET.get("q", "").strip()
+    if query:
+        tasks = await sync_to_async(search_tasks)(
+            query,
+            limit=settings.TASKS_PAGE_SIZE,
+            using=read_db(shard_for(owner_list)),
+            task_list=owner_list,
+        )
+        results = [task_to_dict(t) for t in tasks]
+        return JsonResponse({"results": results, "next": None, "previous": None})
+
+    try:
+        page = await list_paginator(list_tasks(owner_list)).apage(
+            request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        return _error(400, "Curseur de pagination invalide")
+    return JsonResponse(
+        {
+            "results": [task_to_dict(t) for t in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+@_async_api_view(["GET", "PATCH", "DELETE"])
+async def task_detail(request, pk):
+    owner_list = await acurrent_list(request)
+    task = await list_tasks(owner_list).filter(id=pk).afirst()
+    if task is None:
+        return _error(404, "Tâche introuvable")
+
+    if request.method == "DELETE":
+        await task.adelete()
+        return HttpResponse(status=204)
+
+    if request.method == "PATCH":
+        form = _bound_form(_read_json(request), instance=task)
+        if not form.is_valid():
+            return _error(400, "Tâche invalide", errors=form.errors)
+        task = await asave_task(form.save(commit=False), shard_for(owner_list))
+
+    return JsonResponse(task_to_dict(task))
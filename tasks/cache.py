@@ -0,0 +1,91 @@
+"""
+Cache de la liste des tâches.
+
+Le fragment HTML de la liste est mis en cache sous une clé qui contient la
+position du journal des modifications (``tasks.changes.latest_seq``) de la
+base lue. Le journal avance à chaque écriture, quel que soit le processus
+qui l'a faite : les anciennes entrées ne sont plus jamais lues et expirent
+d'elles-mêmes, sans invalidation explicite.
+
+Le backend est celui de l'alias ``TASKS_CACHE_ALIAS`` de ``CACHES``. Avec
+``LocMemCache`` (le défaut) chaque processus garde ses propres fragments,
+mais aucun n'en sert de périmé ; un backend partagé (fichier, Redis...)
+évite seulement de rendre la même page une fois par processus.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+FRAGMENT_KEY = "tasks:list:fragment:{seq}:{variant}"
+
+
+class CacheStats:
+    """Compteurs de hits / misses du cache de la liste (par processus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        # Même compteur, partagé entre processus pour /metrics
+        metrics.LIST_CACHE_REQUESTS.inc(result="hit" if hit else "miss")
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.TASKS_CACHE_ALIAS]
+
+
+def _fragment_key(seq: int, variant: str) -> str:
+    return FRAGMENT_KEY.format(seq=seq, variant=variant)
+
+
+def cached_fragment(seq: int, variant: str, render):
+    """
+    Retourne le fragment ``variant`` à la position ``seq`` du journal, en
+    appelant ``render()`` (et en le mettant en cache) seulement en cas de
+    miss.
+    """
+    cache = get_cache()
+    key = _fragment_key(seq, variant)
+    html = cache.get(key)
+    stats.record(html is not None)
+    if html is None:
+        html = render()
+        cache.set(key, html, settings.TASKS_LIST_CACHE_TIMEOUT)
+    return html
+
+
+async def acached_fragment(seq: int, variant: str, arender):
+    """Variante de ``cached_fragment`` dont le rendu est une coroutine."""
+    cache = get_cache()
+    key = _fragment_key(seq, variant)
+    html = cache.get(key)
+    stats.record(html is not None)
+    if html is None:
+        html = await arender()
+        cache.set(key, html, settings.TASKS_LIST_CACHE_TIMEOUT)
+    return html
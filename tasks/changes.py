@@ -0,0 +1,240 @@
+"""
+Journal des modifications de tâches et flux Server-Sent Events.
+
+Chaque écriture sur ``tasks_task`` ajoute une ligne à ``tasks_taskchange``
+(numéro de séquence croissant, id de la tâche, opération). Sur SQLite ce
+sont des triggers qui l'écrivent, dans la même instruction que l'écriture :
+les opérations groupées (bulk_create, update(), suppressions brutes) sont
+journalisées sans requête supplémentaire et une écriture annulée n'y
+apparaît jamais. SQLite n'ayant qu'un écrivain à la fois, les numéros
+deviennent visibles dans l'ordre. Sur une autre base, les signaux de
+``tasks.signals`` tiennent le journal (une entrée ``reload`` par opération
+groupée).
+
+La vue ``task_events`` diffuse les entrées postérieures au numéro reçu
+(paramètre ``after`` à la connexion, en-tête ``Last-Event-ID`` quand
+EventSource se reconnecte) : pour chaque tâche modifiée, sa ligne HTML à
+jour ou sa suppression. Si le client a plus de ``BATCH`` entrées de retard,
+ou si le journal a été purgé entre-temps (``manage.py prune_task_changes``),
+un seul événement ``reload`` lui demande de recharger la page.
+
+Sous ASGI (``todo.asgi``) le flux est un itérateur async qui n'occupe pas
+de thread entre deux lectures du journal ; sous WSGI chaque client garde
+un thread. Le flux se termine après ``MAX_STREAM_SECONDS`` et EventSource
+se reconnecte sans rien perdre.
+
+Chaque shard (tasks.shards) a son journal : la page et le flux d'un
+client lisent celui du shard de sa liste, et le flux ne diffuse que les
+tâches de cette liste (les suppressions, dont la liste n'est plus connue,
+sont diffusées telles quelles ; le client ignore les ids absents).
+
+Attention : comme pour la recherche (``tasks.search``), les migrations qui
+reconstruisent ``tasks_task`` sur SQLite suppriment ses triggers et doivent
+rappeler ``install_change_log``.
+"""
+
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Max
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET
+
+from .models import Task, TaskChange
+from .shards import current_list, shard_for
+
+LOG_TABLE = TaskChange._meta.db_table
+TASK_TABLE = Task._meta.db_table
+
+CHANGE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {LOG_TABLE}_ai AFTER INSERT ON {TASK_TABLE}
+    BEGIN
+        INSERT INTO {LOG_TABLE}(task_id, op) VALUES (new.id, 'create');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {LOG_TABLE}_au AFTER UPDATE ON {TASK_TABLE}
+    BEGIN
+        INSERT INTO {LOG_TABLE}(task_id, op) VALUES (new.id, 'update');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {LOG_TABLE}_ad AFTER DELETE ON {TASK_TABLE}
+    BEGIN
+        INSERT INTO {LOG_TABLE}(task_id, op) VALUES (old.id, 'delete');
+    END""",
+]
+
+DEFAULT_CONFIG = {
+    # Secondes entre deux lectures du journal
+    "POLL_INTERVAL": 1.0,
+    # Retard au-delà duquel le client recharge la page
+    "BATCH": 200,
+    "MAX_STREAM_SECONDS": 300,
+    # Délai de reconnexion d'EventSource (ms)
+    "RETRY_MS": 3000,
+}
+
+# Commentaire SSE envoyé sans événement pour garder la connexion ouverte
+# derrière les proxys
+KEEPALIVE_SECONDS = 15
+
+
+def uses_triggers(connection) -> bool:
+    return connection.vendor == "sqlite"
+
+
+def install_change_log(connection) -> bool:
+    """Crée (ou recrée) les triggers du journal. False hors SQLite."""
+    if not uses_triggers(connection):
+        return False
+    with connection.cursor() as cursor:
+        for sql in CHANGE_TRIGGERS:
+            cursor.execute(sql)
+    return True
+
+
+def uninstall_change_log(connection):
+    if not uses_triggers(connection):
+        return
+    with connection.cursor() as cursor:
+        for suffix in ("ai", "au", "ad"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {LOG_TABLE}_{suffix}")
+
+
+def events_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "TASKS_EVENTS", {})}
+
+
+def latest_seq(using=None) -> int:
+    entries = TaskChange.objects.using(using)
+    return entries.aggregate(seq=Max("id"))["seq"] or 0
+
+
+def prune_changes(keep: int, using="default") -> int:
+    """
+    Supprime les entrées du journal de ``using`` sauf les ``keep`` plus
+    récentes.
+    """
+    cutoff = latest_seq(using) - keep
+    if cutoff <= 0:
+        return 0
+    old = TaskChange.objects.using(using).filter(id__lte=cutoff)
+    return old._raw_delete(using)
+
+
+def format_event(seq, event, data) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def read_changes(after: int, limit: int, using="default", list_id=None):
+    """
+    Événements SSE des entrées postérieures à ``after`` pour les tâches de
+    la liste ``list_id``, et le numéro de séquence atteint. Une tâche
+    modifiée plusieurs fois n'est envoyée qu'une fois, dans son dernier
+    état. ``using`` est la base principale du shard, jamais une réplique
+    (tasks.replicas) : une page servie par une réplique rattrape ainsi son
+    retard.
+    """
+    entries = TaskChange.objects.using(using).filter(id__gt=after)
+    changes = list(entries.values_list("id", "task_id", "op")[:limit])
+    if not changes:
+        return [], after
+
+    # Trop de retard, ou entrées purgées depuis ``after`` : les numéros
+    # AUTOINCREMENT de SQLite se suivent sans trou sinon
+    if len(changes) == limit or changes[0][0] != after + 1:
+        seq = latest_seq(using)
+        return [format_event(seq, TaskChange.RELOAD, {})], seq
+
+    last_seq = changes[-1][0]
+    if any(op == TaskChange.RELOAD for _, _, op in changes):
+        return [format_event(last_seq, TaskChange.RELOAD, {})], last_seq
+
+    latest = {}
+    for seq, task_id, op in changes:
+        previous = latest.pop(task_id, None)
+        # Créée puis modifiée dans le même lot : reste une création
+        if previous and previous[1] == TaskChange.CREATE and op == TaskChange.UPDATE:
+            op = TaskChange.CREATE
+        latest[task_id] = (seq, op)
+
+    live = [task_id for task_id, (_, op) in latest.items() if op != TaskChange.DELETE]
+    tasks = Task.objects.using(using).in_bulk(live)
+    events = []
+    for task_id, (seq, op) in latest.items():
+        task = tasks.get(task_id)
+        if task is not None and task.list_id != list_id:
+            continue
+        if task is None:
+            events.append(format_event(seq, TaskChange.DELETE, {"id": task_id}))
+        else:
+            html = render_to_string("tasks/_task_row.html", {"task": task})
+            events.append(format_event(seq, op, {"id": task_id, "html": html}))
+    return events, last_seq
+
+
+def event_stream(after, config, using="default", list_id=None):
+    yield f"retry: {config['RETRY_MS']}\n\n"
+    deadline = time.monotonic() + config["MAX_STREAM_SECONDS"]
+    idle = 0.0
+    while True:
+        events, after = read_changes(after, config["BATCH"], using, list_id)
+        if events:
+            yield "".join(events)
+            idle = 0.0
+        elif idle >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(config["POLL_INTERVAL"])
+        idle += config["POLL_INTERVAL"]
+
+
+async def aevent_stream(after, config, using="default", list_id=None):
+    yield f"retry: {config['RETRY_MS']}\n\n"
+    deadline = time.monotonic() + config["MAX_STREAM_SECONDS"]
+    idle = 0.0
+    while True:
+        events, after = await sync_to_async(read_changes)(
+            after, config["BATCH"], using, list_id
+        )
+        if events:
+            yield "".join(events)
+            idle = 0.0
+        elif idle >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(config["POLL_INTERVAL"])
+        idle += config["POLL_INTERVAL"]
+
+
+@require_GET
+def task_events(request):
+    """Flux SSE des modifications postérieures à ``after`` / Last-Event-ID."""
+    task_list = current_list(request)
+    using = shard_for(task_list)
+    list_id = task_list.id if task_list is not None else None
+    after = request.headers.get("Last-Event-ID") or request.GET.get("after")
+    if after is None:
+        after = latest_seq(using)
+    else:
+        try:
+            after = int(after)
+        except ValueError:
+            return HttpResponseBadRequest("Numéro de séquence invalide")
+
+    config = events_config()
+    if isinstance(request, ASGIRequest):
+        stream = aevent_stream(after, config, using, list_id)
+    else:
+        stream = event_stream(after, config, using, list_id)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Pas de mise en tampon par nginx
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,301 @@
+"""
+Compteurs de tâches (total et terminées) par liste.
+
+``tasks_taskcounter`` garde, pour chaque liste d'un shard, son nombre de
+tâches et de tâches terminées : le résumé « X sur Y terminées » se lit en
+une ligne, sans compter ``tasks_task``. Sur SQLite ce sont des triggers
+qui tiennent les compteurs, dans la même instruction que l'écriture :
+créations, modifications et suppressions des vues, opérations groupées
+(import, API batch, actions de l'admin, archivage, déplacement de liste)
+les mettent à jour dans leur transaction, et une écriture annulée ne les
+touche pas. Sur une autre base, les signaux de ``tasks.signals`` ajoutent
+aux compteurs des listes modifiées leur variation (``UPDATE ... SET total
+= total + n``), sans recompter ``tasks_task`` : les opérations groupées la
+passent dans l'argument ``counts`` de ``tasks_bulk_changed`` (voir
+``counts_of``, ``counts_in`` et ``counts_changed``), calculée seulement
+quand les compteurs ne sont pas tenus par des triggers.
+
+Les tâches archivées (tasks.archive) ne sont plus comptées.
+
+``manage.py repair_task_counters`` recalcule les compteurs depuis
+``tasks_task`` (après une écriture hors de Django, une restauration...).
+
+Attention : comme pour la recherche et le journal des modifications, les
+migrations qui reconstruisent ``tasks_task`` sur SQLite suppriment ses
+triggers et doivent rappeler ``install_counters``.
+"""
+
+from typing import NamedTuple, Optional
+
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .changes import uses_triggers
+from .models import Task, TaskCounter
+from .shards import read_db, shard_for, task_shards
+
+COUNTER_TABLE = TaskCounter._meta.db_table
+TASK_TABLE = Task._meta.db_table
+
+# Clé des compteurs de la liste publique (tâches sans liste)
+PUBLIC_LIST = TaskCounter.PUBLIC_LIST
+
+_ADD = f"""INSERT INTO {COUNTER_TABLE}(list_id, total, completed)
+        VALUES (COALESCE(new.list_id, {PUBLIC_LIST}), 1, new.complete)
+        ON CONFLICT(list_id) DO UPDATE SET
+            total = total + 1, completed = completed + excluded.completed;"""
+
+_REMOVE = f"""UPDATE {COUNTER_TABLE}
+        SET total = total - 1, completed = completed - old.complete
+        WHERE list_id = COALESCE(old.list_id, {PUBLIC_LIST});"""
+
+COUNTER_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTER_TABLE}_ai AFTER INSERT ON {TASK_TABLE}
+    BEGIN
+        {_ADD}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTER_TABLE}_au
+    AFTER UPDATE OF complete, list_id ON {TASK_TABLE}
+    WHEN old.complete IS NOT new.complete OR old.list_id IS NOT new.list_id
+    BEGIN
+        {_REMOVE}
+        {_ADD}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTER_TABLE}_ad AFTER DELETE ON {TASK_TABLE}
+    BEGIN
+        {_REMOVE}
+    END""",
+]
+
+
+class Summary(NamedTuple):
+    completed: int
+    total: int
+
+    def __str__(self) -> str:
+        return f"{self.completed} of {self.total} done"
+
+
+def install_counters(connection) -> bool:
+    """Crée (ou recrée) les triggers des compteurs. False hors SQLite."""
+    if not uses_triggers(connection):
+        return False
+    with connection.cursor() as cursor:
+        for sql in COUNTER_TRIGGERS:
+            cursor.execute(sql)
+    return True
+
+
+def uninstall_counters(connection):
+    if not uses_triggers(connection):
+        return
+    with connection.cursor() as cursor:
+        for suffix in ("ai", "au", "ad"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {COUNTER_TABLE}_{suffix}")
+
+
+def counter_key(list_id) -> int:
+    return PUBLIC_LIST if list_id is None else list_id
+
+
+def list_summary(task_list, using=None) -> Summary:
+    """Tâches terminées et total de ``task_list``, en une ligne lue."""
+    if using is None:
+        using = read_db(shard_for(task_list))
+    key = counter_key(task_list.id if task_list is not None else None)
+    counts = TaskCounter.objects.using(using).filter(list_id=key)
+    row = counts.values_list("completed", "total").first()
+    return Summary(*row) if row else Summary(0, 0)
+
+
+def global_summary() -> Summary:
+    """Toutes listes confondues : une agrégation des compteurs par shard."""
+    completed = total = 0
+    for using in task_shards():
+        sums = TaskCounter.objects.using(using).aggregate(
+            completed=Sum("completed"), total=Sum("total")
+        )
+        completed += sums["completed"] or 0
+        total += sums["total"] or 0
+    return Summary(completed, total)
+
+
+def _counted(tasks):
+    key = Coalesce("list_id", Value(PUBLIC_LIST), output_field=models.BigIntegerField())
+    return (
+        tasks.annotate(key=key)
+        .values("key")
+        .annotate(total=Count("id"), completed=Count("id", filter=Q(complete=True)))
+        .order_by()
+    )
+
+
+def recount_counters(using="default", list_ids=None) -> int:
+    """
+    Recalcule depuis ``tasks_task`` les compteurs de ``using`` (de toutes
+    ses listes, ou des ``list_ids`` donnés, None pour la liste publique).
+    Retourne le nombre de listes dont les compteurs étaient faux.
+    """
+    tasks = Task.objects.using(using)
+    counters = TaskCounter.objects.using(using)
+    if list_ids is not None:
+        keys = [counter_key(list_id) for list_id in list_ids]
+        lists = Q(list_id__in=[key for key in keys if key != PUBLIC_LIST])
+        if PUBLIC_LIST in keys:
+            lists |= Q(list__isnull=True)
+        tasks = tasks.filter(lists)
+        counters = counters.filter(list_id__in=keys)
+
+    with transaction.atomic(using=using):
+        # Écriture d'abord : sur SQLite elle prend le verrou d'écriture, le
+        # décompte qui suit ne peut pas manquer une écriture concurrente
+        empty = counters.exclude(list_id__in=_counted(tasks).values("key"))
+        empty = empty.exclude(total=0, completed=0)
+        fixed = empty._raw_delete(using)
+
+        actual = {
+            row["key"]: (row["total"], row["completed"]) for row in _counted(tasks)
+        }
+        stored = {
+            list_id: (total, completed)
+            for list_id, total, completed in counters.values_list(
+                "list_id", "total", "completed"
+            )
+        }
+        wrong = [
+            TaskCounter(list_id=key, total=total, completed=completed)
+            for key, (total, completed) in actual.items()
+            if stored.get(key) != (total, completed)
+        ]
+        TaskCounter.objects.using(using).bulk_create(
+            wrong,
+            update_conflicts=True,
+            unique_fields=["list_id"],
+            update_fields=["total", "completed"],
+        )
+    return fixed + len(wrong)
+
+
+# --- Sans triggers : variations par liste ---------------------------------
+#
+# Une variation est un dict {clé de liste: (total, terminées)} à ajouter aux
+# compteurs. Les fonctions qui la calculent retournent None quand des
+# triggers tiennent déjà les compteurs de la base.
+
+
+def tracks_counts(using) -> bool:
+    """Vrai si les compteurs de ``using`` sont tenus par l'application."""
+    return not uses_triggers(connections[using])
+
+
+def _add(counts, list_id, total, completed):
+    key = counter_key(list_id)
+    old_total, old_completed = counts.get(key, (0, 0))
+    counts[key] = (old_total + total, old_completed + completed)
+
+
+def counts_of(tasks, using, sign=1) -> Optional[dict]:
+    """Variation pour des tâches en mémoire créées (-1 : supprimées)."""
+    if not tracks_counts(using):
+        return None
+    counts = {}
+    for task in tasks:
+        _add(counts, task.list_id, sign, sign * int(task.complete))
+    return counts
+
+
+def counts_in(tasks, sign=1) -> Optional[dict]:
+    """
+    Variation pour les tâches du queryset, comptées par liste avant leur
+    suppression (``sign=-1``) : seules leurs lignes sont lues.
+    """
+    if not tracks_counts(tasks.db):
+        return None
+    return {
+        row["key"]: (sign * row["total"], sign * row["completed"])
+        for row in _counted(tasks)
+    }
+
+
+def counts_completed(tasks, complete) -> Optional[dict]:
+    """Variation pour les tâches du queryset passées à ``complete``."""
+    changed = counts_in(tasks.exclude(complete=complete))
+    if changed is None:
+        return None
+    sign = 1 if complete else -1
+    return {key: (0, sign * total) for key, (total, _) in changed.items()}
+
+
+def counts_changed(tasks, using) -> Optional[dict]:
+    """
+    Variation pour des tâches modifiées en mémoire, avant leur
+    enregistrement : leur état en base est relu, en une requête.
+    """
+    if not tracks_counts(using):
+        return None
+    stored = Task.objects.using(using).filter(pk__in=[task.pk for task in tasks])
+    stored = {
+        pk: (list_id, complete)
+        for pk, list_id, complete in stored.values_list("pk", "list_id", "complete")
+    }
+    counts = {}
+    for task in tasks:
+        before = stored.get(task.pk)
+        if before is not None and before != (task.list_id, task.complete):
+            _add(counts, before[0], -1, -int(before[1]))
+            _add(counts, task.list_id, 1, int(task.complete))
+    return counts
+
+
+def apply_counts(using, counts):
+    """Ajoute la variation ``counts`` aux compteurs de ``using``."""
+    if not counts:
+        return
+    counters = TaskCounter.objects.using(using)
+    with transaction.atomic(using=using):
+        for key, (total, completed) in counts.items():
+            if not total and not completed:
+                continue
+            delta = {
+                "total": F("total") + total,
+                "completed": F("completed") + completed,
+            }
+            if counters.filter(list_id=key).update(**delta):
+                continue
+            _, created = counters.get_or_create(
+                list_id=key, defaults={"total": total, "completed": completed}
+            )
+            if not created:
+                counters.filter(list_id=key).update(**delta)
+
+
+def remember_counted(task, using, update_fields=None):
+    """Avant l'enregistrement d'une tâche existante : état compté en base."""
+    task._counted = None
+    if task._state.adding or not tracks_counts(using):
+        return
+    counted_fields = {"complete", "list", "list_id"}
+    if update_fields is not None and not counted_fields & set(update_fields):
+        return
+    stored = Task.objects.using(using).filter(pk=task.pk)
+    task._counted = stored.values_list("list_id", "complete").first()
+
+
+def count_saved(task, using, created):
+    if not tracks_counts(using):
+        return
+    if created:
+        counts = counts_of([task], using)
+    else:
+        before = task.__dict__.pop("_counted", None)
+        if before is None or before == (task.list_id, task.complete):
+            return
+        counts = {}
+        _add(counts, before[0], -1, -int(before[1]))
+        _add(counts, task.list_id, 1, int(task.complete))
+    apply_counts(using, counts)
+
+
+def count_deleted(task, using):
+    apply_counts(using, counts_of([task], using, sign=-1))
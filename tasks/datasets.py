@@ -0,0 +1,101 @@
+"""
+Lecture incrémentale des datasets JSON (tableau d'objets) et NDJSON (un
+objet par ligne), sans charger le fichier en mémoire.
+
+Sans dépendance à Django : l'import des tâches (``tasks.utils``) et les
+scripts autonomes comme ``test_report.py`` partagent le même parseur.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Iterator
+
+# Taille des blocs lus dans le fichier lors du parsing incrémental
+READ_CHUNK_SIZE = 64 * 1024
+
+NDJSON_SUFFIXES = {".jsonl", ".ndjson"}
+
+# Espaces et virgules entre deux éléments d'un tableau JSON
+_SEPARATORS = re.compile(r"[\s,]*")
+# Un élément coupé en fin de tampon donne une erreur dans ses derniers
+# caractères (« fals », « \u12 », « 1e+ »...), sauf une chaîne non fermée
+# qui la signale à son guillemet ouvrant ; un nombre coupé (« -4. ») se
+# décode sans erreur mais peut continuer dans le bloc suivant
+_TRUNCATION_MARGIN = 6
+_UNTERMINATED_STRING = "Unterminated string starting at"
+
+
+def _iter_ndjson(f) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _is_malformed(error, length) -> bool:
+    if error.msg == _UNTERMINATED_STRING:
+        return False
+    return length - error.pos > _TRUNCATION_MARGIN
+
+
+def _iter_json_array(f) -> Iterator[dict]:
+    """
+    Parcourt un tableau JSON ``[{...}, {...}]`` élément par élément sans
+    charger tout le fichier : on décode chaque objet dès qu'il est complet
+    dans le tampon, à partir d'une position ; la partie déjà décodée n'est
+    retirée du tampon qu'une fois par bloc lu.
+
+    Une erreur de décodage loin de la fin du tampon ne vient pas d'un objet
+    coupé : elle est levée aussitôt, sans lire la suite du fichier.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Le dataset JSON doit être un tableau d'objets.")
+    pos = 1
+    eof = False
+
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer):
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if eof or _is_malformed(exc, len(buffer)):
+                    raise
+            else:
+                if eof or len(buffer) - end > _TRUNCATION_MARGIN:
+                    yield item
+                    pos = end
+                    continue
+        if eof:
+            raise ValueError("Tableau JSON non terminé.")
+        chunk = f.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_dataset_items(dataset_path: Path) -> Iterator[dict]:
+    """
+    Itère sur les éléments d'un dataset, au format tableau JSON
+    (comme dataset.json) ou NDJSON (un objet par ligne, comme
+    requests.jsonl). La mémoire utilisée ne dépend pas de la taille
+    du fichier.
+    """
+    with dataset_path.open(encoding="utf-8") as f:
+        if dataset_path.suffix.lower() in NDJSON_SUFFIXES:
+            yield from _iter_ndjson(f)
+            return
+
+        # Sans extension explicite on regarde le premier caractère utile
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from _iter_json_array(f)
+        else:
+            yield from _iter_ndjson(f)
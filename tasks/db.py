@@ -0,0 +1,36 @@
+"""
+Réglages de performance SQLite appliqués à chaque nouvelle connexion.
+
+Les PRAGMA du profil ``SQLITE_PROFILE`` (voir ``SQLITE_PROFILES`` dans
+``todo/settings.py``) sont exécutés depuis le signal ``connection_created``.
+Avec ``journal_mode=WAL`` les lecteurs ne bloquent plus l'écrivain (et
+inversement) ; ``busy_timeout`` fait attendre un écrivain concurrent au
+lieu d'échouer immédiatement avec « database is locked ».
+"""
+import re
+
+from django.conf import settings
+
+PRAGMA_NAME_RE = re.compile(r"^[a-z_]+$")
+
+
+def sqlite_pragmas():
+    return settings.SQLITE_PROFILES.get(settings.SQLITE_PROFILE, {})
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME_RE.match(name):
+            raise ValueError(f"PRAGMA invalide : {name!r}")
+        if not isinstance(value, int) and not PRAGMA_NAME_RE.match(value.lower()):
+            raise ValueError(f"Valeur invalide pour PRAGMA {name} : {value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
@@ -0,0 +1,124 @@
+"""
+Client de charge de ``manage.py bench`` et calcul des statistiques.
+
+Ce module n'importe pas Django : les clients tournent dans des processus
+séparés (démarrés en ``spawn``) pour ne pas partager le GIL avec le
+serveur mesuré, et n'ont besoin que de la bibliothèque standard.
+"""
+
+import http.client
+import math
+import time
+from typing import Dict, List, Sequence, Tuple
+
+# En-tête ajouté par le serveur de bench : requêtes SQL de la requête HTTP
+QUERIES_HEADER = "X-Bench-Queries"
+
+# (opération, durée en secondes, statut HTTP, requêtes SQL)
+Sample = Tuple[str, float, int, int]
+
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+# Écart de requêtes SQL par requête HTTP toléré face à une référence : la
+# moyenne de la liste varie avec la proportion de fragments servis depuis
+# le cache, une vraie régression (N+1...) ajoute au moins une requête
+QUERIES_TOLERANCE = 0.5
+
+
+def run_client(args) -> List[Sample]:
+    """
+    Exécute en séquence le plan d'un client contre ``host:port`` et
+    retourne une mesure par requête. Une erreur réseau compte comme un
+    statut 0.
+    """
+    host, port, plan = args
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    samples = []
+    for op, method, path, body in plan:
+        headers = FORM_HEADERS if body is not None else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            queries = int(response.getheader(QUERIES_HEADER, 0))
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status, queries = 0, 0
+        samples.append((op, time.perf_counter() - start, status, queries))
+    conn.close()
+    return samples
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Percentile ``p`` (0-100) par la méthode du rang le plus proche."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _stats(samples: List[Sample], elapsed: float) -> Dict:
+    latencies = sorted(s[1] for s in samples)
+    ok = [s for s in samples if 200 <= s[2] < 400]
+    return {
+        "count": len(samples),
+        "errors": len(samples) - len(ok),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "queries_per_request": round(sum(s[3] for s in ok) / len(ok), 2)
+        if ok
+        else None,
+    }
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict:
+    """Statistiques globales et par opération d'une exécution."""
+    by_op = {}
+    for sample in samples:
+        by_op.setdefault(sample[0], []).append(sample)
+    summary = _stats(samples, elapsed) if samples else {"count": 0}
+    summary["endpoints"] = {
+        op: _stats(op_samples, elapsed) for op, op_samples in sorted(by_op.items())
+    }
+    return summary
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """
+    Régressions de ``report`` par rapport à ``baseline`` (même format) :
+    p95 plus lent de plus de ``max_regression`` (0.2 = 20 %), ou plus de
+    requêtes SQL par requête HTTP, pour une même taille et opération.
+    """
+    base_runs = {run["size"]: run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in report["runs"]:
+        base_run = base_runs.get(run["size"])
+        if base_run is None:
+            continue
+        for op, stats in run["endpoints"].items():
+            base = base_run["endpoints"].get(op)
+            if base is None:
+                continue
+            limit = base["p95_ms"] * (1 + max_regression)
+            if stats["p95_ms"] > limit:
+                regressions.append(
+                    f"{run['size']} tâches, {op} : p95 {stats['p95_ms']} ms "
+                    f"> {base['p95_ms']} ms (+{max_regression:.0%} max)"
+                )
+            queries, base_queries = (
+                stats["queries_per_request"],
+                base["queries_per_request"],
+            )
+            if None in (queries, base_queries):
+                continue
+            if queries > base_queries + QUERIES_TOLERANCE:
+                regressions.append(
+                    f"{run['size']} tâches, {op} : {queries} requêtes SQL "
+                    f"par requête > {base_queries}"
+                )
+    return regressions
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.archive import archive_config, archive_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les tâches terminées anciennes vers la table d'archive, "
+        "par lots d'une transaction chacun."
+    )
+
+    def add_arguments(self, parser):
+        config = archive_config()
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=config["AFTER_DAYS"],
+            help=(
+                "Âge minimal (jours depuis la création) des tâches terminées "
+                f"à archiver (défaut : {config['AFTER_DAYS']})."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=config["BATCH_SIZE"],
+            help=f"Tâches par transaction (défaut : {config['BATCH_SIZE']}).",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            metavar="SECONDES",
+            help="Relance l'archivage toutes les SECONDES secondes (sans fin).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 0:
+            raise CommandError("--days doit être >= 0")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size doit être >= 1")
+        if options["every"] is not None and options["every"] <= 0:
+            raise CommandError("--every doit être > 0")
+
+        while True:
+            self.run_once(options)
+            if options["every"] is None:
+                return
+            # Ne garde pas la connexion ouverte entre deux passages
+            connections.close_all()
+            time.sleep(options["every"])
+
+    def run_once(self, options):
+        start = time.perf_counter()
+
+        def on_batch(total):
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {total} tâches")
+
+        count = archive_tasks(options["days"], options["batch_size"], on_batch=on_batch)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f"{count} tâches archivées en {elapsed:.2f}s")
+        )
@@ -0,0 +1,300 @@
+import json
+import multiprocessing
+import platform
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.db import connections, transaction
+from django.db.models import Max, Min
+
+from tasks.loadtest import QUERIES_HEADER, compare, run_client, summarize
+from tasks.models import Task
+from tasks.signals import tasks_bulk_changed
+
+SEED_BATCH_SIZE = 10000
+
+# Part de chaque opération dans la charge (poids relatifs)
+DEFAULT_MIX = "list=70,create=10,update=10,delete=10"
+OPERATIONS = ("list", "create", "update", "delete")
+
+
+class BenchRequest(WSGIRequest):
+    # Les clients de charge n'ont pas de jeton CSRF (comme le Client de test)
+    _dont_enforce_csrf_checks = True
+
+
+class BenchWSGIHandler(WSGIHandler):
+    """Ajoute à chaque réponse le nombre de requêtes SQL exécutées."""
+
+    request_class = BenchRequest
+
+    def __call__(self, environ, start_response):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            headers.append((QUERIES_HEADER, str(queries[0])))
+            return start_response(status, headers, exc_info)
+
+        with connections["default"].execute_wrapper(count):
+            return super().__call__(environ, start)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    Serveur WSGI à nombre fixe de threads, comme un worker gunicorn
+    ``gthread`` : chaque thread garde sa connexion à la base d'une requête
+    à l'autre (CONN_MAX_AGE), contrairement au serveur de runserver qui
+    crée un thread et une connexion par requête.
+    """
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            threads, thread_name_prefix="bench-server", initializer=self._connect
+        )
+
+    def _connect(self):
+        # Connexion ouverte (PRAGMA compris) avant de compter les requêtes,
+        # et partagée pour pouvoir la fermer depuis server_close()
+        connection = connections["default"]
+        connection.ensure_connection()
+        connection.inc_thread_sharing()
+        with self._lock:
+            self._connections.append(connection)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+        for connection in self._connections:
+            connection.close()
+            connection.dec_thread_sharing()
+
+
+def seed(size):
+    """Complète la table jusqu'à ``size`` tâches (une sur trois terminée)."""
+    existing = Task.objects.count()
+    for start in range(existing, size, SEED_BATCH_SIZE):
+        stop = min(start + SEED_BATCH_SIZE, size)
+        with transaction.atomic():
+            Task.objects.bulk_create(
+                Task(title=f"Bench task {i}", complete=i % 3 == 0)
+                for i in range(start, stop)
+            )
+    tasks_bulk_changed.send(sender=Task, op="seed", count=size - existing)
+
+
+def parse_mix(value):
+    weights = {}
+    for part in value.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise CommandError(f"Opération inconnue dans --mix : {op!r}")
+        try:
+            weights[op] = float(weight)
+        except ValueError:
+            raise CommandError(f"Poids invalide dans --mix : {part!r}")
+    return weights
+
+
+def build_plans(clients, requests, mix, seed_value, id_range):
+    """
+    Plan de requêtes de chaque client, reproductible pour une même graine.
+    Les suppressions prennent des ids distincts en haut de la table ; les
+    mises à jour visent le reste, qui n'est jamais supprimé.
+    """
+    rng = random.Random(seed_value)
+    ops, weights = zip(*mix.items())
+    chosen = [rng.choices(ops, weights, k=requests) for _ in range(clients)]
+
+    low, high = id_range
+    deletes = sum(client_ops.count("delete") for client_ops in chosen)
+    if deletes * 2 > high - low + 1:
+        raise CommandError(
+            "Pas assez de tâches pour ce plan : augmentez la taille ou "
+            "réduisez --requests / la part de delete."
+        )
+    delete_ids = iter(range(high, high - deletes, -1))
+    update_high = high - deletes
+
+    plans = []
+    for client, client_ops in enumerate(chosen):
+        plan = []
+        for n, op in enumerate(client_ops):
+            if op == "list":
+                plan.append((op, "GET", "/", None))
+            elif op == "create":
+                body = urlencode({"title": f"Bench create {client}-{n}"})
+                plan.append((op, "POST", "/", body))
+            elif op == "update":
+                pk = rng.randint(low, update_high)
+                body = urlencode({"title": f"Bench update {client}-{n}"})
+                plan.append((op, "POST", f"/update_task/{pk}/", body))
+            else:
+                plan.append((op, "POST", f"/delete_task/{next(delete_ids)}/", ""))
+        plans.append(plan)
+    return plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de charge des vues de la todo-list sur une base temporaire "
+        "remplie à la taille demandée : latences p50/p95/p99, débit et "
+        "requêtes SQL par requête, en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help="Nombres de tâches à tester (une base neuve par taille).",
+        )
+        parser.add_argument("--clients", type=int, default=8)
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requêtes par client."
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            help="Threads du serveur (défaut : nombre de clients).",
+        )
+        parser.add_argument("--mix", default=DEFAULT_MIX)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", type=Path, help="Fichier JSON de sortie.")
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            help="Rapport précédent : échoue en cas de régression.",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="Hausse de p95 tolérée face à --baseline (0.2 = 20 %%).",
+        )
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["requests"] < 1:
+            raise CommandError("--clients et --requests doivent être >= 1")
+        mix = parse_mix(options["mix"])
+        threads = options["threads"] or options["clients"]
+
+        report = {
+            "version": settings.VERSION,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite_profile": getattr(settings, "SQLITE_PROFILE", None),
+            "views_mode": settings.TASKS_VIEWS_MODE,
+            "clients": options["clients"],
+            "requests_per_client": options["requests"],
+            "server_threads": threads,
+            "mix": mix,
+            "runs": [],
+        }
+
+        # Processus clients démarrés avant le serveur (pas de fork + threads)
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(options["clients"]) as pool:
+            for size in options["sizes"]:
+                self.stderr.write(f"Bench sur {size} tâches...")
+                run = self.run_size(pool, size, mix, threads, options)
+                report["runs"].append(run)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(output + "\n", encoding="utf-8")
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            baseline = json.loads(options["baseline"].read_text(encoding="utf-8"))
+            regressions = compare(report, baseline, options["max_regression"])
+            if regressions:
+                raise CommandError("Régressions :\n" + "\n".join(regressions))
+
+    def run_size(self, pool, size, mix, threads, options):
+        connection = connections["default"]
+        with tempfile.TemporaryDirectory() as tmp:
+            # Base de test sur disque (pas en mémoire) : le serveur l'ouvre
+            # depuis ses propres threads, comme en production
+            test_settings = connection.settings_dict.setdefault("TEST", {})
+            old_test_name = test_settings.get("NAME")
+            test_settings["NAME"] = str(Path(tmp) / "bench.sqlite3")
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                seed(size)
+                bounds = Task.objects.aggregate(low=Min("id"), high=Max("id"))
+                plans = build_plans(
+                    options["clients"],
+                    options["requests"],
+                    mix,
+                    options["seed"],
+                    (bounds["low"], bounds["high"]),
+                )
+                connection.close()
+                samples, elapsed = self.drive(pool, plans, threads, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings["NAME"] = old_test_name
+
+        run = {"size": size, "duration_s": round(elapsed, 3)}
+        run.update(summarize(samples, elapsed))
+        return run
+
+    def drive(self, pool, plans, threads, options):
+        server = PooledWSGIServer(
+            ("127.0.0.1", 0), QuietHandler, allow_reuse_address=False, threads=threads
+        )
+        server.set_app(BenchWSGIHandler())
+        host, port = server.server_address
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            if options["warmup"]:
+                warmup = [("list", "GET", "/", None)] * options["warmup"]
+                pool.map(run_client, [(host, port, warmup)] * len(plans))
+            start = time.perf_counter()
+            results = pool.map(run_client, [(host, port, plan) for plan in plans])
+            elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        samples = [sample for client in results for sample in client]
+        return samples, elapsed
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.db import apply_pragmas
+
+READ_SQL = "SELECT id, title, complete FROM bench_task ORDER BY id DESC LIMIT 50"
+WRITE_SQL = "INSERT INTO bench_task (title, complete) VALUES (?, 0)"
+
+
+def _connect(path, pragmas, timeout):
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    apply_pragmas(conn.cursor(), pragmas)
+    return conn
+
+
+def _seed(path, pragmas, rows):
+    conn = _connect(path, pragmas, timeout=5)
+    conn.execute(
+        "CREATE TABLE bench_task ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, complete BOOL)"
+    )
+    conn.executemany(
+        "INSERT INTO bench_task (title, complete) VALUES (?, 0)",
+        ((f"Seed {i}",) for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_profile(name, pragmas, readers, writers, duration, timeout, seed_rows):
+    """
+    Lance ``readers`` + ``writers`` threads pendant ``duration`` secondes sur
+    une base neuve, chaque thread ayant sa propre connexion (comme des
+    workers), et compte les opérations réussies et les erreurs de verrou.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / f"bench_{name}.sqlite3")
+        _seed(path, pragmas, seed_rows)
+
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+        start = threading.Event()
+        deadline = [0.0]
+
+        def worker(kind):
+            conn = _connect(path, pragmas, timeout)
+            done = locked = 0
+            start.wait()
+            while time.perf_counter() < deadline[0]:
+                try:
+                    if kind == "reads":
+                        conn.execute(READ_SQL).fetchall()
+                    else:
+                        conn.execute(WRITE_SQL, ("Bench task",))
+                        conn.commit()
+                    done += 1
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    locked += 1
+            conn.close()
+            with lock:
+                counts[kind] += done
+                counts["locked"] += locked
+
+        threads = [
+            threading.Thread(target=worker, args=("reads",)) for _ in range(readers)
+        ] + [threading.Thread(target=worker, args=("writes",)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        deadline[0] = time.perf_counter() + duration
+        start.set()
+        for thread in threads:
+            thread.join()
+
+    return {
+        "profile": name,
+        "pragmas": pragmas,
+        "reads_per_s": round(counts["reads"] / duration, 1),
+        "writes_per_s": round(counts["writes"] / duration, 1),
+        "locked_errors": counts["locked"],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit lecture/écriture concurrent de SQLite entre les "
+        "profils de SQLITE_PROFILES (sur des bases temporaires)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "profiles",
+            nargs="*",
+            help="Profils à comparer (défaut : tous ceux de SQLITE_PROFILES).",
+        )
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=3.0)
+        parser.add_argument("--seed-rows", type=int, default=10000)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5.0,
+            help="Timeout du verrou côté driver Python (s).",
+        )
+
+    def handle(self, *args, **options):
+        names = options["profiles"] or list(settings.SQLITE_PROFILES)
+        unknown = [n for n in names if n not in settings.SQLITE_PROFILES]
+        if unknown:
+            raise CommandError(f"Profils inconnus : {', '.join(unknown)}")
+
+        results = [
+            run_profile(
+                name,
+                settings.SQLITE_PROFILES[name],
+                options["readers"],
+                options["writers"],
+                options["duration"],
+                options["timeout"],
+                options["seed_rows"],
+            )
+            for name in names
+        ]
+        self.stdout.write(json.dumps(results, indent=2))
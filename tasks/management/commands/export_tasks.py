@@ -0,0 +1,70 @@
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.utils import (
+    DEFAULT_EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    export_format_for,
+    export_tasks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte les tâches en JSON (format de dataset.json), NDJSON ou CSV, "
+        "éventuellement compressé en gzip, en flux et à mémoire constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            type=Path,
+            help=(
+                "Fichier de sortie (sortie standard par défaut). Le format et "
+                "la compression sont déduits de l'extension : .json, .ndjson, "
+                ".csv, suivie éventuellement de .gz."
+            ),
+        )
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS))
+        parser.add_argument(
+            "--gzip", action="store_true", help="Compresse la sortie en gzip."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_EXPORT_CHUNK_SIZE,
+            help=(
+                "Lignes lues par aller-retour avec la base "
+                f"(défaut : {DEFAULT_EXPORT_CHUNK_SIZE})."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt, compress = export_format_for(path) if path else (None, False)
+        fmt = options["format"] or fmt or "json"
+        compress = options["gzip"] or compress
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size doit être >= 1")
+
+        if path is None:
+            export_tasks(sys.stdout.buffer, fmt, compress, options["chunk_size"])
+            return
+
+        start = time.perf_counter()
+        try:
+            with path.open("wb") as out:
+                count = export_tasks(out, fmt, compress, options["chunk_size"])
+        except OSError as exc:
+            raise CommandError(f"Écriture impossible : {exc}") from exc
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} tâches exportées dans {path} en {elapsed:.2f}s"
+            )
+        )
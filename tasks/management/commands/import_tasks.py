@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.utils import (
+    DEFAULT_IMPORT_BATCH_SIZE,
+    default_dataset_path,
+    import_tasks_streaming,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des tâches depuis un fichier JSON (tableau) ou NDJSON, "
+        "en flux et par lots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            type=Path,
+            help="Fichier à importer (dataset.json par défaut).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_IMPORT_BATCH_SIZE,
+            help=f"Lignes par transaction (défaut : {DEFAULT_IMPORT_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or default_dataset_path()
+        batch_size = options["batch_size"]
+        if not path.exists():
+            raise CommandError(f"Fichier introuvable : {path}")
+        if batch_size < 1:
+            raise CommandError("--batch-size doit être >= 1")
+
+        start = time.perf_counter()
+
+        def on_batch(total):
+            if options["verbosity"] >= 2:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"  {total} tâches ({_rate(total, elapsed)}/s)")
+
+        try:
+            count = import_tasks_streaming(path, batch_size, on_batch=on_batch)
+        except (KeyError, ValueError) as exc:
+            raise CommandError(f"Dataset invalide : {exc!r}") from exc
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} tâches importées en {elapsed:.2f}s "
+                f"({_rate(count, elapsed)} lignes/s)"
+            )
+        )
+
+
+def _rate(count, elapsed):
+    if elapsed <= 0:
+        return "-"
+    return f"{count / elapsed:.0f}"
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import TaskList
+from tasks.shards import move_list, shard_for, task_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace une liste de tâches (et son archive) vers un autre shard de "
+        "TASK_SHARDS. Les tâches déplacées reçoivent de nouveaux ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("list_id", type=int, help="Id de la liste (TaskList).")
+        parser.add_argument("shard", help="Alias de la base de destination.")
+
+    def handle(self, *args, **options):
+        try:
+            task_list = TaskList.objects.get(id=options["list_id"])
+        except TaskList.DoesNotExist:
+            raise CommandError(f"Liste introuvable : {options['list_id']}")
+        target = options["shard"]
+        if target not in task_shards():
+            raise CommandError(
+                f"Shard inconnu : {target} (TASK_SHARDS : {', '.join(task_shards())})"
+            )
+        source = shard_for(task_list)
+        if source == target:
+            self.stdout.write(f"La liste est déjà sur {target}")
+            return
+
+        start = time.perf_counter()
+
+        def on_batch(total):
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {total} tâches copiées")
+
+        count = move_list(task_list, target, on_batch=on_batch)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} tâches déplacées de {source} vers {target} en {elapsed:.2f}s"
+            )
+        )
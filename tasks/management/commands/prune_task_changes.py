@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.changes import prune_changes
+from tasks.shards import task_shards
+
+DEFAULT_KEEP = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge le journal des modifications de tâches (flux SSE) de chaque "
+        "shard en gardant ses entrées les plus récentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=DEFAULT_KEEP,
+            help=f"Entrées conservées par shard (défaut : {DEFAULT_KEEP}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["keep"] < 1:
+            raise CommandError("--keep doit être >= 1")
+        count = sum(prune_changes(options["keep"], using) for using in task_shards())
+        self.stdout.write(self.style.SUCCESS(f"{count} entrées supprimées"))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.counters import global_summary, recount_counters
+from tasks.shards import task_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs de tâches (total, terminées) de chaque liste "
+        "à partir de la table des tâches, sur chaque shard."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        fixed = 0
+        for using in task_shards():
+            count = recount_counters(using)
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {using} : {count} listes corrigées")
+            fixed += count
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{fixed} listes corrigées en {elapsed:.2f}s ({global_summary()})"
+            )
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.replicas import replica_aliases, replica_lag, sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Rafraîchit les répliques de lecture (TASKS_REPLICAS) par une "
+        "sauvegarde en ligne de la base principale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases",
+            nargs="*",
+            help="Répliques à rafraîchir (toutes par défaut).",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            metavar="SECONDES",
+            help="Relance la synchronisation toutes les SECONDES secondes (sans fin).",
+        )
+
+    def handle(self, *args, **options):
+        configured = replica_aliases()
+        aliases = options["aliases"] or configured
+        unknown = sorted(set(aliases) - set(configured))
+        if unknown:
+            raise CommandError(f"Répliques inconnues : {', '.join(unknown)}")
+        if not aliases:
+            raise CommandError("Aucune réplique configurée (TASKS_REPLICAS)")
+        if options["every"] is not None and options["every"] <= 0:
+            raise CommandError("--every doit être > 0")
+
+        while True:
+            for alias in aliases:
+                start = time.perf_counter()
+                sync_replica(alias)
+                elapsed = time.perf_counter() - start
+                if options["verbosity"] >= 1:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"{alias} synchronisée en {elapsed:.2f}s "
+                            f"(retard : {replica_lag(alias):.2f}s)"
+                        )
+                    )
+            if options["every"] is None:
+                return
+            time.sleep(options["every"])
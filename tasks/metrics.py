@@ -0,0 +1,481 @@
+"""
+Métriques au format texte Prometheus, exposées sur ``/metrics``.
+
+- ``todo_task_writes_total{op}`` : créations / mises à jour / suppressions,
+  comptées depuis les signaux du modèle (les vues enregistrent les
+  ``TaskForm`` via ``save()``, donc ``post_save``) et depuis
+  ``tasks_bulk_changed`` pour les opérations groupées ;
+- ``todo_request_duration_seconds{view}`` : histogramme de latence par nom
+  d'URL, et ``todo_db_queries_total{view}`` (``MetricsMiddleware``) ;
+- ``todo_db_connections_opened_total`` : connexions ouvertes à la base ;
+- ``todo_list_cache_requests_total{result}`` et le ratio de hits ;
+- ``todo_tasks{complete}`` (compteurs de tasks.counters, sans compter
+  ``tasks_task``) et ``todo_db_size_bytes``, lus à chaque scrape.
+
+Désactivé par défaut (``TODO_METRICS=1`` pour l'activer). ``/metrics`` ne
+répond qu'aux adresses de ``TASKS_METRICS["ALLOWED_IPS"]`` (le serveur
+Prometheus ; boucle locale par défaut) et aux membres du staff.
+
+Multi-processus : chaque processus écrit ses valeurs (float64) dans son
+propre fichier ``<pid>.db`` mappé en mémoire sous ``TASKS_METRICS["DIR"]``.
+Une écriture ne prend que le verrou du processus, jamais celui d'un autre ;
+``/metrics`` additionne les fichiers de tous les processus, y compris ceux
+des workers terminés (les compteurs ne doivent pas redescendre). Le
+répertoire doit donc être vidé au démarrage du serveur. Sans ``DIR`` les
+valeurs restent dans une zone mémoire anonyme, propre au processus.
+"""
+
+import bisect
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+from .profiling import request_url_name
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HEADER = struct.Struct("<II")  # octets utilisés, réservé
+KEY_LENGTH = struct.Struct("<I")
+VALUE = struct.Struct("<d")
+INITIAL_SIZE = 64 * 1024
+
+DEFAULT_ALLOWED_IPS = ("127.0.0.1", "::1")
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(value)
+
+
+def _padded(length):
+    # Longueur de clé + bourrage pour que la valeur soit alignée sur 8 octets
+    return (KEY_LENGTH.size + length + 7) // 8 * 8 - KEY_LENGTH.size
+
+
+def _read_entries(data, used=None):
+    """(clé, position de la valeur, valeur) de chaque entrée."""
+    if used is None:
+        used = HEADER.unpack_from(data, 0)[0]
+    pos = HEADER.size
+    while pos < used:
+        (length,) = KEY_LENGTH.unpack_from(data, pos)
+        pos += KEY_LENGTH.size
+        key = bytes(data[pos : pos + length]).decode("utf-8")
+        pos += _padded(length)
+        yield key, pos, VALUE.unpack_from(data, pos)[0]
+        pos += VALUE.size
+
+
+class MetricsFile:
+    """
+    Valeurs d'un processus dans un mmap (fichier, ou anonyme si ``path`` est
+    None). Format : en-tête ``[u32 octets utilisés][u32]`` puis des entrées
+    ``[u32 longueur][clé utf-8 + bourrage][float64]``. L'en-tête n'est mis
+    à jour qu'une fois l'entrée écrite : un lecteur ne voit jamais d'entrée
+    partielle.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+        if path is None:
+            self._capacity = INITIAL_SIZE
+            self._mmap = mmap.mmap(-1, self._capacity)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._capacity = max(os.fstat(self._fd).st_size, INITIAL_SIZE)
+            os.ftruncate(self._fd, self._capacity)
+            self._mmap = mmap.mmap(self._fd, self._capacity)
+        self._used = HEADER.unpack_from(self._mmap, 0)[0] or HEADER.size
+        self._positions = {
+            key: pos for key, pos, _ in _read_entries(self._mmap, self._used)
+        }
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if self._fd is None:
+            grown = mmap.mmap(-1, capacity)
+            grown[: self._used] = self._mmap[: self._used]
+        else:
+            os.ftruncate(self._fd, capacity)
+            grown = mmap.mmap(self._fd, capacity)
+        self._mmap.close()
+        self._mmap = grown
+        self._capacity = capacity
+
+    def _allocate(self, key):
+        encoded = key.encode("utf-8")
+        length = len(encoded)
+        value_pos = self._used + KEY_LENGTH.size + _padded(length)
+        end = value_pos + VALUE.size
+        if end > self._capacity:
+            self._grow(end)
+        KEY_LENGTH.pack_into(self._mmap, self._used, length)
+        start = self._used + KEY_LENGTH.size
+        self._mmap[start : start + length] = encoded
+        VALUE.pack_into(self._mmap, value_pos, 0.0)
+        self._used = end
+        HEADER.pack_into(self._mmap, 0, self._used, 0)
+        self._positions[key] = value_pos
+        return value_pos
+
+    def inc_many(self, increments):
+        with self._lock:
+            for key, amount in increments:
+                pos = self._positions.get(key)
+                if pos is None:
+                    pos = self._allocate(key)
+                (value,) = VALUE.unpack_from(self._mmap, pos)
+                VALUE.pack_into(self._mmap, pos, value + amount)
+
+    def items(self):
+        with self._lock:
+            return [(k, v) for k, _, v in _read_entries(self._mmap, self._used)]
+
+
+def metrics_config():
+    return getattr(settings, "TASKS_METRICS", {})
+
+
+def metrics_enabled():
+    return metrics_config().get("ENABLED", False)
+
+
+def metrics_allowed(request):
+    """Adresse autorisée (REMOTE_ADDR, réseaux acceptés) ou membre du staff."""
+    networks = metrics_config().get("ALLOWED_IPS", DEFAULT_ALLOWED_IPS)
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        address = None
+    if address is not None and any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in networks
+        if network.strip()
+    ):
+        return True
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+def metrics_dir():
+    directory = metrics_config().get("DIR")
+    return Path(directory) if directory else None
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MetricsFile:
+    """Fichier du processus courant (recréé après un fork)."""
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                directory = metrics_dir()
+                path = None
+                if directory is not None:
+                    directory.mkdir(parents=True, exist_ok=True)
+                    path = directory / f"{pid}.db"
+                _store = MetricsFile(path)
+                _store_pid = pid
+    return _store
+
+
+def reset_store():
+    global _store, _store_pid
+    with _store_lock:
+        _store = _store_pid = None
+
+
+def _key(sample, labels):
+    return json.dumps([sample, sorted(labels.items())], separators=(",", ":"))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {name}
+        self._keys = {}
+
+    def _sample_key(self, sample, labels):
+        cache_key = (sample, tuple(sorted(labels.items())))
+        key = self._keys.get(cache_key)
+        if key is None:
+            if set(labels) - {"le"} != set(self.labelnames):
+                raise ValueError(
+                    f"Labels attendus pour {self.name} : {self.labelnames}"
+                )
+            key = self._keys[cache_key] = _key(sample, labels)
+        return key
+
+    def inc(self, amount=1, **labels):
+        if metrics_enabled():
+            get_store().inc_many([(self._sample_key(self.name, labels), amount)])
+
+
+class Histogram(Counter):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        self.samples = {f"{name}_bucket", f"{name}_sum", f"{name}_count"}
+
+    def observe(self, value, **labels):
+        if not metrics_enabled():
+            return
+        # Compte par intervalle (non cumulé) : les cumuls sont faits au scrape
+        le = self.bounds[bisect.bisect_left(self.buckets, value)]
+        get_store().inc_many(
+            [
+                (self._sample_key(f"{self.name}_bucket", {**labels, "le": le}), 1),
+                (self._sample_key(f"{self.name}_sum", labels), value),
+                (self._sample_key(f"{self.name}_count", labels), 1),
+            ]
+        )
+
+
+TASK_WRITES = Counter(
+    "todo_task_writes_total", "Tâches créées, modifiées ou supprimées.", ["op"]
+)
+REQUEST_DURATION = Histogram(
+    "todo_request_duration_seconds", "Durée des requêtes HTTP par vue.", ["view"]
+)
+DB_QUERIES = Counter("todo_db_queries_total", "Requêtes SQL par vue.", ["view"])
+DB_CONNECTIONS = Counter(
+    "todo_db_connections_opened_total", "Connexions ouvertes à la base.", ["alias"]
+)
+LIST_CACHE_REQUESTS = Counter(
+    "todo_list_cache_requests_total",
+    "Lectures du fragment de liste en cache.",
+    ["result"],
+)
+
+METRICS = [
+    TASK_WRITES,
+    REQUEST_DURATION,
+    DB_QUERIES,
+    DB_CONNECTIONS,
+    LIST_CACHE_REQUESTS,
+]
+
+# Opérations de tasks_bulk_changed -> op de TASK_WRITES
+BULK_OPS = {
+    "create": "create",
+    "import": "create",
+    "seed": "create",
+    "update": "update",
+    "delete": "delete",
+    "archive": "archive",
+}
+
+
+def count_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc(alias=connection.alias)
+
+
+class _QueryCount:
+    """``execute_wrapper`` qui compte les requêtes SQL de la requête HTTP."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        count = _QueryCount()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self._wrap_connections(stack, count)
+            response = self.get_response(request)
+        self._record(request, start, count)
+        return response
+
+    async def __acall__(self, request):
+        # Les connexions sont propres à un thread : le wrapper est posé dans
+        # celui où sync_to_async exécute l'ORM pour cette requête
+        count = _QueryCount()
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self._wrap_connections)(stack, count)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._record(request, start, count)
+        return response
+
+    def _wrap_connections(self, stack, count):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count))
+
+    def _record(self, request, start, count):
+        view = request_url_name(request)
+        REQUEST_DURATION.observe(time.perf_counter() - start, view=view)
+        if count.queries:
+            DB_QUERIES.inc(count.queries, view=view)
+
+
+# --- Exposition ---------------------------------------------------------
+
+
+def collect():
+    """Valeurs additionnées de tous les processus : {(sample, labels): valeur}."""
+    directory = metrics_dir()
+    if directory is None:
+        sources = [get_store().items()]
+    else:
+        get_store()  # garantit que le fichier du processus existe
+        sources = [
+            [(k, v) for k, _, v in _read_entries(path.read_bytes())]
+            for path in sorted(directory.glob("*.db"))
+        ]
+    totals = {}
+    for items in sources:
+        for key, value in items:
+            sample, labels = json.loads(key)
+            ident = (sample, tuple(tuple(pair) for pair in labels))
+            totals[ident] = totals.get(ident, 0.0) + value
+    return totals
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _line(sample, labels, value):
+    if labels:
+        rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        return f"{sample}{{{rendered}}} {_format_value(value)}"
+    return f"{sample} {_format_value(value)}"
+
+
+def _header(lines, name, documentation, type_):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {type_}")
+
+
+def _render_histogram(metric, values, lines):
+    series = {}
+    for (sample, labels), value in values.items():
+        if sample not in metric.samples:
+            continue
+        base = tuple(pair for pair in labels if pair[0] != "le")
+        entry = series.setdefault(base, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        if sample.endswith("_bucket"):
+            entry["buckets"][dict(labels)["le"]] = value
+        elif sample.endswith("_sum"):
+            entry["sum"] = value
+        else:
+            entry["count"] = value
+    for base, entry in sorted(series.items()):
+        cumulative = 0.0
+        for le in metric.bounds:
+            cumulative += entry["buckets"].get(le, 0.0)
+            labels = tuple(sorted(base + (("le", le),)))
+            lines.append(_line(f"{metric.name}_bucket", labels, cumulative))
+        lines.append(_line(f"{metric.name}_sum", base, entry["sum"]))
+        lines.append(_line(f"{metric.name}_count", base, entry["count"]))
+
+
+def _table_gauges(lines):
+    from .counters import global_summary
+    from .shards import task_shards
+
+    summary = global_summary()
+    sizes = {}
+    for alias in task_shards():
+        connection = connections[alias]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA page_count")
+                pages = cursor.fetchone()[0]
+                cursor.execute("PRAGMA page_size")
+                sizes[alias] = pages * cursor.fetchone()[0]
+
+    _header(lines, "todo_tasks", "Tâches non archivées (tous shards).", "gauge")
+    open_tasks = summary.total - summary.completed
+    lines.append(_line("todo_tasks", (("complete", "false"),), open_tasks))
+    lines.append(_line("todo_tasks", (("complete", "true"),), summary.completed))
+    if sizes:
+        _header(lines, "todo_db_size_bytes", "Taille du fichier SQLite.", "gauge")
+        for alias, size in sizes.items():
+            lines.append(_line("todo_db_size_bytes", (("db", alias),), size))
+
+
+def render_metrics() -> str:
+    values = collect()
+    lines = []
+    for metric in METRICS:
+        _header(lines, metric.name, metric.documentation, metric.type)
+        if isinstance(metric, Histogram):
+            _render_histogram(metric, values, lines)
+            continue
+        for (sample, labels), value in sorted(values.items()):
+            if sample == metric.name:
+                lines.append(_line(sample, labels, value))
+
+    hits = values.get((LIST_CACHE_REQUESTS.name, (("result", "hit"),)), 0.0)
+    misses = values.get((LIST_CACHE_REQUESTS.name, (("result", "miss"),)), 0.0)
+    _header(
+        lines,
+        "todo_list_cache_hit_ratio",
+        "Part des lectures de la liste servies par le cache.",
+        "gauge",
+    )
+    ratio = hits / (hits + misses) if hits + misses else 0.0
+    lines.append(_line("todo_list_cache_hit_ratio", (), round(ratio, 4)))
+
+    _table_gauges(lines)
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    if not metrics_enabled():
+        raise Http404("Métriques désactivées")
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ['created', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created', 'id'], name='task_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', False)), fields=['created', 'id'], name='task_open_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', True)), fields=['created', 'id'], name='task_done_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:04
+
+from django.db import migrations, models
+
+from tasks.changes import install_change_log, uninstall_change_log
+
+
+def forwards(apps, schema_editor):
+    install_change_log(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    uninstall_change_log(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(null=True)),
+                ('op', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('delete', 'delete'), ('reload', 'reload')], max_length=6)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
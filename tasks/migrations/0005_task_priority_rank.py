@@ -0,0 +1,78 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:11
+
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from tasks.changes import install_change_log
+from tasks.ranking import MIDDLE, RANK_WIDTH
+from tasks.search import install_fts
+import tasks.ranking
+
+
+def reinstall_triggers(apps, schema_editor):
+    # SQLite reconstruit tasks_task pour ajouter les colonnes : ses triggers
+    # (recherche plein texte, journal des modifications) sont supprimés
+    install_fts(schema_editor.connection)
+    install_change_log(schema_editor.connection)
+
+
+def set_initial_ranks(apps, schema_editor):
+    # Tâches existantes dans l'ordre des ids, avant toute nouvelle tâche
+    # (même forme que tasks.ranking.initial_rank, en décimal), en un UPDATE
+    Task = apps.get_model("tasks", "Task")
+    Task.objects.using(schema_editor.connection.alias).update(
+        rank=Concat(
+            LPad(Cast("id", CharField()), RANK_WIDTH, Value("0")),
+            Value(MIDDLE),
+            output_field=CharField(),
+        )
+    )
+    reinstall_triggers(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_taskchange'),
+    ]
+
+    operations = [
+        # En sens inverse : exécuté en dernier, après la reconstruction
+        migrations.RunPython(migrations.RunPython.noop, reinstall_triggers),
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ['-priority', 'rank', 'id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_open_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_done_created_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(default=tasks.ranking.new_rank, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-priority', 'rank', 'id'], name='task_priority_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', False)), fields=['-priority', 'rank', 'id'], name='task_open_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', True)), fields=['-priority', 'rank', 'id'], name='task_done_rank_idx'),
+        ),
+        migrations.RunPython(set_initial_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_priority_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('complete', models.BooleanField(default=True)),
+                ('priority', models.BooleanField(default=False)),
+                ('created', models.DateTimeField()),
+                ('archived', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-archived', '-id'],
+                'indexes': [models.Index(fields=['-archived', '-id'], name='archive_archived_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0006_taskarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('shard', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_priority_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_open_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_done_rank_idx',
+        ),
+        migrations.AddField(
+            model_name='taskarchive',
+            name='list_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='tasklist',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_lists', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='list',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='tasks', to='tasks.tasklist'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', '-priority', 'rank', 'id'], name='task_list_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', False)), fields=['list', '-priority', 'rank', 'id'], name='task_list_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('complete', True)), fields=['list', '-priority', 'rank', 'id'], name='task_list_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskarchive',
+            index=models.Index(fields=['list_id', '-archived', '-id'], name='archive_list_idx'),
+        ),
+    ]
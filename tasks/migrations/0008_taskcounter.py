@@ -0,0 +1,39 @@
+# Generated by Django 4.2.26 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+from tasks.counters import install_counters, uninstall_counters
+
+
+def forwards(apps, schema_editor):
+    # Compteurs des tâches existantes, puis triggers (même transaction)
+    schema_editor.execute(
+        "INSERT INTO tasks_taskcounter (list_id, total, completed) "
+        "SELECT COALESCE(list_id, 0), COUNT(*), "
+        "COUNT(CASE WHEN complete THEN 1 END) "
+        "FROM tasks_task GROUP BY COALESCE(list_id, 0)"
+    )
+    install_counters(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    uninstall_counters(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_lists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('list_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
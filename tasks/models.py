@@ -1,10 +1,221 @@
+from django.conf import settings
 from django.db import models
 
+from .ranking import RANK_MAX_LENGTH, new_rank, rank_between, rebalance_ranks
+from .signals import tasks_bulk_changed
+
+
+class TaskQuerySet(models.QuerySet):
+    def bulk_delete(self) -> int:
+        """
+        Supprime les tâches du queryset en un seul ``DELETE ... WHERE``.
+        ``delete()`` chargerait chaque objet pour envoyer post_delete dès
+        qu'un receiver est connecté ; ici un seul ``tasks_bulk_changed``
+        est envoyé. Task n'a aucune relation entrante à cascader.
+        """
+        from .counters import counts_in
+
+        counts = counts_in(self, sign=-1)
+        count = self._raw_delete(self.db)
+        tasks_bulk_changed.send(
+            sender=self.model, op="delete", count=count, using=self.db, counts=counts
+        )
+        return count
+
+    def bulk_complete(self, complete: bool = True) -> int:
+        """Marque les tâches du queryset en un seul ``UPDATE ... WHERE``."""
+        from .counters import counts_completed
+
+        counts = counts_completed(self, complete)
+        count = self.exclude(complete=complete).update(complete=complete)
+        tasks_bulk_changed.send(
+            sender=self.model, op="update", count=count, using=self.db, counts=counts
+        )
+        return count
+
+
+class TaskList(models.Model):
+    """
+    Liste de tâches d'un utilisateur. Les listes sont enregistrées sur la
+    base principale ; leurs tâches sur la base (shard) de la liste, voir
+    tasks.shards.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="task_lists"
+    )
+    name = models.CharField(max_length=200)
+    # Alias de base imposé (``manage.py move_task_list``) ; vide : choisi
+    # par hachage de l'id parmi TASK_SHARDS
+    shard = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self) -> str:
+        return self.name
+
 
 class Task(models.Model):
+    # Liste propriétaire, None : liste publique (visiteurs anonymes). Sans
+    # contrainte en base : la liste et ses tâches sont sur des bases
+    # différentes dès qu'il y a plusieurs shards
+    list = models.ForeignKey(
+        TaskList,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="tasks",
+    )
     title = models.CharField(max_length=200)
     complete = models.BooleanField(default=False)
+    priority = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
+    # Ordre manuel (glisser-déposer) parmi les tâches de même priorité,
+    # voir tasks.ranking : une nouvelle tâche va en fin de liste
+    rank = models.CharField(max_length=255, default=new_rank, editable=False)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        # Ordre de la liste et clé de la pagination par curseur
+        ordering = ["-priority", "rank", "id"]
+        indexes = [
+            # Liste / pagination : WHERE list_id = ? ORDER BY priority DESC,
+            # rank, id servi par l'index (recherche du curseur, tri et
+            # LIMIT), sans tri
+            models.Index(
+                fields=["list", "-priority", "rank", "id"], name="task_list_order_idx"
+            ),
+            models.Index(fields=["created", "id"], name="task_created_id_idx"),
+            # Tâches à faire / terminées dans l'ordre de la liste. Django
+            # génère « WHERE complete » / « WHERE NOT complete » pour un
+            # booléen, que SQLite ne sait pas servir avec un index
+            # (complete, ...) : on utilise donc un index partiel par état,
+            # équivalent à ce composite pour ces requêtes et plus petit.
+            models.Index(
+                fields=["list", "-priority", "rank", "id"],
+                condition=models.Q(complete=False),
+                name="task_list_open_idx",
+            ),
+            models.Index(
+                fields=["list", "-priority", "rank", "id"],
+                condition=models.Q(complete=True),
+                name="task_list_done_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
+
+    def move_after(self, previous=None) -> None:
+        """
+        Place la tâche juste après ``previous`` (None : en tête) parmi les
+        tâches de même priorité, en ne modifiant que son rang : une seule
+        ligne écrite, quelle que soit la longueur de la liste.
+        """
+        siblings = Task.objects.using(self._state.db).filter(list_id=self.list_id)
+        group = siblings.filter(priority=self.priority).exclude(id=self.id)
+        if previous is not None and previous.priority != self.priority:
+            # Déposée à la frontière des deux groupes : en tête des tâches
+            # non prioritaires, ou en fin des prioritaires
+            if previous.priority:
+                previous = None
+            else:
+                previous = group.order_by("-rank", "-id").first()
+
+        before = previous.rank if previous is not None else None
+        following = group.order_by("rank", "id")
+        if before is not None:
+            following = following.filter(rank__gt=before)
+        after = following.values_list("rank", flat=True).first()
+        rank = rank_between(before, after)
+
+        if len(rank) > RANK_MAX_LENGTH:
+            # Trop d'insertions au même endroit : renumérotation unique
+            count = rebalance_ranks(siblings.filter(priority=self.priority))
+            # Seuls les rangs changent : aucune variation des compteurs
+            tasks_bulk_changed.send(
+                sender=Task, op="update", count=count, using=siblings.db, counts={}
+            )
+            if previous is not None:
+                previous.refresh_from_db(fields=["rank"])
+            return self.move_after(previous)
+
+        self.rank = rank
+        self.save(update_fields=["rank"])
+
+
+class TaskArchive(models.Model):
+    """
+    Table froide des tâches terminées retirées de ``tasks_task`` (voir
+    tasks.archive). L'id est celui de la tâche d'origine.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    list_id = models.BigIntegerField(null=True)
+    title = models.CharField(max_length=200)
+    complete = models.BooleanField(default=True)
+    priority = models.BooleanField(default=False)
+    created = models.DateTimeField()
+    archived = models.DateTimeField()
+
+    class Meta:
+        # Dernières archivées d'abord, aussi clé de la pagination
+        ordering = ["-archived", "-id"]
+        indexes = [
+            models.Index(fields=["-archived", "-id"], name="archive_archived_id_idx"),
+            models.Index(
+                fields=["list_id", "-archived", "-id"], name="archive_list_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class TaskCounter(models.Model):
+    """
+    Nombre de tâches et de tâches terminées d'une liste, tenu à jour à
+    chaque écriture (voir tasks.counters). Sur SQLite les lignes sont
+    écrites par des triggers sur ``tasks_task``.
+    """
+
+    # Clé de la liste publique (tâches sans liste)
+    PUBLIC_LIST = 0
+
+    list_id = models.BigIntegerField(primary_key=True)
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.list_id}: {self.completed}/{self.total}"
+
+
+class TaskChange(models.Model):
+    """
+    Journal des écritures sur les tâches, lu par le flux SSE (voir
+    tasks.changes). L'id sert de numéro de séquence ; sur SQLite les lignes
+    sont écrites par des triggers sur ``tasks_task``.
+    """
+
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    # Opération groupée journalisée sans le détail des lignes
+    RELOAD = "reload"
+    OPS = [
+        (CREATE, "create"),
+        (UPDATE, "update"),
+        (DELETE, "delete"),
+        (RELOAD, "reload"),
+    ]
+
+    task_id = models.BigIntegerField(null=True)
+    op = models.CharField(max_length=6, choices=OPS)
+
+    class Meta:
+        ordering = ["id"]
@@ -0,0 +1,157 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou ne correspondant pas à l'ordre demandé."""
+
+
+@dataclass
+class KeysetPage:
+    object_list: List[Any]
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+    per_page: int = 0
+    ordering: Tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+def _json_default(value):
+    # isoformat() complet : DjangoJSONEncoder tronque les microsecondes,
+    # ce qui ferait boucler la pagination sur des 'created' très proches.
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _split(ordering: Sequence[str]) -> List[Tuple[str, bool]]:
+    return [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur (keyset) : chaque page est obtenue par un
+    ``WHERE (clé) > (dernière clé vue) ORDER BY clé LIMIT n``.
+    Contrairement à OFFSET, le coût de la page N est le même que celui
+    de la page 1 tant qu'un index couvre les colonnes de ``ordering``.
+
+    ``ordering`` doit être total (se terminer par une colonne unique,
+    typiquement ``id``) pour que le curseur désigne une position exacte.
+    """
+
+    NEXT = "n"
+    PREVIOUS = "p"
+
+    def __init__(self, queryset, ordering: Sequence[str], per_page: int):
+        if per_page < 1:
+            raise ValueError("per_page doit être >= 1")
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self._keys = _split(self.ordering)
+        self._fields = [
+            queryset.model._meta.get_field(name) for name, _ in self._keys
+        ]
+
+    # --- Curseurs opaques ---------------------------------------------
+
+    def encode_cursor(self, direction: str, obj) -> str:
+        values = [getattr(obj, f.attname) for f in self._fields]
+        raw = json.dumps([direction, values], default=_json_default)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> Tuple[str, list]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in (self.NEXT, self.PREVIOUS):
+                raise ValueError(direction)
+            if len(values) != len(self._fields):
+                raise ValueError(values)
+            values = [f.to_python(v) for f, v in zip(self._fields, values)]
+        except Exception as exc:
+            raise InvalidCursor(cursor) from exc
+        return direction, values
+
+    # --- Construction des requêtes ------------------------------------
+
+    def _after(self, values, reverse: bool) -> Q:
+        """
+        Filtre « strictement après ``values`` » dans l'ordre de pagination
+        (ou avant si ``reverse``). Le premier terme ``>=`` est redondant
+        mais permet à SQLite de démarrer le parcours d'index directement
+        à la bonne position au lieu de filtrer depuis le début.
+        """
+        first_name, first_desc = self._keys[0]
+        first_op = "lte" if first_desc != reverse else "gte"
+        seek = Q(**{f"{first_name}__{first_op}": values[0]})
+
+        condition = Q()
+        for i, (name, desc) in enumerate(self._keys):
+            op = "lt" if desc != reverse else "gt"
+            term = Q(**{f"{name}__{op}": values[i]})
+            for j, (prev_name, _) in enumerate(self._keys[:i]):
+                term &= Q(**{prev_name: values[j]})
+            condition |= term
+        return seek & condition
+
+    def _ordered(self, reverse: bool) -> List[str]:
+        if not reverse:
+            return list(self.ordering)
+        return [name if desc else f"-{name}" for name, desc in self._keys]
+
+    def _query(self, cursor: Optional[str]):
+        direction, values = self.NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == self.PREVIOUS
+
+        qs = self.queryset
+        if values is not None:
+            qs = qs.filter(self._after(values, reverse))
+        qs = qs.order_by(*self._ordered(reverse))[: self.per_page + 1]
+        return qs, reverse, values is not None
+
+    def _build_page(self, rows, reverse: bool, has_cursor: bool) -> KeysetPage:
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+
+        page = KeysetPage(rows, per_page=self.per_page, ordering=self.ordering)
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(self.NEXT, rows[-1])
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(self.PREVIOUS, rows[0])
+        return page
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        qs, reverse, has_cursor = self._query(cursor)
+        return self._build_page(list(qs), reverse, has_cursor)
+
+    async def apage(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Équivalent de ``page()`` pour les vues async (ORM async)."""
+        qs, reverse, has_cursor = self._query(cursor)
+        return self._build_page([row async for row in qs], reverse, has_cursor)
@@ -0,0 +1,272 @@
+"""
+Profilage des requêtes, activé par ``TASKS_PROFILING["ENABLED"]``.
+
+Pour chaque requête le middleware mesure la durée totale, le nombre et la
+durée des requêtes SQL (``execute_wrapper`` sur chaque base) et le temps de
+rendu des templates. Les agrégats sont tenus par nom d'URL (``list``,
+``update_task``, ``delete``...), renvoyés dans l'en-tête ``Server-Timing``
+et consultables en JSON via la vue ``profiling_stats``.
+
+Avec ``CPROFILE`` les requêtes passent sous cProfile ; le profil n'est
+gardé que pour celles qui dépassent ``SLOW_MS``. Un seul profil tourne à la
+fois (les autres requêtes ne sont alors pas profilées). cProfile ne suit
+que le thread courant : sous ASGI, où la boucle d'événements entremêle les
+requêtes, seules les autres mesures sont prises.
+
+Désactivé, le middleware lève ``MiddlewareNotUsed`` au chargement : Django
+le retire de la chaîne et il ne coûte rien par requête.
+"""
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, JsonResponse
+from django.template import base as template_base
+
+from .loadtest import percentile
+
+# Durées récentes gardées par vue pour les percentiles
+WINDOW_SIZE = 512
+
+# Mesures de la requête en cours (None hors requête profilée)
+_current = contextvars.ContextVar("tasks_profiling_request", default=None)
+
+
+@dataclass
+class RequestTimings:
+    wall: float = 0.0
+    queries: int = 0
+    sql: float = 0.0
+    template: float = 0.0
+    template_depth: int = 0
+
+    def server_timing(self):
+        return ", ".join(
+            [
+                f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+                f"tpl;dur={self.template * 1000:.1f}",
+                f"total;dur={self.wall * 1000:.1f}",
+            ]
+        )
+
+
+class ViewStats:
+    def __init__(self):
+        self.count = 0
+        self.wall_total = 0.0
+        self.wall_max = 0.0
+        self.queries_total = 0
+        self.sql_total = 0.0
+        self.template_total = 0.0
+        self.recent = deque(maxlen=WINDOW_SIZE)
+
+    def add(self, timings: RequestTimings):
+        self.count += 1
+        self.wall_total += timings.wall
+        self.wall_max = max(self.wall_max, timings.wall)
+        self.queries_total += timings.queries
+        self.sql_total += timings.sql
+        self.template_total += timings.template
+        self.recent.append(timings.wall)
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "wall_mean_ms": round(self.wall_total / self.count * 1000, 2),
+            "wall_p50_ms": round(percentile(recent, 50) * 1000, 2),
+            "wall_p95_ms": round(percentile(recent, 95) * 1000, 2),
+            "wall_max_ms": round(self.wall_max * 1000, 2),
+            "queries_mean": round(self.queries_total / self.count, 2),
+            "sql_mean_ms": round(self.sql_total / self.count * 1000, 2),
+            "template_mean_ms": round(self.template_total / self.count * 1000, 2),
+        }
+
+
+class ProfileRegistry:
+    """Agrégats par nom d'URL et derniers profils lents (par processus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+        self.slow_profiles = deque()
+
+    def record(self, url_name, timings: RequestTimings):
+        with self._lock:
+            self.views.setdefault(url_name, ViewStats()).add(timings)
+
+    def add_profile(self, entry, keep):
+        with self._lock:
+            self.slow_profiles.append(entry)
+            while len(self.slow_profiles) > keep:
+                self.slow_profiles.popleft()
+
+    def reset(self):
+        with self._lock:
+            self.views.clear()
+            self.slow_profiles.clear()
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "views": {name: s.as_dict() for name, s in sorted(self.views.items())},
+                "slow_profiles": list(self.slow_profiles),
+            }
+
+
+registry = ProfileRegistry()
+
+# cProfile ne supporte qu'un profil actif à la fois
+_profiler_lock = threading.Lock()
+
+
+def _wrap_connections(stack):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(_count_query))
+
+
+def _count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql += time.perf_counter() - start
+
+
+_original_render = template_base.Template.render
+
+
+def _timed_render(self, context):
+    timings = _current.get()
+    if timings is None:
+        return _original_render(self, context)
+    # Seul le template le plus externe est chronométré (pas les include)
+    timings.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        timings.template_depth -= 1
+        if timings.template_depth == 0:
+            timings.template += time.perf_counter() - start
+
+
+def profiling_config():
+    return getattr(settings, "TASKS_PROFILING", {})
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = profiling_config()
+        if not config.get("ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = config.get("SERVER_TIMING", True)
+        self.cprofile = config.get("CPROFILE", False)
+        self.slow = config.get("SLOW_MS", 200) / 1000
+        self.keep_profiles = config.get("KEEP_PROFILES", 20)
+        # Installé seulement si le profilage est actif
+        template_base.Template.render = _timed_render
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        profiler = None
+        if self.cprofile and _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack)
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            timings.wall = time.perf_counter() - start
+            _current.reset(token)
+            if profiler is not None:
+                _profiler_lock.release()
+        return self._finish(request, response, timings, profiler)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            # Connexions propres à un thread : celui où sync_to_async
+            # exécute l'ORM pour cette requête
+            await sync_to_async(_wrap_connections)(stack)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            timings.wall = time.perf_counter() - start
+            _current.reset(token)
+        return self._finish(request, response, timings, None)
+
+    def _finish(self, request, response, timings, profiler):
+        url_name = request_url_name(request)
+        registry.record(url_name, timings)
+        if profiler is not None and timings.wall >= self.slow:
+            registry.add_profile(
+                {
+                    "url_name": url_name,
+                    "path": request.path,
+                    "wall_ms": round(timings.wall * 1000, 2),
+                    "stats": _format_profile(profiler),
+                },
+                self.keep_profiles,
+            )
+        if self.server_timing:
+            response.headers["Server-Timing"] = timings.server_timing()
+        return response
+
+
+def request_url_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return "unresolved"
+    return match.url_name
+
+
+def _format_profile(profiler, limit=25):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def profiling_stats(request):
+    """Agrégats du processus courant, en JSON (staff ou DEBUG seulement)."""
+    if not profiling_config().get("ENABLED", False):
+        raise Http404("Profilage désactivé")
+    user = getattr(request, "user", None)
+    if not settings.DEBUG and not (user is not None and user.is_staff):
+        raise PermissionDenied
+    return JsonResponse(registry.as_dict())
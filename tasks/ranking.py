@@ -0,0 +1,120 @@
+"""
+Rangs de l'ordre manuel des tâches (glisser-déposer).
+
+Le rang est une chaîne comparée octet par octet (collation BINARY de
+SQLite) et lue comme une fraction en base 36 : entre deux rangs il en
+existe toujours un troisième. Déplacer une tâche ne modifie donc que sa
+ligne (``rank_between`` de ses nouveaux voisins), sans renuméroter la
+liste.
+
+Une nouvelle tâche reçoit un rang tiré de l'horloge (``new_rank``) : il
+est supérieur à ceux des tâches existantes, elle s'ajoute en fin de liste
+sans lire la table (``bulk_create`` compris). Les rangs s'allongent d'un
+caractère environ toutes les cinq insertions au même endroit (mais pas en
+fin de liste, où le rang est incrémenté) ; au-delà de
+``RANK_MAX_LENGTH`` la liste est renumérotée une fois (``rebalance_ranks``).
+"""
+
+import threading
+import time
+from typing import Optional
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+# Dernier chiffre des rangs générés : jamais « 0 », sinon « a » et « a0 »
+# désigneraient la même fraction et aucun rang n'existerait entre les deux
+MIDDLE = DIGITS[BASE // 2]
+
+# Largeur des rangs générés : 36**11 microsecondes ~ 4000 ans
+RANK_WIDTH = 11
+RANK_MAX_LENGTH = 200
+
+_last_rank_time = 0
+_lock = threading.Lock()
+
+
+def _base36(value: int, width: int) -> str:
+    digits = []
+    while value:
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+
+def new_rank() -> str:
+    """Rang d'une nouvelle tâche, après celui de toutes les tâches existantes."""
+    global _last_rank_time
+    with _lock:
+        # Strictement croissant dans le processus, même à la microseconde
+        _last_rank_time = max(_last_rank_time + 1, time.time_ns() // 1000)
+        value = _last_rank_time
+    return _base36(value, RANK_WIDTH) + MIDDLE
+
+
+def initial_rank(position: int) -> str:
+    """
+    Rang de la ``position``-ième tâche lors d'une renumérotation, inférieur
+    aux rangs d'horloge de ``new_rank`` (pour ``position`` < 36**9).
+    """
+    return _base36(position, RANK_WIDTH) + MIDDLE
+
+
+def _rank_after(before: str) -> str:
+    """
+    Rang suivant ``before`` à longueur égale : son dernier chiffre inférieur
+    à « z » est incrémenté, les « z » qui le suivent repassent à « 0 » (une
+    retenue). Les déplacements répétés en fin de liste n'allongent donc pas
+    le rang ; un chiffre n'est ajouté que si ``before`` ne contient que des
+    « z ». On reste juste après ``before`` : les tâches créées ensuite
+    (rangs d'horloge) passent encore après.
+    """
+    digits = [DIGITS.index(digit) for digit in before]
+    n = len(digits) - 1
+    while n >= 0 and digits[n] == BASE - 1:
+        digits[n] = 0
+        n -= 1
+    if n < 0:
+        return before + MIDDLE
+    digits[n] += 1
+    if digits[-1] == 0:
+        digits[-1] = 1
+    return "".join(DIGITS[digit] for digit in digits)
+
+
+def rank_between(before: Optional[str], after: Optional[str]) -> str:
+    """
+    Rang strictement compris entre ``before`` et ``after`` (None : début ou
+    fin de liste), qui ne finit pas par ``0``.
+    """
+    before = before or ""
+    if after is None:
+        return _rank_after(before)
+    if before >= after:
+        raise ValueError(f"Rangs non ordonnés : {before!r} >= {after!r}")
+
+    prefix = []
+    n = 0
+    while True:
+        low = DIGITS.index(before[n]) if n < len(before) else 0
+        high = DIGITS.index(after[n]) if n < len(after) else BASE
+        if low == high:
+            prefix.append(DIGITS[low])
+            n += 1
+            continue
+        middle = (low + high) // 2
+        if middle > low:
+            return "".join(prefix) + DIGITS[middle]
+        # Chiffres consécutifs : on garde celui de ``before`` et on se place
+        # après la suite de ``before``
+        return "".join(prefix) + DIGITS[low] + rank_between(before[n + 1 :], None)
+
+
+def rebalance_ranks(queryset, batch_size: int = 1000) -> int:
+    """Renumérote les rangs de ``queryset`` à intervalles réguliers, dans l'ordre."""
+    ids = list(queryset.order_by("rank", "id").values_list("id", flat=True))
+    model = queryset.model
+    updates = [model(id=pk, rank=initial_rank(i + 1)) for i, pk in enumerate(ids)]
+    model.objects.using(queryset.db).bulk_update(
+        updates, ["rank"], batch_size=batch_size
+    )
+    return len(updates)
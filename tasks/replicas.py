@@ -0,0 +1,219 @@
+"""
+Lectures sur des répliques SQLite, écritures sur la base principale.
+
+Les répliques (alias de ``TASKS_REPLICAS["ALIASES"]``, déclarés dans
+``DATABASES``) sont des copies de la base principale rafraîchies par
+``manage.py sync_replica`` avec l'API de sauvegarde en ligne de SQLite :
+la copie est un instantané cohérent, pris sans bloquer les écrivains.
+
+``ReplicaRouter`` envoie sur une réplique les lectures des requêtes HTTP
+GET/HEAD (liste, recherche, export...) ; tout le reste va sur la base
+principale : écritures, requêtes POST, lectures dans une transaction,
+commandes de gestion et tâches de fond. ``ReplicaMiddleware`` ouvre ce
+droit par requête et, après une écriture, pose un cookie qui garde le
+client sur la base principale pendant ``STICKY_SECONDS`` : il relit
+toujours ce qu'il vient d'écrire.
+
+Le retard d'une réplique est l'écart entre la dernière modification des
+fichiers de la base principale (base et journal WAL) et l'instant de sa
+dernière synchronisation (date de modification de son fichier). Une
+réplique en retard de plus de ``MAX_LAG_SECONDS`` n'est plus lue.
+
+Une page lue sur une réplique porte le numéro de séquence du journal des
+modifications de cet instantané ; le flux SSE (``tasks.changes``), lu sur
+la base principale, lui rejoue ensuite ce qui lui manque. Le fragment de
+liste mis en cache (``tasks.cache``) et son ETag portent la base lue et
+l'instantané d'une réplique (``snapshot_stamp``) : un client revenu sur la
+base principale ne reçoit jamais une page rendue depuis une réplique.
+"""
+
+import contextvars
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+DEFAULT_CONFIG = {
+    "ALIASES": [],
+    # Retard maximal (s) d'une réplique encore lue
+    "MAX_LAG_SECONDS": 5.0,
+    # Durée (s) pendant laquelle un client reste sur la base principale
+    # après une écriture
+    "STICKY_SECONDS": 10,
+    # Intervalle (s) entre deux mesures du retard d'une réplique
+    "CHECK_INTERVAL": 1.0,
+}
+
+STICKY_COOKIE = "tasks_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# False pendant une requête autorisée à lire sur les répliques
+_use_primary = contextvars.ContextVar("tasks_use_primary", default=True)
+
+# alias -> (instant de la mesure, retard)
+_lag_cache = {}
+
+
+def replicas_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "TASKS_REPLICAS", {})}
+
+
+def replica_aliases():
+    return list(replicas_config()["ALIASES"])
+
+
+def database_path(alias) -> Path:
+    return Path(settings.DATABASES[alias]["NAME"])
+
+
+def last_change(path: Path) -> float:
+    """Dernière modification d'une base SQLite, journal WAL compris."""
+    mtimes = [path.stat().st_mtime]
+    wal = path.with_name(path.name + "-wal")
+    if wal.exists():
+        mtimes.append(wal.stat().st_mtime)
+    return max(mtimes)
+
+
+def file_lag(primary: Path, replica: Path) -> float:
+    """Retard (s) de ``replica`` sur ``primary`` ; 0 si elle est à jour."""
+    if not replica.exists():
+        return float("inf")
+    return max(0.0, last_change(primary) - replica.stat().st_mtime)
+
+
+def replica_lag(alias) -> float:
+    return file_lag(database_path(PRIMARY), database_path(alias))
+
+
+def snapshot_stamp(alias) -> str:
+    """
+    Identifiant de l'instantané d'une réplique (date de sa dernière
+    synchronisation, en ns) ; vide pour une base qui n'est pas une réplique.
+    """
+    if alias not in replica_aliases():
+        return ""
+    try:
+        return str(database_path(alias).stat().st_mtime_ns)
+    except FileNotFoundError:
+        return "missing"
+
+
+def fresh_replicas():
+    """Répliques lisibles : retard inférieur à ``MAX_LAG_SECONDS``."""
+    config = replicas_config()
+    now = time.monotonic()
+    fresh = []
+    for alias in config["ALIASES"]:
+        checked = _lag_cache.get(alias)
+        if checked is None or now - checked[0] >= config["CHECK_INTERVAL"]:
+            checked = (now, replica_lag(alias))
+            _lag_cache[alias] = checked
+        if checked[1] <= config["MAX_LAG_SECONDS"]:
+            fresh.append(alias)
+    return fresh
+
+
+@contextmanager
+def use_replicas(allowed: bool = True):
+    """Autorise (ou interdit) les lectures sur les répliques dans le bloc."""
+    token = _use_primary.set(not allowed)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_primary.get() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        fresh = fresh_replicas()
+        return random.choice(fresh) if fresh else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les répliques reçoivent le schéma avec les données (sync_replica)
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = replicas_config()["STICKY_SECONDS"]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_replicas(self._allowed(request)):
+            response = self.get_response(request)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        # Variable de contexte : suivie aussi par sync_to_async
+        with use_replicas(self._allowed(request)):
+            response = await self.get_response(request)
+        return self._pin(request, response)
+
+    def _allowed(self, request):
+        return (
+            request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+        )
+
+    def _pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def sync_file(source: Path, target: Path, pages: int = -1) -> None:
+    """
+    Copie ``source`` dans ``target`` par l'API de sauvegarde en ligne de
+    SQLite. ``target`` est remplacée en une transaction : ses lecteurs
+    voient l'ancien ou le nouvel instantané, jamais un mélange.
+    """
+    started = time.time()
+    src = sqlite3.connect(source)
+    # Attend la fin des lectures en cours sur la réplique
+    dst = sqlite3.connect(target, timeout=20)
+    try:
+        src.backup(dst, pages=pages)
+    finally:
+        dst.close()
+        src.close()
+    # Date de l'instantané : une écriture pendant la copie compte en retard
+    os.utime(target, (started, started))
+
+
+def sync_replica(alias) -> None:
+    sync_file(database_path(PRIMARY), database_path(alias))
+    _lag_cache.pop(alias, None)
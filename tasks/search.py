@@ -0,0 +1,159 @@
+"""
+Recherche plein texte sur les titres des tâches.
+
+Sur SQLite, une table virtuelle FTS5 ``tasks_task_fts`` (à contenu externe,
+indexant ``tasks_task.title``) est tenue à jour par des triggers : les
+écritures groupées (bulk_create, update(), suppressions brutes) restent
+donc synchronisées sans passer par les signaux Django. Les résultats sont
+classés par bm25.
+
+Sans FTS5 (autre base, SQLite compilé sans FTS5) on se replie sur un
+``title__icontains``, correct mais en parcours de table.
+
+Attention : sur SQLite, certaines migrations reconstruisent la table
+``tasks_task`` (ajout d'un champ NOT NULL...) et suppriment ses triggers.
+Ces migrations doivent rappeler ``install_fts``.
+"""
+import re
+from typing import List, Optional
+
+from django.db import DatabaseError, connections, router
+
+from .models import Task
+
+FTS_TABLE = "tasks_task_fts"
+
+FTS_CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, content='tasks_task', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='3 4')"
+)
+
+FTS_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tasks_task
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tasks_task
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title ON tasks_task
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END""",
+]
+
+FTS_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+# ``rank`` vaut bm25() par défaut. La jointure sur tasks_task restreint
+# les résultats à la liste de l'appelant (tasks.shards) : elle lit la ligne
+# de chaque correspondance avant le tri, d'où le préfixe minimal ci-dessous.
+# ``IS`` compare aussi NULL (liste publique).
+FTS_SEARCH_IDS = f"""
+    SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE}
+    JOIN tasks_task ON tasks_task.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s AND tasks_task.list_id IS %s
+    ORDER BY {FTS_TABLE}.rank
+    LIMIT %s
+"""
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Recherche par préfixe sur le dernier mot seulement à partir de cette
+# longueur : un préfixe très court correspond à une grande partie de
+# l'index et tout doit être classé avant d'appliquer la limite.
+MIN_PREFIX_LENGTH = 3
+
+# Alias de base -> présence de la table FTS (vérifié une fois par alias)
+_fts_by_alias = {}
+
+
+def install_fts(connection) -> bool:
+    """
+    Crée (ou recrée) la table FTS5 et ses triggers puis la reconstruit à
+    partir de ``tasks_task``. Retourne False si la base ne supporte pas FTS5.
+    """
+    if connection.vendor != "sqlite":
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(FTS_CREATE_TABLE)
+            for sql in FTS_TRIGGERS:
+                cursor.execute(sql)
+            cursor.execute(FTS_REBUILD)
+    except DatabaseError:
+        # SQLite compilé sans FTS5 : « no such module: fts5 »
+        return False
+    finally:
+        _fts_by_alias.pop(connection.alias, None)
+    return True
+
+
+def uninstall_fts(connection):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for suffix in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_by_alias.pop(connection.alias, None)
+
+
+def fts_available(using: str = "default") -> bool:
+    if using not in _fts_by_alias:
+        connection = connections[using]
+        available = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [FTS_TABLE],
+                )
+                available = cursor.fetchone() is not None
+        _fts_by_alias[using] = available
+    return _fts_by_alias[using]
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Transforme la saisie utilisateur en requête FTS5 sûre : chaque mot est
+    cité (aucun opérateur FTS5 n'est interprété) et le dernier est cherché
+    en préfixe pour la recherche au fil de la frappe.
+    """
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    if len(tokens[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_tasks(
+    text: str, limit: int, using: Optional[str] = None, task_list=None
+) -> List[Task]:
+    """
+    Tâches de ``task_list`` (None : liste publique) dont le titre
+    correspond à ``text``, les plus pertinentes d'abord.
+    """
+    if using is None:
+        using = router.db_for_read(Task)
+    list_id = task_list.id if task_list is not None else None
+    if fts_available(using):
+        match = fts_query(text)
+        if match is None:
+            return []
+        with connections[using].cursor() as cursor:
+            cursor.execute(FTS_SEARCH_IDS, [match, list_id, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+        tasks = Task.objects.using(using).in_bulk(ids)
+        return [tasks[pk] for pk in ids if pk in tasks]
+    tasks = Task.objects.using(using).filter(
+        list_id=list_id, title__icontains=text.strip()
+    )
+    return list(tasks[:limit])
@@ -0,0 +1,213 @@
+"""
+Listes de tâches par utilisateur, réparties entre plusieurs bases SQLite.
+
+Chaque utilisateur connecté a sa liste (``TaskList``, créée à sa première
+visite) ; les visiteurs anonymes partagent la liste publique (tâches sans
+liste). Les vues ne lisent et n'écrivent que les tâches de la liste de
+l'appelant (``list_tasks``).
+
+Les listes sont enregistrées sur la base principale. Leurs tâches (avec
+leur archive et le journal des modifications) sont sur le shard de la
+liste, un alias de ``TASK_SHARDS`` : celui imposé par ``TaskList.shard``,
+sinon un hachage stable de l'id de la liste. Chaque shard est un fichier
+SQLite avec son propre verrou d'écriture : les écritures de listes
+différentes ne s'attendent plus. La liste publique est sur le premier
+shard. Chaque shard reçoit toutes les migrations
+(``manage.py migrate --database <alias>``).
+
+Le shard est toujours choisi explicitement (``.using()``, ``save(using=)``)
+à partir de la liste ; ``ShardRouter`` garde ensuite une tâche chargée sur
+sa base (``save()``, ``delete()``, ``refresh_from_db()``).
+
+``manage.py move_task_list`` déplace une liste d'un shard à l'autre. Les
+ids étant attribués par chaque base, les tâches déplacées changent d'id.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+
+from .models import Task, TaskArchive, TaskChange, TaskList
+from .replicas import replica_aliases
+from .signals import tasks_bulk_changed
+
+# Tâches lues et copiées par paquets lors d'un déplacement de liste
+MOVE_BATCH_SIZE = 500
+
+
+def task_shards():
+    return list(getattr(settings, "TASK_SHARDS", [DEFAULT_DB_ALIAS]))
+
+
+def hashed_shard(list_id: int) -> str:
+    shards = task_shards()
+    # crc32 plutôt que hash() : identique dans tous les processus
+    return shards[zlib.crc32(str(list_id).encode()) % len(shards)]
+
+
+def shard_for(task_list) -> str:
+    """Base des tâches de ``task_list`` (None : liste publique)."""
+    if task_list is None:
+        return task_shards()[0]
+    return task_list.shard or hashed_shard(task_list.id)
+
+
+def read_db(shard: str) -> str:
+    """Base à lire pour un shard : la base principale peut avoir des répliques."""
+    if shard == DEFAULT_DB_ALIAS:
+        return router.db_for_read(Task)
+    return shard
+
+
+def current_list(request):
+    """
+    Liste de l'utilisateur connecté, créée à sa première visite ; None
+    (liste publique) pour un visiteur anonyme. Mémorisée sur la requête.
+    """
+    if not hasattr(request, "_task_list"):
+        user = getattr(request, "user", None)
+        task_list = None
+        if user is not None and user.is_authenticated:
+            task_list = TaskList.objects.filter(owner=user).first()
+            if task_list is None:
+                task_list = TaskList.objects.create(
+                    owner=user, name=user.get_username()
+                )
+        request._task_list = task_list
+    return request._task_list
+
+
+def list_tasks(task_list, using=None):
+    """Tâches de ``task_list``, sur son shard (lecture par défaut)."""
+    if using is None:
+        using = read_db(shard_for(task_list))
+    return Task.objects.using(using).filter(list=task_list)
+
+
+def list_archive(task_list, using=None):
+    if using is None:
+        using = read_db(shard_for(task_list))
+    list_id = task_list.id if task_list is not None else None
+    return TaskArchive.objects.using(using).filter(list_id=list_id)
+
+
+def assign_list(task: Task, task_list) -> str:
+    """Rattache une nouvelle tâche à ``task_list`` ; retourne son shard."""
+    task.list_id = task_list.id if task_list is not None else None
+    return shard_for(task_list)
+
+
+class ShardRouter:
+    """
+    Listes sur la base principale ; une tâche déjà chargée reste sur sa
+    base. Le reste est laissé aux routers suivants (répliques).
+    """
+
+    def _instance_db(self, model, hints):
+        if model is TaskList:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is None or instance._state.db is None:
+            return None
+        return instance._state.db
+
+    def db_for_read(self, model, **hints):
+        return self._instance_db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        db = self._instance_db(model, hints)
+        # Une instance lue sur une réplique s'écrit sur la base principale
+        if db in replica_aliases():
+            return None
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def _copy_batch(tasks, target):
+    created = [task.created for task in tasks]
+    for task in tasks:
+        task.pk = None
+        task._state.adding = True
+    copies = Task.objects.using(target).bulk_create(tasks)
+    # auto_now_add a remplacé la date de création d'origine
+    for copy, value in zip(copies, created):
+        copy.created = value
+    Task.objects.using(target).bulk_update(copies, ["created"])
+    return copies
+
+
+def move_list(task_list: TaskList, target: str, on_batch=None) -> int:
+    """
+    Copie les tâches (et l'archive) de ``task_list`` sur le shard
+    ``target``, y fait pointer la liste puis les supprime de l'ancien shard.
+    À lancer quand la liste n'est pas modifiée : une écriture sur l'ancien
+    shard pendant le déplacement serait perdue. Retourne le nombre de
+    tâches déplacées.
+    """
+    from .counters import apply_counts, counts_in
+
+    if target not in task_shards():
+        raise ValueError(f"Shard inconnu : {target!r}")
+    source = shard_for(task_list)
+    if source == target:
+        return 0
+
+    moved = 0
+    counts = counts_in(list_tasks(task_list, using=source))
+    with transaction.atomic(using=target):
+        live = list_tasks(task_list, using=source).order_by("id")
+        batch = []
+        for task in live.iterator(chunk_size=MOVE_BATCH_SIZE):
+            batch.append(task)
+            if len(batch) == MOVE_BATCH_SIZE:
+                moved += len(_copy_batch(batch, target))
+                batch = []
+                if on_batch is not None:
+                    on_batch(moved)
+        if batch:
+            moved += len(_copy_batch(batch, target))
+
+        # Archive : les ids d'archive sont des ids de tâches du shard, on
+        # en obtient de nouveaux en passant par tasks_task
+        archived = list(list_archive(task_list, using=source))
+        for start in range(0, len(archived), MOVE_BATCH_SIZE):
+            rows = archived[start : start + MOVE_BATCH_SIZE]
+            placeholders = [
+                Task(
+                    list_id=task_list.id,
+                    title=row.title,
+                    complete=row.complete,
+                    priority=row.priority,
+                )
+                for row in rows
+            ]
+            placeholders = Task.objects.using(target).bulk_create(placeholders)
+            for row, placeholder in zip(rows, placeholders):
+                row.id = placeholder.id
+            TaskArchive.objects.using(target).bulk_create(rows)
+            ids = [placeholder.id for placeholder in placeholders]
+            stale = Task.objects.using(target).filter(id__in=ids)
+            stale._raw_delete(target)
+
+    task_list.shard = target
+    task_list.save(update_fields=["shard"])
+
+    with transaction.atomic(using=source):
+        old = list_tasks(task_list, using=source)
+        if counts is not None:
+            # Pas de signal pour l'ancien shard : variation appliquée ici
+            removed = {key: (-n, -done) for key, (n, done) in counts.items()}
+            apply_counts(source, removed)
+        old._raw_delete(source)
+        old_archive = TaskArchive.objects.using(source).filter(list_id=task_list.id)
+        old_archive._raw_delete(source)
+        # Les pages ouvertes suivent le journal de l'ancien shard : elles
+        # rechargent et passent sur le nouveau
+        TaskChange.objects.using(source).create(op=TaskChange.RELOAD)
+    tasks_bulk_changed.send(
+        sender=Task, op="update", count=moved, using=target, counts=counts
+    )
+    return moved
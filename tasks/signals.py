@@ -0,0 +1,94 @@
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import metrics
+
+# Envoyé par les opérations groupées (import, API batch, suppressions en
+# masse) qui contournent post_save / post_delete. Arguments : ``op``
+# (nom de l'opération), ``count`` (nombre de lignes touchées), ``using``
+# (base écrite, la base principale par défaut) et ``counts`` (variation des
+# compteurs par liste, voir tasks.counters ; None : à recalculer).
+tasks_bulk_changed = Signal()
+
+
+@receiver(post_save, sender="tasks.Task")
+def count_save(sender, created, **kwargs):
+    metrics.TASK_WRITES.inc(op="create" if created else "update")
+
+
+@receiver(post_delete, sender="tasks.Task")
+def count_delete(sender, **kwargs):
+    metrics.TASK_WRITES.inc(op="delete")
+
+
+@receiver(tasks_bulk_changed)
+def count_bulk_change(sender, op, count, **kwargs):
+    if op in metrics.BULK_OPS and count:
+        metrics.TASK_WRITES.inc(count, op=metrics.BULK_OPS[op])
+
+
+# Journal des modifications (tasks.changes) : tenu par des triggers sur
+# SQLite, par ces receivers sur les autres bases
+
+
+@receiver(post_save, sender="tasks.Task")
+@receiver(post_delete, sender="tasks.Task")
+def log_change(sender, instance, using, created=None, **kwargs):
+    if connections[using].vendor == "sqlite":
+        return
+    if created is None:
+        op = "delete"
+    else:
+        op = "create" if created else "update"
+    TaskChange = apps.get_model("tasks", "TaskChange")
+    TaskChange.objects.using(using).create(task_id=instance.pk, op=op)
+
+
+@receiver(tasks_bulk_changed)
+def log_bulk_change(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if connections[using].vendor == "sqlite":
+        return
+    TaskChange = apps.get_model("tasks", "TaskChange")
+    TaskChange.objects.using(using).create(op=TaskChange.RELOAD)
+
+
+# Compteurs de tâches (tasks.counters) : tenus par des triggers sur SQLite,
+# mis à jour par ces receivers (variations par liste) sur les autres bases
+
+
+@receiver(pre_save, sender="tasks.Task")
+def remember_counted_state(sender, instance, using, update_fields=None, **kwargs):
+    from .counters import remember_counted
+
+    remember_counted(instance, using, update_fields)
+
+
+@receiver(post_save, sender="tasks.Task")
+def update_counters_on_save(sender, instance, using, created, **kwargs):
+    from .counters import count_saved
+
+    count_saved(instance, using, created)
+
+
+@receiver(post_delete, sender="tasks.Task")
+def update_counters_on_delete(sender, instance, using, **kwargs):
+    from .counters import count_deleted
+
+    count_deleted(instance, using)
+
+
+@receiver(tasks_bulk_changed)
+def update_counters_on_bulk_change(
+    sender, using=DEFAULT_DB_ALIAS, counts=None, **kwargs
+):
+    from .counters import apply_counts, recount_counters, tracks_counts
+
+    if not tracks_counts(using):
+        return
+    if counts is None:
+        # Expéditeur qui ne connaît pas la variation : recalcul de la base
+        recount_counters(using)
+    else:
+        apply_counts(using, counts)
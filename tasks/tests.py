@@ -1,12 +1,81 @@
+from io import StringIO
 from pathlib import Path
+from unittest import mock
+import datetime
+import gzip
+import io
 import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.conf import settings
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    RequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test import TestCase as DjangoTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from tasks.models import Task
-from tasks.utils import import_tasks_from_dataset
+from tasks.models import Task, TaskArchive, TaskChange, TaskCounter, TaskList
+from tasks.pagination import KeysetPaginator
+from tasks.ranking import rank_between
+from tasks.search import fts_available, fts_query, search_tasks
+from tasks import archive
+from tasks import async_views
+from tasks import changes
+from tasks import counters
+from tasks import datasets
+from tasks import cache as list_cache
+from tasks import loadtest
+from tasks import metrics
+from tasks import profiling
+from tasks import ranking
+from tasks import replicas
+from tasks import shards
+from tasks import views
+from tasks import writebehind
+from tasks.db import apply_pragmas
+from tasks.management.commands.bench import build_plans
+from tasks.utils import (
+    export_tasks,
+    import_tasks_from_dataset,
+    import_tasks_streaming,
+    iter_export,
+)
+
+
+# Bases des tests qui parcourent ou écrivent tous les shards (TODO_SHARDS).
+# Sans les répliques de test (TODO_REPLICAS) : miroirs de la base principale
+# en mémoire partagée, elles se heurtent aux verrous de la transaction du test
+SHARD_DATABASES = set(settings.TASK_SHARDS)
+NO_REPLICAS = override_settings(TASKS_REPLICAS={"ALIASES": []})
+
+
+class TestCase(DjangoTestCase):
+    """
+    Vide le cache de la liste avant chaque test : le rollback du test
+    précédent ramène le journal des modifications aux mêmes numéros, sous
+    lesquels ses fragments seraient encore servis.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        list_cache.get_cache().clear()
 
 
 def tc(test_id: str):
@@ -181,3 +250,1570 @@ class TaskPriorityTests(TestCase):
             content.index("Low"),
             "La tâche prioritaire doit apparaitre avant la tâche non prioritaire.",
         )
+
+
+class TaskRankingTests(TestCase):
+    def setUp(self):
+        self.tasks = [Task.objects.create(title=f"Rank {i}") for i in range(4)]
+
+    def _order(self):
+        return list(Task.objects.values_list("title", flat=True))
+
+    def test_rank_between_orders_strictly(self):
+        self.assertLess("a", rank_between("a", "b"))
+        self.assertLess(rank_between("a", "b"), "b")
+        self.assertLess("a", rank_between("a", "a1"))
+        self.assertLess(rank_between(None, "0001"), "0001")
+        self.assertGreater(rank_between("zz", None), "zz")
+        with self.assertRaises(ValueError):
+            rank_between("b", "a")
+
+    def test_repeated_inserts_stay_ordered(self):
+        before, after = None, "i"
+        for _ in range(200):
+            rank = rank_between(before, after)
+            self.assertTrue(before is None or before < rank)
+            self.assertLess(rank, after)
+            self.assertFalse(rank.endswith("0"))
+            after = rank
+
+    def test_repeated_moves_to_the_end_stay_short(self):
+        rank = self.tasks[-1].rank
+        for _ in range(1000):
+            following = rank_between(rank, None)
+            self.assertLess(rank, following)
+            self.assertFalse(following.endswith("0"))
+            rank = following
+        self.assertLessEqual(len(rank), len(self.tasks[-1].rank))
+        # Toujours avant les tâches créées ensuite
+        self.assertLess(rank, ranking.new_rank())
+        self.assertEqual(rank_between("zz", None), "zz" + ranking.MIDDLE)
+
+        last = self.tasks[0]
+        for task in self.tasks[1:] * 25:
+            task.move_after(last)
+            last = task
+        ranks = list(Task.objects.values_list("rank", flat=True))
+        self.assertTrue(all(len(r) <= len(self.tasks[0].rank) for r in ranks))
+        self.assertEqual(self._order()[-1], "Rank 3")
+
+    def test_new_tasks_go_last(self):
+        task = Task.objects.create(title="Last")
+        self.assertEqual(self._order()[-1], "Last")
+        self.assertGreater(task.rank, self.tasks[-1].rank)
+
+    def test_move_updates_a_single_row(self):
+        task = self.tasks[3]
+        with CaptureQueriesContext(connection) as ctx:
+            task.move_after(self.tasks[0])
+        writes = [q["sql"] for q in ctx.captured_queries if "UPDATE" in q["sql"]]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(
+            self._order(), ["Rank 0", "Rank 3", "Rank 1", "Rank 2"]
+        )
+
+        self.tasks[2].move_after(None)
+        self.assertEqual(
+            self._order(), ["Rank 2", "Rank 0", "Rank 3", "Rank 1"]
+        )
+
+    def test_move_across_priority_stays_in_group(self):
+        high = Task.objects.create(title="High", priority=True)
+        self.tasks[1].move_after(high)
+        self.assertEqual(self._order()[:2], ["High", "Rank 1"])
+        high.move_after(self.tasks[3])
+        self.assertEqual(self._order()[0], "High")
+
+    def test_long_ranks_are_rebalanced(self):
+        with mock.patch("tasks.models.RANK_MAX_LENGTH", 14):
+            for _ in range(10):
+                self.tasks[3].move_after(self.tasks[0])
+                self.tasks[0].refresh_from_db()
+                self.tasks[1].move_after(self.tasks[0])
+                self.tasks[0].refresh_from_db()
+        ranks = list(Task.objects.values_list("rank", flat=True))
+        self.assertTrue(all(len(rank) <= 14 for rank in ranks))
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_move_view(self):
+        url = reverse("move_task", args=[self.tasks[0].id])
+        response = self.client.post(
+            url, {"after": self.tasks[2].id}, HTTP_HX_REQUEST="true"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'data-id="{self.tasks[0].id}"')
+        self.assertEqual(
+            self._order(), ["Rank 1", "Rank 2", "Rank 0", "Rank 3"]
+        )
+
+        response = self.client.post(url, {"after": ""})
+        self.assertRedirects(response, "/")
+        self.assertEqual(self._order()[0], "Rank 0")
+
+        self.assertEqual(self.client.post(url, {"after": "x"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"after": "²"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"after": "999"}).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+@override_settings(TASKS_PAGE_SIZE=3)
+class TaskPaginationTests(TestCase):
+    def setUp(self):
+        self.tasks = [Task.objects.create(title=f"Task {i:02d}") for i in range(8)]
+        # Plusieurs tâches partagent le même 'created' : l'id départage
+        Task.objects.filter(id__in=[t.id for t in self.tasks[2:5]]).update(
+            created=timezone.now()
+        )
+
+    def _walk(self, paginator):
+        page = paginator.page()
+        pages = [page]
+        while page.has_next:
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_keyset_pages_cover_all_tasks_in_order(self):
+        paginator = KeysetPaginator(
+            Task.objects.all(), ordering=("created", "id"), per_page=3
+        )
+        pages = self._walk(paginator)
+        seen = [t.id for page in pages for t in page]
+        expected = list(
+            Task.objects.order_by("created", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 2])
+        self.assertFalse(pages[0].has_previous)
+
+        # Retour en arrière depuis la dernière page
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([t.id for t in previous], [t.id for t in pages[1]])
+        self.assertTrue(previous.has_next)
+
+    def test_each_page_is_a_single_query(self):
+        paginator = KeysetPaginator(
+            Task.objects.all(), ordering=("created", "id"), per_page=3
+        )
+        first = paginator.page()
+        with self.assertNumQueries(1):
+            paginator.page(first.next_cursor)
+
+    def test_home_renders_only_one_page_with_next_link(self):
+        response = self.client.get(reverse("list"))
+        self.assertEqual(len(response.context["tasks"]), 3)
+        self.assertContains(response, 'rel="next"')
+        self.assertNotContains(response, "Task 07")
+
+        next_cursor = response.context["page"].next_cursor
+        response = self.client.get(reverse("list"), {"cursor": next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'rel="prev"')
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse("list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class StreamingImportTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        path = Path(self.tmpdir.name) / name
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def test_json_array_is_parsed_incrementally(self):
+        items = [{"title": f"Tâche {i}", "complete": i % 2 == 0} for i in range(25)]
+        path = self._write("data.json", json.dumps(items, indent=2))
+
+        # Blocs minuscules : les objets sont coupés entre deux lectures
+        with mock.patch.object(datasets, "READ_CHUNK_SIZE", 7):
+            created = import_tasks_streaming(path, batch_size=10)
+
+        self.assertEqual(created, 25)
+        self.assertEqual(Task.objects.filter(complete=True).count(), 13)
+        self.assertTrue(Task.objects.filter(title="Tâche 24").exists())
+
+    def test_values_split_between_reads_are_not_cut(self):
+        text = json.dumps([-4.5e-3, True, "\u00e9t\u00e9", {"n": 12}, 1000])
+        with mock.patch.object(datasets, "READ_CHUNK_SIZE", 1):
+            items = list(datasets._iter_json_array(io.StringIO(text)))
+        self.assertEqual(items, [-4.5e-3, True, "été", {"n": 12}, 1000])
+
+    def test_malformed_item_fails_without_reading_the_rest(self):
+        items = ", ".join(['{"title": "ok"}'] * 1000)
+        f = io.StringIO('[{"title": "ok"}, {"title": oops}, ' + items + "]")
+        with mock.patch.object(datasets, "READ_CHUNK_SIZE", 7):
+            with self.assertRaises(json.JSONDecodeError):
+                list(datasets._iter_json_array(f))
+        self.assertLess(f.tell(), 100)
+
+    def test_truncated_array_is_rejected(self):
+        path = self._write("data.json", '[{"title": "a"}, {"title": "b"}')
+        with self.assertRaisesMessage(ValueError, "non terminé"):
+            list(datasets.iter_dataset_items(path))
+
+    def test_ndjson_is_imported_in_batches(self):
+        lines = "\n".join(json.dumps({"title": f"Line {i}"}) for i in range(5))
+        path = self._write("data.jsonl", lines + "\n\n")
+        batches = []
+
+        created = import_tasks_streaming(path, batch_size=2, on_batch=batches.append)
+
+        self.assertEqual(created, 5)
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(Task.objects.count(), 5)
+
+    def test_one_insert_per_batch(self):
+        items = [{"title": f"Bulk {i}"} for i in range(6)]
+        path = self._write("data.json", json.dumps(items))
+        # Par lot : SAVEPOINT + INSERT + RELEASE (dans la transaction du test)
+        with self.assertNumQueries(6):
+            import_tasks_streaming(path, batch_size=3)
+
+    def test_truncated_json_array_is_rejected(self):
+        path = self._write("broken.json", '[{"title": "ok"}, {"title": ')
+        with self.assertRaises(ValueError):
+            import_tasks_streaming(path)
+
+    def test_import_tasks_command_reports_rate(self):
+        path = self._write("data.ndjson", '{"title": "From command"}\n')
+        out = StringIO()
+        call_command("import_tasks", str(path), "--batch-size", "50", stdout=out)
+        self.assertIn("1 tâches importées", out.getvalue())
+        self.assertIn("lignes/s", out.getvalue())
+        self.assertTrue(Task.objects.filter(title="From command").exists())
+
+
+@NO_REPLICAS
+class TaskApiTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        self.task = Task.objects.create(title="API task", complete=False)
+
+    def _send(self, method, url, payload):
+        return getattr(self.client, method)(
+            url, data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_list_and_retrieve(self):
+        response = self.client.get(reverse("api_task_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["title"], "API task")
+
+        url = reverse("api_task_detail", kwargs={"pk": self.task.id})
+        self.assertEqual(self.client.get(url).json()["id"], self.task.id)
+
+    def test_create_patch_and_delete(self):
+        response = self._send("post", reverse("api_task_list"), {"title": "New"})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.json()["complete"])
+
+        url = reverse("api_task_detail", kwargs={"pk": self.task.id})
+        response = self._send("patch", url, {"complete": True})
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.complete)
+        self.assertEqual(self.task.title, "API task")
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_invalid_payload_returns_400(self):
+        response = self._send("post", reverse("api_task_list"), {"title": ""})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.json()["errors"])
+
+    def test_batch_applies_all_operations_in_few_queries(self):
+        other = Task.objects.create(title="To delete")
+        payload = {
+            "create": [{"title": f"Batch {i}"} for i in range(50)],
+            "update": [{"id": self.task.id, "title": "Renamed", "complete": True}],
+            "delete": [other.id],
+        }
+        # in_bulk + savepoint + INSERT + UPDATE + DELETE + release
+        with self.assertNumQueries(6):
+            response = self._send("post", reverse("api_task_batch"), payload)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["created"]), 50)
+        self.assertEqual(body["deleted"], 1)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Renamed")
+        self.assertTrue(self.task.complete)
+        self.assertFalse(Task.objects.filter(id=other.id).exists())
+
+    def test_invalid_batch_applies_nothing(self):
+        payload = {
+            "create": [{"title": "Valid"}, {"title": ""}],
+            "delete": [self.task.id],
+        }
+        response = self._send("post", reverse("api_task_batch"), payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("create[1]", response.json()["errors"])
+        self.assertFalse(Task.objects.filter(title="Valid").exists())
+        self.assertTrue(Task.objects.filter(id=self.task.id).exists())
+
+    def test_batch_rejects_booleans_as_ids(self):
+        url = reverse("api_task_batch")
+        response = self._send("post", url, {"delete": [True]})
+        self.assertEqual(response.status_code, 400)
+        response = self._send("post", url, {"update": [{"id": True, "title": "x"}]})
+        self.assertEqual(response.status_code, 400)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "API task")
+
+    def test_session_writes_require_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse("api_task_list")
+        payload = json.dumps({"title": "Anonymous"})
+        response = client.post(url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+
+        client.force_login(get_user_model().objects.create_user("erin"))
+        payload = json.dumps({"delete": [self.task.id]})
+        batch = reverse("api_task_batch")
+        response = client.post(batch, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+        token = "a" * 32
+        client.cookies[settings.CSRF_COOKIE_NAME] = token
+        response = client.post(
+            url,
+            json.dumps({"title": "Erin"}),
+            content_type="application/json",
+            HTTP_X_CSRFTOKEN=token,
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN SQLite")
+@override_settings(TASKS_PAGE_SIZE=2)
+class TaskQueryPlanTests(TestCase):
+    """
+    Vérifie que les requêtes principales sont servies par un index : une
+    régression (index supprimé, ordre modifié...) ferait apparaître un
+    « SCAN tasks_task » sans index ou un « USE TEMP B-TREE FOR ORDER BY ».
+    """
+
+    def setUp(self):
+        for i in range(5):
+            Task.objects.create(title=f"Plan {i}", complete=i % 2 == 0)
+
+    def _plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return " | ".join(row[-1] for row in cursor.fetchall())
+
+    def _view_task_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("list"), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            q["sql"] for q in ctx.captured_queries if '"tasks_task"' in q["sql"]
+        ]
+
+    def assertUsesIndex(self, plan, index_name):
+        self.assertIn(f"USING INDEX {index_name}", plan.replace("COVERING ", ""))
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_list_pages_use_list_order_index(self):
+        response, queries = self._view_task_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertUsesIndex(self._plan(queries[0]), "task_list_order_idx")
+
+        cursor = response.context["page"].next_cursor
+        _, queries = self._view_task_queries({"cursor": cursor})
+        plan = self._plan(queries[0])
+        self.assertUsesIndex(plan, "task_list_order_idx")
+        # Page suivante : recherche dans l'index, pas de parcours depuis le début
+        self.assertIn("SEARCH", plan)
+
+    def test_completion_filters_use_partial_indexes(self):
+        public = Task.objects.filter(list=None)
+        plan = public.filter(complete=False)[:10].explain()
+        self.assertUsesIndex(plan, "task_list_open_idx")
+        plan = public.filter(complete=True)[:10].explain()
+        self.assertUsesIndex(plan, "task_list_done_idx")
+
+
+class TaskListCacheTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        list_cache.get_cache().clear()
+        list_cache.stats.reset()
+        self.task = Task.objects.create(title="Cached task")
+
+    def test_second_read_is_served_from_the_cache(self):
+        self.client.get(reverse("list"))
+        # Seule la requête de l'ETag (position du journal) reste
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("list"))
+        self.assertContains(response, "Cached task")
+        self.assertEqual(list_cache.stats.as_dict()["hits"], 1)
+        self.assertEqual(list_cache.stats.as_dict()["misses"], 1)
+
+    def test_form_save_and_delete_invalidate_the_list(self):
+        self.client.get(reverse("list"))
+
+        url = reverse("update_task", kwargs={"pk": self.task.id})
+        self.client.post(url, {"title": "Renamed task"})
+        self.assertContains(self.client.get(reverse("list")), "Renamed task")
+
+        self.client.post(reverse("delete", kwargs={"pk": self.task.id}))
+        self.assertNotContains(self.client.get(reverse("list")), "Renamed task")
+
+    def test_bulk_operations_invalidate_the_list(self):
+        self.client.get(reverse("list"))
+        seq = changes.latest_seq()
+
+        Task.objects.filter(id=self.task.id).bulk_delete()
+
+        self.assertGreater(changes.latest_seq(), seq)
+        self.assertNotContains(self.client.get(reverse("list")), "Cached task")
+
+    def test_writes_without_signals_invalidate_the_list(self):
+        # Comme une commande de gestion dans un autre processus : le cache
+        # local n'en sait rien, seul le journal tenu par la base avance
+        self.client.get(reverse("list"))
+        Task.objects.filter(pk=self.task.pk).update(title="Renamed elsewhere")
+        self.assertContains(self.client.get(reverse("list")), "Renamed elsewhere")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(title="Polled task")
+
+    def test_unchanged_list_returns_304_after_one_query(self):
+        response = self.client.get(reverse("list"))
+        etag = response["ETag"]
+
+        # Seule la position du journal des modifications est lue
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(reverse("list"))["ETag"]
+        Task.objects.create(title="New one")
+        response = self.client.get(reverse("list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_update_and_delete_pages_are_conditional(self):
+        for name in ("update_task", "delete"):
+            url = reverse(name, kwargs={"pk": self.task.id})
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_writes_without_signals_change_the_etags(self):
+        # Comme une commande de gestion dans un autre processus : aucun
+        # signal ni cache local, seul le journal tenu par la base avance
+        url = reverse("update_task", kwargs={"pk": self.task.id})
+        list_etag = self.client.get(reverse("list"))["ETag"]
+        task_etag = self.client.get(url)["ETag"]
+
+        Task.objects.filter(pk=self.task.pk).update(title="Renamed elsewhere")
+
+        response = self.client.get(reverse("list"), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed elsewhere")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=task_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_last_modified_header(self):
+        self.assertNotIn("Last-Modified", self.client.get(reverse("list")))
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        Task.objects.create(title="Acheter du pain")
+        Task.objects.create(title="Préparer le cours de qualité logicielle")
+        Task.objects.create(title="Pain perdu pour le dessert du pain")
+
+    def test_fts_query_quotes_user_input(self):
+        self.assertEqual(fts_query('pain" OR dess*'), '"pain" "OR" "dess"*')
+        self.assertEqual(fts_query("pain du"), '"pain" "du"')
+        self.assertIsNone(fts_query("  -- "))
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "FTS5 SQLite")
+    def test_fts_table_follows_writes_and_ranks_results(self):
+        self.assertTrue(fts_available())
+        titles = [t.title for t in search_tasks("pain", limit=10)]
+        # bm25 : le titre qui contient deux fois le mot arrive en premier
+        self.assertEqual(titles[0], "Pain perdu pour le dessert du pain")
+        self.assertEqual(len(titles), 2)
+
+        # Les triggers suivent aussi les écritures groupées
+        Task.objects.filter(title="Acheter du pain").update(title="Acheter du lait")
+        Task.objects.bulk_create([Task(title="Pain de mie")])
+        titles = {t.title for t in search_tasks("pain", limit=10)}
+        self.assertEqual(titles, {"Pain perdu pour le dessert du pain", "Pain de mie"})
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "FTS5 SQLite")
+    def test_accents_and_prefixes_match(self):
+        titles = [t.title for t in search_tasks("qualite log", limit=10)]
+        self.assertEqual(titles, ["Préparer le cours de qualité logicielle"])
+
+    def test_search_on_list_page_and_api(self):
+        response = self.client.get(reverse("list"), {"q": "cours"})
+        self.assertContains(response, "qualité logicielle")
+        self.assertNotContains(response, "Acheter du pain")
+
+        response = self.client.get(reverse("api_task_list"), {"q": "dessert"})
+        titles = [r["title"] for r in response.json()["results"]]
+        self.assertEqual(titles, ["Pain perdu pour le dessert du pain"])
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        list_cache.get_cache().clear()
+        self.factory = AsyncRequestFactory()
+        self.task = Task.objects.create(title="Async task")
+
+    async def test_index_lists_and_creates_tasks(self):
+        response = await async_views.index(self.factory.get("/"))
+        self.assertContains(response, "Async task")
+        self.assertIn("ETag", response)
+
+        request = self.factory.get("/", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual((await async_views.index(request)).status_code, 304)
+
+        response = await async_views.index(
+            self.factory.post("/", {"title": "Created async"})
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await Task.objects.filter(title="Created async").aexists())
+
+    async def test_update_and_delete(self):
+        pk = self.task.id
+        request = self.factory.post("/", {"title": "Updated async", "complete": True})
+        response = await async_views.updateTask(request, pk)
+        self.assertEqual(response.status_code, 302)
+        task = await Task.objects.aget(id=pk)
+        self.assertTrue(task.complete)
+
+        response = await async_views.deleteTask(self.factory.post("/"), pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await Task.objects.filter(id=pk).aexists())
+
+    async def test_json_api(self):
+        response = await async_views.task_list(self.factory.get("/api/tasks/"))
+        results = json.loads(response.content)["results"]
+        self.assertEqual(results[0]["title"], "Async task")
+
+        request = self.factory.patch(
+            "/", data=json.dumps({"complete": True}), content_type="application/json"
+        )
+        response = await async_views.task_detail(request, self.task.id)
+        self.assertTrue(json.loads(response.content)["complete"])
+
+        response = await async_views.task_detail(self.factory.put("/"), self.task.id)
+        self.assertEqual(response.status_code, 405)
+
+
+    async def test_fragment_responses(self):
+        fragment = {"HX-Request": "true"}
+        request = self.factory.post("/", {"title": "Inline async"}, headers=fragment)
+        response = await async_views.index(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertContains(response, "Inline async", status_code=201)
+
+        response = await async_views.deleteTask(
+            self.factory.post("/", headers=fragment), self.task.id
+        )
+        self.assertEqual(response.status_code, 204)
+
+
+class FragmentRenderingTests(TestCase):
+    fragment = {"HTTP_HX_REQUEST": "true"}
+
+    def setUp(self):
+        self.task = Task.objects.create(title="Row task")
+
+    def test_create_returns_only_the_new_row(self):
+        response = self.client.post(
+            reverse("list"), {"title": "Inline task"}, **self.fragment
+        )
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(title="Inline task")
+        self.assertContains(response, 'class="item-row"', count=1, status_code=201)
+        delete_url = reverse("delete", args=[task.id])
+        self.assertContains(response, delete_url, status_code=201)
+        self.assertNotContains(response, "Row task", status_code=201)
+        self.assertLess(len(response.content), 1000)
+
+    def test_update_returns_the_updated_row(self):
+        url = reverse("update_task", args=[self.task.id])
+        response = self.client.post(
+            url, {"title": "Row task", "complete": "on"}, **self.fragment
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<strike data-action="toggle">Row task</strike>')
+
+    def test_delete_returns_no_content(self):
+        url = reverse("delete", args=[self.task.id])
+        response = self.client.post(url, **self.fragment)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+
+    def test_invalid_form_is_rejected_without_rendering_the_page(self):
+        # Le script retombe alors sur l'envoi classique du formulaire
+        response = self.client.post(reverse("list"), {"title": ""}, **self.fragment)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotContains(response, "<form", status_code=400)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "PRAGMA SQLite")
+class SqliteTuningTests(TestCase):
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_profile_pragmas_are_applied_to_connections(self):
+        profile = settings.SQLITE_PROFILES[settings.SQLITE_PROFILE]
+        if "synchronous" in profile:
+            self.assertEqual(self._pragma("synchronous"), 1)  # NORMAL
+        if "busy_timeout" in profile:
+            self.assertEqual(self._pragma("busy_timeout"), profile["busy_timeout"])
+
+    def test_pragma_names_and_values_are_validated(self):
+        with connection.cursor() as cursor:
+            with self.assertRaises(ValueError):
+                apply_pragmas(cursor, {"synchronous; DROP TABLE x": 1})
+            with self.assertRaises(ValueError):
+                apply_pragmas(cursor, {"journal_mode": "WAL; DROP TABLE x"})
+
+    def test_bench_sqlite_command_reports_each_profile(self):
+        out = StringIO()
+        call_command(
+            "bench_sqlite",
+            "--duration", "0.2", "--readers", "1", "--writers", "1",
+            "--seed-rows", "10",
+            stdout=out,
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(
+            [r["profile"] for r in results], list(settings.SQLITE_PROFILES)
+        )
+        self.assertTrue(all(r["writes_per_s"] > 0 for r in results))
+
+
+class WriteBehindQueueTests(TestCase):
+    def test_pending_creates_are_committed_in_one_insert(self):
+        queue = writebehind.WriteBehindQueue(max_batch=50, autostart=False)
+        futures = [queue.submit(Task(title=f"Queued {i}")) for i in range(20)]
+        self.assertFalse(any(f.done() for f in futures))
+
+        # SAVEPOINT + un seul INSERT + RELEASE
+        with self.assertNumQueries(3):
+            self.assertEqual(queue.flush(), 20)
+
+        ids = [f.result() for f in futures]
+        self.assertEqual(Task.objects.filter(id__in=ids).count(), 20)
+
+    def test_batches_respect_max_batch_and_mix_updates(self):
+        existing = Task.objects.create(title="Before")
+        queue = writebehind.WriteBehindQueue(max_batch=3, autostart=False)
+        existing.title = "After"
+        queue.submit(existing)
+        for i in range(4):
+            queue.submit(Task(title=f"New {i}"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            queue.flush()
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+        existing.refresh_from_db()
+        self.assertEqual(existing.title, "After")
+
+    def test_failing_write_does_not_fail_the_batch(self):
+        queue = writebehind.WriteBehindQueue(autostart=False)
+        ok = queue.submit(Task(title="Valid"))
+        bad = queue.submit(Task(title=None))
+        queue.flush()
+
+        self.assertIsNotNone(ok.result())
+        self.assertIsNotNone(bad.exception())
+        self.assertTrue(Task.objects.filter(title="Valid").exists())
+
+    def test_updates_are_grouped_by_field_set(self):
+        first, second, third = (Task.objects.create(title=f"T{i}") for i in range(3))
+        queue = writebehind.WriteBehindQueue(autostart=False)
+        for task in (first, second):
+            task.complete = True
+            queue.submit(task)
+        third.title = "Renamed"
+        third.complete = True
+        queue.submit(third, update_fields=["title"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            queue.flush()
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        third.refresh_from_db()
+        self.assertEqual((third.title, third.complete), ("Renamed", False))
+        self.assertEqual(counters.list_summary(None), (2, 3))
+
+    def test_last_update_of_a_task_wins_within_a_batch(self):
+        task = Task.objects.create(title="Before")
+        queue = writebehind.WriteBehindQueue(autostart=False)
+        first = Task.objects.get(pk=task.pk)
+        first.title = "first"
+        second = Task.objects.get(pk=task.pk)
+        second.title = "second"
+        futures = [queue.submit(first), queue.submit(second)]
+        queue.flush()
+
+        self.assertEqual([f.result() for f in futures], [task.pk, task.pk])
+        task.refresh_from_db()
+        self.assertEqual(task.title, "second")
+
+    def test_replayed_creates_get_a_committed_pk(self):
+        queue = writebehind.WriteBehindQueue(autostart=False)
+        created = queue.submit(Task(title="Created"))
+        # Mise à jour d'une tâche supprimée : le lot est annulé après
+        # l'INSERT des créations
+        gone = Task.objects.create(title="Gone")
+        Task.objects.filter(pk=gone.pk).delete()
+        gone.title = "Lost"
+        missing = queue.submit(gone)
+        queue.flush()
+
+        task = Task.objects.get(pk=created.result())
+        self.assertEqual(task.title, "Created")
+        self.assertIsInstance(missing.exception(), Task.DoesNotExist)
+        self.assertEqual(Task.objects.count(), 1)
+
+    @override_settings(TASKS_WRITE_BEHIND={"ENABLED": True})
+    def test_writes_inside_a_transaction_are_not_queued(self):
+        writebehind._queue = None
+        task = writebehind.save_task(Task(title="Direct"))
+        self.assertIsNone(writebehind._queue)
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+
+class WriteBehindViewTests(TransactionTestCase):
+    def setUp(self):
+        writebehind._queue = None
+        self.addCleanup(self._stop_queue)
+
+    def _stop_queue(self):
+        if writebehind._queue is not None:
+            writebehind._queue.stop()
+            writebehind._queue = None
+
+    @override_settings(TASKS_WRITE_BEHIND={"ENABLED": True, "MAX_DELAY_MS": 5})
+    def test_view_and_api_wait_for_the_flusher_commit(self):
+        response = self.client.post(reverse("list"), {"title": "Coalesced"})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Task.objects.filter(title="Coalesced").exists())
+
+        response = self.client.post(
+            reverse("api_task_list"),
+            data=json.dumps({"title": "Coalesced API"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(id=response.json()["id"])
+        self.assertEqual(task.title, "Coalesced API")
+
+
+class BenchTests(unittest.TestCase):
+    def test_plans_are_reproducible_and_never_update_a_deleted_task(self):
+        mix = {"list": 1, "update": 1, "delete": 1}
+        plans = build_plans(3, 20, mix, seed_value=7, id_range=(1, 200))
+        self.assertEqual(plans, build_plans(3, 20, mix, 7, (1, 200)))
+
+        paths = [path for plan in plans for _, _, path, _ in plan]
+        deleted = [int(p.split("/")[2]) for p in paths if "delete_task" in p]
+        updated = [int(p.split("/")[2]) for p in paths if "update_task" in p]
+        self.assertEqual(len(deleted), len(set(deleted)))
+        self.assertFalse(set(deleted) & set(updated))
+
+    def test_percentiles_and_regressions(self):
+        samples = [("list", ms / 1000, 200, 1) for ms in range(1, 101)]
+        run = {"size": 10, **loadtest.summarize(samples, elapsed=1.0)}
+        self.assertEqual(run["endpoints"]["list"]["p50_ms"], 50.0)
+        self.assertEqual(run["endpoints"]["list"]["p99_ms"], 99.0)
+        self.assertEqual(run["throughput_rps"], 100.0)
+
+        baseline = {"runs": [run]}
+        self.assertEqual(loadtest.compare({"runs": [run]}, baseline, 0.2), [])
+        # p95 doublé et une requête SQL de plus : deux régressions
+        worse = [(op, t * 2, status, q + 1) for op, t, status, q in samples]
+        slower = {"size": 10, **loadtest.summarize(worse, elapsed=1.0)}
+        regressions = loadtest.compare({"runs": [slower]}, baseline, 0.2)
+        self.assertEqual(len(regressions), 2)
+
+
+PROFILING_ON = {"ENABLED": True, "CPROFILE": True, "SLOW_MS": 0}
+PROFILING_OFF = {"ENABLED": False, "CPROFILE": True, "SLOW_MS": 0}
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        profiling.registry.reset()
+        list_cache.get_cache().clear()
+        Task.objects.create(title="Profiled")
+
+    @override_settings(TASKS_PROFILING=PROFILING_OFF)
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse("list"))
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(profiling.registry.as_dict()["views"], {})
+
+    @override_settings(TASKS_PROFILING=PROFILING_ON, DEBUG=True)
+    def test_records_queries_templates_and_slow_profiles_per_view(self):
+        response = self.client.get(reverse("list"))
+        timing = response.headers["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("tpl;dur=", timing)
+
+        stats = self.client.get(reverse("profiling")).json()
+        view = stats["views"]["list"]
+        self.assertEqual(view["count"], 1)
+        self.assertGreater(view["queries_mean"], 0)
+        self.assertGreater(view["template_mean_ms"], 0)
+        self.assertEqual(stats["slow_profiles"][0]["url_name"], "list")
+        self.assertIn("cumulative", stats["slow_profiles"][0]["stats"])
+
+    @override_settings(TASKS_PROFILING=PROFILING_ON)
+    async def test_async_requests_are_profiled(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(
+            iscoroutinefunction(profiling.ProfilingMiddleware(get_response))
+        )
+        response = await self.async_client.get(reverse("list"))
+        self.assertIn("tpl;dur=", response.headers["Server-Timing"])
+        view = profiling.registry.as_dict()["views"]["list"]
+        self.assertEqual(view["count"], 1)
+        self.assertGreater(view["queries_mean"], 0)
+
+    @override_settings(TASKS_PROFILING=PROFILING_ON)
+    def test_stats_endpoint_requires_staff_outside_debug(self):
+        response = self.client.get(reverse("profiling"))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(
+    TASKS_METRICS={"ENABLED": True, "DIR": None, "ALLOWED_IPS": ["127.0.0.1"]}
+)
+class MetricsTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        metrics.reset_store()
+        self.addCleanup(metrics.reset_store)
+
+    def _metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_counts_writes_latency_and_table_size(self):
+        self.client.post(reverse("list"), {"title": "Measured"})
+        task = Task.objects.get(title="Measured")
+        self.client.post(reverse("update_task", args=[task.id]), {"title": "Again"})
+        self.client.post(reverse("delete", args=[task.id]))
+        Task.objects.create(title="Open")
+        self.client.get(reverse("list"))
+
+        text = self._metrics()
+        self.assertIn('todo_task_writes_total{op="create"} 2', text)
+        self.assertIn('todo_task_writes_total{op="update"} 1', text)
+        self.assertIn('todo_task_writes_total{op="delete"} 1', text)
+        self.assertIn(
+            'todo_request_duration_seconds_bucket{le="+Inf",view="list"} 2', text
+        )
+        self.assertIn('todo_request_duration_seconds_count{view="delete"} 1', text)
+        self.assertIn('todo_tasks{complete="false"} 1', text)
+        self.assertIn("todo_list_cache_hit_ratio", text)
+
+    def test_bulk_operations_are_counted(self):
+        Task.objects.bulk_create([Task(title="a"), Task(title="b")])
+        Task.objects.all().bulk_delete()
+        self.assertIn('todo_task_writes_total{op="delete"} 2', self._metrics())
+
+    async def test_async_requests_are_measured(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(
+            iscoroutinefunction(metrics.MetricsMiddleware(get_response))
+        )
+        response = await self.async_client.get(reverse("list"))
+        self.assertEqual(response.status_code, 200)
+        text = await sync_to_async(self._metrics)()
+        self.assertIn('todo_request_duration_seconds_count{view="list"} 1', text)
+        self.assertIn('todo_db_queries_total{view="list"}', text)
+
+    def test_opened_connections_are_counted(self):
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(other.close)
+        other.ensure_connection()
+        self.assertIn(
+            'todo_db_connections_opened_total{alias="default"} 1', self._metrics()
+        )
+
+    def test_values_of_every_process_file_are_summed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # Fichier laissé par un autre worker
+            other = metrics.MetricsFile(Path(tmp) / "1.db")
+            key = metrics._key("todo_task_writes_total", {"op": "create"})
+            other.inc_many([(key, 5)])
+            with override_settings(TASKS_METRICS={"ENABLED": True, "DIR": tmp}):
+                metrics.reset_store()
+                metrics.TASK_WRITES.inc(op="create")
+                text = metrics.render_metrics()
+        self.assertIn('todo_task_writes_total{op="create"} 6', text)
+
+    def test_endpoint_is_restricted_to_allowed_addresses_and_staff(self):
+        url = reverse("metrics")
+        outside = {"REMOTE_ADDR": "203.0.113.5"}
+        self.assertEqual(self.client.get(url, **outside).status_code, 403)
+        staff = get_user_model().objects.create_user("ops", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url, **outside).status_code, 200)
+
+    def test_disabled_endpoint_is_not_found(self):
+        with override_settings(TASKS_METRICS={"ENABLED": False}):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.tasks = Task.objects.bulk_create(
+            Task(title=f"Bulk {i}", complete=i % 2 == 0) for i in range(6)
+        )
+
+    def _post(self, action, ids=()):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse("bulk"), {"action": action, "ids": [t.id for t in ids]}
+            )
+        writes = [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith(("UPDATE", "DELETE"))
+        ]
+        return response, writes
+
+    def test_complete_selected_is_a_single_update(self):
+        open_tasks = [t for t in self.tasks if not t.complete]
+        response, writes = self._post("complete_selected", open_tasks[:2])
+        self.assertRedirects(response, reverse("list"))
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(Task.objects.filter(complete=False).count(), 1)
+
+    def test_complete_all_and_delete_completed(self):
+        _, writes = self._post("complete_all")
+        self.assertEqual(len(writes), 1)
+        self.assertFalse(Task.objects.filter(complete=False).exists())
+
+        _, writes = self._post("delete_completed")
+        self.assertEqual(len(writes), 1)
+        self.assertFalse(Task.objects.exists())
+
+    def test_delete_selected_invalidates_the_list(self):
+        self.client.get(reverse("list"))
+        _, writes = self._post("delete_selected", self.tasks[:1])
+        self.assertEqual(len(writes), 1)
+        self.assertNotContains(self.client.get(reverse("list")), "Bulk 0<")
+
+    def test_invalid_ids_are_skipped(self):
+        task = next(t for t in self.tasks if not t.complete)
+        response = self.client.post(
+            reverse("bulk"), {"action": "complete_selected", "ids": ["²", "x", task.id]}
+        )
+        self.assertRedirects(response, reverse("list"))
+        task.refresh_from_db()
+        self.assertTrue(task.complete)
+
+    def test_unknown_action_is_rejected(self):
+        response, writes = self._post("drop_table")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(writes, [])
+        self.assertEqual(self.client.get(reverse("bulk")).status_code, 405)
+
+    def test_admin_actions_use_bulk_queries(self):
+        task_admin = admin.site._registry[Task]
+        request = RequestFactory().post("/")
+        request._messages = mock.Mock()
+        with CaptureQueriesContext(connection) as ctx:
+            task_admin.mark_complete(request, Task.objects.all())
+            task_admin.delete_completed(request, Task.objects.all())
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EVENTS={"MAX_STREAM_SECONDS": 0, "POLL_INTERVAL": 0})
+class ChangeFeedTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        self.start = changes.latest_seq()
+
+    def _ops(self):
+        return list(
+            TaskChange.objects.filter(id__gt=self.start).values_list("op", flat=True)
+        )
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "Triggers SQLite")
+    def test_every_write_is_logged_without_extra_queries(self):
+        with self.assertNumQueries(1):
+            task = Task.objects.create(title="Logged")
+        task.title = "Logged again"
+        task.save()
+        Task.objects.bulk_create([Task(title="a"), Task(title="b")])
+        Task.objects.filter(title__in=["a", "b"]).bulk_complete()
+        Task.objects.all().bulk_delete()
+        self.assertEqual(
+            self._ops(),
+            ["create", "update", "create", "create", "update", "update"]
+            + ["delete"] * 3,
+        )
+
+    def test_changes_are_coalesced_per_task(self):
+        task = Task.objects.create(title="Draft")
+        task.title = "Final"
+        task.save()
+        gone = Task.objects.create(title="Gone")
+        gone_id = gone.id
+        gone.delete()
+
+        events, seq = changes.read_changes(self.start, limit=50)
+        self.assertEqual(seq, changes.latest_seq())
+        self.assertEqual(len(events), 2)
+        self.assertIn("event: create", events[0])
+        self.assertIn(f'data-id=\\"{task.id}\\"', events[0])
+        self.assertIn("Final", events[0])
+        self.assertIn(f'event: delete\ndata: {{"id": {gone_id}}}', events[1])
+
+        self.assertEqual(changes.read_changes(seq, limit=50), ([], seq))
+
+    def test_lagging_or_pruned_clients_reload(self):
+        for i in range(3):
+            Task.objects.create(title=f"Task {i}")
+        events, seq = changes.read_changes(self.start, limit=2)
+        self.assertIn("event: reload", events[0])
+        self.assertEqual(seq, changes.latest_seq())
+
+        out = StringIO()
+        call_command("prune_task_changes", "--keep", "1", stdout=out)
+        events, _ = changes.read_changes(self.start, limit=50)
+        self.assertIn("event: reload", events[0])
+
+    def test_stream_resumes_from_last_event_id(self):
+        Task.objects.create(title="Missed")
+        response = self.client.get(
+            reverse("task_events"), HTTP_LAST_EVENT_ID=str(self.start)
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("retry: "))
+        self.assertIn("Missed", body)
+
+        response = self.client.get(reverse("task_events"), {"after": "x"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("task_events"), HTTP_LAST_EVENT_ID="²")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_stream(self):
+        await Task.objects.acreate(title="Async change")
+        config = changes.events_config()
+        chunks = [c async for c in changes.aevent_stream(self.start, config)]
+        self.assertIn("Async change", "".join(chunks))
+
+    def test_list_page_starts_the_feed_at_the_current_sequence(self):
+        Task.objects.create(title="Listed")
+        response = self.client.get(reverse("list"))
+        self.assertContains(response, f'data-seq="{changes.latest_seq()}"')
+
+
+class ExportTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        Task.objects.create(title="Acheter du pain")
+        Task.objects.create(title='Virgule, "guillemets"', complete=True)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def _export(self, fmt, compress=False):
+        return b"".join(iter_export(fmt, compress)).decode()
+
+    def test_json_export_matches_dataset_format_and_reimports(self):
+        text = self._export("json")
+        self.assertTrue(text.startswith('[\n  {\n    "title": "Acheter du pain",'))
+        self.assertEqual(json.loads(text)[1]["complete"], True)
+
+        path = self.dir / "export.json"
+        path.write_text(text, encoding="utf-8")
+        Task.objects.all().delete()
+        self.assertEqual(import_tasks_streaming(path), 2)
+        self.assertTrue(Task.objects.filter(complete=True).exists())
+
+    def test_ndjson_and_csv_exports(self):
+        lines = self._export("ndjson").splitlines()
+        first = {"title": "Acheter du pain", "complete": False}
+        self.assertEqual(json.loads(lines[0]), first)
+
+        text = self._export("csv")
+        self.assertEqual(
+            text.splitlines(),
+            [
+                "title,complete",
+                "Acheter du pain,false",
+                '"Virgule, ""guillemets""",true',
+            ],
+        )
+
+    def test_gzip_export_and_single_query(self):
+        out = io.BytesIO()
+        with self.assertNumQueries(1):
+            count = export_tasks(out, "ndjson", compress=True, chunk_size=1)
+        self.assertEqual(count, 2)
+        self.assertEqual(len(gzip.decompress(out.getvalue()).splitlines()), 2)
+
+    def test_download_is_streamed(self):
+        response = self.client.get(reverse("export"), {"format": "csv", "gzip": "1"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="tasks.csv.gz"', response["Content-Disposition"])
+        body = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertTrue(body.startswith("title,complete"))
+
+        response = self.client.get(reverse("export"), {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_tasks_command_infers_the_format(self):
+        path = self.dir / "tasks.ndjson.gz"
+        out = StringIO()
+        call_command("export_tasks", str(path), stdout=out)
+        self.assertIn("2 tâches exportées", out.getvalue())
+        self.assertEqual(len(gzip.decompress(path.read_bytes()).splitlines()), 2)
+
+
+@NO_REPLICAS
+class ArchiveTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        old = timezone.now() - datetime.timedelta(days=60)
+        self.old_done = [
+            Task.objects.create(title=f"Old {i}", complete=True) for i in range(5)
+        ]
+        self.old_open = Task.objects.create(title="Old open")
+        self.recent_done = Task.objects.create(title="Recent", complete=True)
+        Task.objects.filter(title__startswith="Old").update(created=old)
+
+    def test_moves_old_completed_tasks_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            count = archive.archive_tasks(after_days=30, batch_size=2)
+        self.assertEqual(count, 5)
+        inserts = [q for q in ctx.captured_queries if "INSERT INTO" in q["sql"]]
+        self.assertEqual(len(inserts), 3)
+
+        self.assertEqual(
+            set(Task.objects.values_list("title", flat=True)), {"Old open", "Recent"}
+        )
+        archived = TaskArchive.objects.get(id=self.old_done[0].id)
+        self.assertEqual(archived.title, "Old 0")
+        self.assertTrue(archived.complete)
+        self.assertEqual(archive.archive_tasks(after_days=30), 0)
+
+    def test_archived_tasks_leave_search_and_cache(self):
+        seq = changes.latest_seq()
+        archive.archive_tasks(after_days=30)
+        self.assertGreater(changes.latest_seq(), seq)
+        if fts_available():
+            self.assertEqual(list(search_tasks("Old 1", limit=10)), [])
+
+    def test_archive_view_reads_the_cold_table(self):
+        call_command("archive_tasks", "--days", "30", stdout=StringIO())
+        response = self.client.get(reverse("archive"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Old 3")
+        self.assertNotContains(response, "Recent")
+
+    def test_command_rejects_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command("archive_tasks", "--batch-size", "0")
+
+
+@override_settings(
+    TASKS_REPLICAS={"ALIASES": ["replica1"], "MAX_LAG_SECONDS": 5.0}
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Pas de transaction autour des tests : elle enverrait toutes les
+    # lectures sur la base principale
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.lag = 0.0
+        patcher = mock.patch.object(replicas, "replica_lag", lambda alias: self.lag)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        replicas._lag_cache.clear()
+        self.addCleanup(replicas._lag_cache.clear)
+
+    def test_reads_use_replicas_only_when_allowed_and_fresh(self):
+        self.assertEqual(self.router.db_for_read(Task), "default")
+        with replicas.use_replicas():
+            self.assertEqual(self.router.db_for_read(Task), "replica1")
+            self.assertEqual(self.router.db_for_write(Task), "default")
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(Task), "default")
+
+        self.lag = 10.0
+        replicas._lag_cache.clear()
+        with replicas.use_replicas():
+            self.assertEqual(self.router.db_for_read(Task), "default")
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        middleware = replicas.ReplicaMiddleware(
+            lambda request: HttpResponse(self.router.db_for_read(Task))
+        )
+        factory = RequestFactory()
+        response = middleware(factory.get("/"))
+        self.assertEqual(response.content, b"replica1")
+
+        response = middleware(factory.post("/"))
+        self.assertEqual(response.content, b"default")
+        cookie = response.cookies[replicas.STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], 10)
+
+        request = factory.get("/")
+        request.COOKIES[replicas.STICKY_COOKIE] = "1"
+        self.assertEqual(middleware(request).content, b"default")
+
+    async def test_async_requests_are_routed(self):
+        async def get_response(request):
+            alias = await sync_to_async(self.router.db_for_read)(Task)
+            return HttpResponse(alias)
+
+        middleware = replicas.ReplicaMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = AsyncRequestFactory()
+        response = await middleware(factory.get("/"))
+        self.assertEqual(response.content, b"replica1")
+
+        response = await middleware(factory.post("/"))
+        self.assertEqual(response.content, b"default")
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+
+    def test_list_cache_key_names_the_read_database_and_snapshot(self):
+        def variant(allowed):
+            with replicas.use_replicas(allowed):
+                return views.list_variant(RequestFactory().get("/"))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "replica1.sqlite3"
+            path.touch()
+            with mock.patch.object(replicas, "database_path", lambda alias: path):
+                synced = variant(True)
+                self.assertIn("replica1@", synced)
+                self.assertEqual(variant(True), synced)
+                # Client épinglé sur la base principale après une écriture
+                self.assertIn("default@:", variant(False))
+
+                os.utime(path, (time.time() + 5, time.time() + 5))
+                self.assertNotEqual(variant(True), synced)
+
+    @override_settings(TASKS_REPLICAS={"ALIASES": []})
+    def test_middleware_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            replicas.ReplicaMiddleware(lambda request: None)
+
+
+class ReplicaSyncTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.primary = Path(tmp.name) / "primary.sqlite3"
+        self.replica = Path(tmp.name) / "replica.sqlite3"
+
+    def _execute(self, path, sql):
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_backup_copies_the_primary_and_tracks_lag(self):
+        self._execute(self.primary, "CREATE TABLE t (x)")
+        self._execute(self.primary, "INSERT INTO t VALUES (1)")
+        self.assertEqual(replicas.file_lag(self.primary, self.replica), float("inf"))
+
+        replicas.sync_file(self.primary, self.replica)
+        self.assertEqual(self._execute(self.replica, "SELECT x FROM t"), [(1,)])
+        self.assertEqual(replicas.file_lag(self.primary, self.replica), 0.0)
+
+        self._execute(self.primary, "INSERT INTO t VALUES (2)")
+        later = time.time() + 3
+        os.utime(self.primary, (later, later))
+        self.assertGreaterEqual(replicas.file_lag(self.primary, self.replica), 2.0)
+
+        replicas.sync_file(self.primary, self.replica)
+        self.assertEqual(len(self._execute(self.replica, "SELECT x FROM t")), 2)
+
+
+@NO_REPLICAS
+class TaskListScopingTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.public = Task.objects.create(title="Public task")
+
+    def _create(self, user, title):
+        self.client.force_login(user)
+        self.client.post(reverse("list"), {"title": title})
+        task_list = TaskList.objects.get(owner=user)
+        return shards.list_tasks(task_list).get(title=title)
+
+    def test_each_user_sees_only_their_list(self):
+        task = self._create(self.alice, "Alice task")
+        self.assertEqual(task.list, TaskList.objects.get(owner=self.alice))
+
+        response = self.client.get(reverse("list"))
+        self.assertContains(response, "Alice task")
+        self.assertNotContains(response, "Public task")
+
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse("list"))
+        self.assertNotContains(response, "Alice task")
+        response = self.client.get(reverse("list"), {"q": "Alice"})
+        self.assertNotContains(response, "Alice task")
+        response = self.client.get(reverse("api_task_list"))
+        self.assertEqual(response.json()["results"], [])
+
+        self.client.logout()
+        response = self.client.get(reverse("list"))
+        self.assertContains(response, "Public task")
+        self.assertNotContains(response, "Alice task")
+
+    def test_other_lists_cannot_be_changed(self):
+        task = self._create(self.alice, "Alice task")
+        self.client.force_login(self.bob)
+        url = reverse("update_task", args=[task.id])
+        response = self.client.post(url, {"title": "Hijacked"})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse("delete", args=[task.id]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.post(reverse("bulk"), {"action": "complete_all"})
+        self.client.post(reverse("bulk"), {"action": "delete_completed"})
+        task.refresh_from_db()
+        self.assertFalse(task.complete)
+        self.public.refresh_from_db()
+        self.assertFalse(self.public.complete)
+
+    @override_settings(TASK_SHARDS=["default", "shard2", "shard3"])
+    def test_lists_are_spread_over_shards(self):
+        lists = [TaskList(id=i, shard="") for i in range(1, 301)]
+        used = {shards.shard_for(task_list) for task_list in lists}
+        self.assertEqual(used, {"default", "shard2", "shard3"})
+        self.assertEqual(shards.shard_for(lists[0]), shards.hashed_shard(1))
+        self.assertEqual(shards.shard_for(None), "default")
+        self.assertEqual(shards.shard_for(TaskList(id=1, shard="shard3")), "shard3")
+
+
+@unittest.skipUnless(
+    len(settings.TASK_SHARDS) > 1, "un seul shard configuré (TODO_SHARDS)"
+)
+class TaskListMoveTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def test_move_list_between_shards(self):
+        owner = get_user_model().objects.create_user("carol")
+        task_list = TaskList.objects.create(owner=owner, name="carol")
+        source = shards.shard_for(task_list)
+        target = next(a for a in settings.TASK_SHARDS if a != source)
+        for i in range(3):
+            task = Task(title=f"Carol {i}", complete=i == 0)
+            task.save(using=shards.assign_list(task, task_list))
+        archive_now = timezone.now() + datetime.timedelta(days=60)
+        archive.archive_tasks(after_days=30, now=archive_now)
+
+        self.assertEqual(shards.move_list(task_list, target), 2)
+        task_list.refresh_from_db()
+        self.assertEqual(task_list.shard, target)
+        self.assertEqual(
+            sorted(shards.list_tasks(task_list).values_list("title", flat=True)),
+            ["Carol 1", "Carol 2"],
+        )
+        self.assertEqual(shards.list_archive(task_list).get().title, "Carol 0")
+        self.assertFalse(shards.list_tasks(task_list, using=source).exists())
+        self.assertEqual(counters.list_summary(task_list), (0, 2))
+        self.assertEqual(counters.list_summary(task_list, using=source), (0, 0))
+
+
+@unittest.skipUnless(
+    len(settings.TASK_SHARDS) > 1, "un seul shard configuré (TODO_SHARDS)"
+)
+class ShardWideMaintenanceTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        for alias in settings.TASK_SHARDS:
+            for i in range(2):
+                Task.objects.using(alias).create(title=f"{alias} {i}")
+
+    def test_export_reads_every_shard(self):
+        out = io.BytesIO()
+        count = export_tasks(out, "ndjson")
+        self.assertEqual(count, 2 * len(settings.TASK_SHARDS))
+        titles = {json.loads(line)["title"] for line in out.getvalue().splitlines()}
+        self.assertIn(f"{settings.TASK_SHARDS[-1]} 1", titles)
+
+    def test_prune_keeps_the_newest_entries_of_each_shard(self):
+        call_command("prune_task_changes", "--keep", "1", stdout=StringIO())
+        for alias in settings.TASK_SHARDS:
+            self.assertEqual(TaskChange.objects.using(alias).count(), 1)
+
+    def test_metrics_count_every_shard(self):
+        total = 2 * len(settings.TASK_SHARDS)
+        text = metrics.render_metrics()
+        self.assertIn(f'todo_tasks{{complete="false"}} {total}', text)
+
+
+@NO_REPLICAS
+class TaskCounterTests(TestCase):
+    databases = SHARD_DATABASES
+
+    def assertCounted(self, task_list=None):
+        tasks = shards.list_tasks(task_list)
+        expected = (tasks.filter(complete=True).count(), tasks.count())
+        self.assertEqual(counters.list_summary(task_list), expected)
+
+    def test_view_writes_keep_the_counters_exact(self):
+        self.client.post(reverse("list"), {"title": "One"})
+        self.client.post(reverse("list"), {"title": "Two"})
+        task = shards.list_tasks(None).get(title="One")
+        url = reverse("update_task", args=[task.id])
+        self.client.post(url, {"title": "One", "complete": "on"})
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.list_summary(None), (1, 2))
+
+        self.client.post(reverse("delete", args=[task.id]))
+        self.assertEqual(counters.list_summary(None), (0, 1))
+        self.client.post(reverse("bulk"), {"action": "complete_all"})
+        self.assertCounted()
+        self.assertContains(self.client.get(reverse("list")), "1 of 1 done")
+
+    def test_lists_are_counted_separately(self):
+        Task.objects.create(title="Public task", complete=True)
+        self.client.force_login(get_user_model().objects.create_user("dave"))
+        self.client.post(reverse("list"), {"title": "Dave task"})
+        task_list = TaskList.objects.get(owner__username="dave")
+        self.assertEqual(counters.list_summary(task_list), (0, 1))
+        self.assertEqual(counters.list_summary(None), (1, 1))
+        self.assertEqual(counters.global_summary(), (1, 2))
+
+    def test_imports_archive_and_rollbacks(self):
+        created = import_tasks_from_dataset(Path(settings.BASE_DIR) / "dataset.json")
+        self.assertEqual(counters.list_summary(None).total, created)
+        self.assertCounted()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Task.objects.create(title="Rolled back", complete=True)
+            raise RuntimeError
+        self.assertCounted()
+
+        later = timezone.now() + datetime.timedelta(days=1)
+        archive.archive_tasks(after_days=0, now=later)
+        self.assertEqual(counters.list_summary(None).completed, 0)
+        self.assertCounted()
+
+    def test_repair_recomputes_drifted_counters(self):
+        Task.objects.bulk_create(
+            Task(title=f"Drift {i}", complete=i < 2) for i in range(5)
+        )
+        TaskCounter.objects.update(total=99)
+        TaskCounter.objects.create(list_id=12345, total=3, completed=1)
+
+        self.assertEqual(counters.recount_counters(), 2)
+        self.assertEqual(counters.list_summary(None), (2, 5))
+        self.assertFalse(TaskCounter.objects.filter(list_id=12345).exists())
+
+        out = StringIO()
+        call_command("repair_task_counters", stdout=out)
+        self.assertIn("0 listes corrigées", out.getvalue())
+        self.assertIn("2 of 5 done", out.getvalue())
+
+
+@NO_REPLICAS
+class TaskCounterWithoutTriggersTests(TestCase):
+    """Compteurs tenus par les signaux, comme sur une base autre que SQLite."""
+
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        counters.uninstall_counters(connection)
+        patcher = mock.patch.object(counters, "uses_triggers", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertExact(self):
+        self.assertEqual(counters.recount_counters(), 0)
+
+    def test_single_writes_apply_deltas_without_counting_tasks(self):
+        self.client.post(reverse("list"), {"title": "One"})
+        self.client.post(reverse("list"), {"title": "Two"})
+        task = Task.objects.get(title="One")
+        url = reverse("update_task", args=[task.id])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, {"title": "One", "complete": "on"})
+        self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+        self.assertEqual(counters.list_summary(None), (1, 2))
+
+        task.refresh_from_db()
+        task.title = "Renamed"
+        task.save(update_fields=["title"])
+        self.client.post(reverse("delete", args=[task.id]))
+        self.assertEqual(counters.list_summary(None), (0, 1))
+        self.assertExact()
+
+    def test_bulk_operations_send_their_deltas(self):
+        with mock.patch.object(counters, "recount_counters") as recount:
+            import_tasks_from_dataset(Path(settings.BASE_DIR) / "dataset.json")
+            for i in range(4):
+                Task.objects.create(title=f"Open {i}")
+            Task.objects.filter(complete=False)[:1].get().move_after(None)
+            ids = Task.objects.values_list("id", flat=True)[:2]
+            Task.objects.filter(id__in=list(ids)).bulk_complete()
+            first, second = Task.objects.filter(complete=False)[:2]
+            payload = {
+                "create": [{"title": "Batch", "complete": True}],
+                "update": [{"id": first.id, "title": "Done", "complete": True}],
+                "delete": [second.id],
+            }
+            response = self.client.post(
+                reverse("api_task_batch"),
+                json.dumps(payload),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            later = timezone.now() + datetime.timedelta(days=1)
+            archive.archive_tasks(after_days=0, now=later)
+        recount.assert_not_called()
+        self.assertExact()
+        Task.objects.all().bulk_delete()
+        self.assertEqual(counters.list_summary(None), (0, 0))
+        self.assertExact()
@@ -1,10 +1,26 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, changes, metrics, profiling, views
 
+# TASKS_VIEWS_MODE = "async" : vues async (serveur ASGI, voir todo/asgi.py)
+if settings.TASKS_VIEWS_MODE == "async":
+    html_views, api_views = async_views, async_views
+else:
+    html_views, api_views = views, api
 
 urlpatterns = [
-    path("", views.index, name="list"),
-    path("update_task/<str:pk>/", views.updateTask, name="update_task"),
-    path("delete_task/<str:pk>/", views.deleteTask, name="delete"),
+    path("", html_views.index, name="list"),
+    path("update_task/<str:pk>/", html_views.updateTask, name="update_task"),
+    path("delete_task/<str:pk>/", html_views.deleteTask, name="delete"),
+    path("move_task/<int:pk>/", views.moveTask, name="move_task"),
+    path("bulk/", views.bulkTasks, name="bulk"),
+    path("export/", views.exportTasks, name="export"),
+    path("archive/", views.archiveTasks, name="archive"),
+    path("events/", changes.task_events, name="task_events"),
+    path("api/tasks/", api_views.task_list, name="api_task_list"),
+    path("api/tasks/batch/", api.task_batch, name="api_task_batch"),
+    path("api/tasks/<int:pk>/", api_views.task_detail, name="api_task_detail"),
+    path("_profiling/", profiling.profiling_stats, name="profiling"),
+    path("metrics", metrics.metrics_view, name="metrics"),
 ]
@@ -1,8 +1,83 @@
+import csv
+import itertools
 import json
+import zlib
 from pathlib import Path
-from typing import Optional
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
 
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from tasks.counters import counts_of
+from tasks.datasets import NDJSON_SUFFIXES, iter_dataset_items
 from tasks.models import Task
+from tasks.shards import read_db, task_shards
+from tasks.signals import tasks_bulk_changed
+
+# Nombre de lignes insérées par INSERT groupé / transaction
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+
+def default_dataset_path() -> Path:
+    # dataset.json à la racine du projet
+    base_dir = Path(__file__).resolve().parent.parent
+    return base_dir / "dataset.json"
+
+
+def import_tasks_streaming(
+    dataset_path: Path,
+    batch_size: int = DEFAULT_IMPORT_BATCH_SIZE,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Importe un dataset en flux : les tâches sont regroupées par lots de
+    ``batch_size`` et chaque lot est inséré avec un seul ``bulk_create``
+    dans sa propre transaction.
+    ``on_batch`` est appelé après chaque lot avec le total déjà importé.
+    Retourne le nombre de tâches créées.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size doit être >= 1")
+
+    created_count = 0
+    batch = []
+
+    def flush():
+        nonlocal created_count
+        with transaction.atomic():
+            Task.objects.bulk_create(batch, batch_size=batch_size)
+            tasks_bulk_changed.send(
+                sender=Task,
+                op="import",
+                count=len(batch),
+                counts=counts_of(batch, DEFAULT_DB_ALIAS),
+            )
+        created_count += len(batch)
+        batch.clear()
+        if on_batch is not None:
+            on_batch(created_count)
+
+    for item in iter_dataset_items(dataset_path):
+        batch.append(
+            Task(
+                title=item["title"],
+                complete=bool(item.get("complete", False)),
+            )
+        )
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return created_count
 
 
 def import_tasks_from_dataset(dataset_path: Optional[Path] = None) -> int:
@@ -11,19 +86,162 @@ def import_tasks_from_dataset(dataset_path: Optional[Path] = None) -> int:
     Retourne le nombre de tâches créées.
     """
     if dataset_path is None:
-        # dataset.json à la racine du projet
-        base_dir = Path(__file__).resolve().parent.parent
-        dataset_path = base_dir / "dataset.json"
+        dataset_path = default_dataset_path()
 
-    with dataset_path.open(encoding="utf-8") as f:
-        data = json.load(f)
+    return import_tasks_streaming(Path(dataset_path))
 
-    created_count = 0
-    for item in data:
-        Task.objects.create(
-            title=item["title"],
-            complete=bool(item.get("complete", False)),
+
+# --- Export ---------------------------------------------------------------
+
+# Formats d'export et leur type MIME
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Champs exportés : ceux de dataset.json, l'export se réimporte tel quel
+EXPORT_FIELDS = ("title", "complete")
+
+# Lignes lues par aller-retour avec la base (QuerySet.iterator)
+DEFAULT_EXPORT_CHUNK_SIZE = 2000
+
+# Taille des blocs produits (avant compression)
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+
+def export_format_for(path: Path) -> Tuple[Optional[str], bool]:
+    """Format et compression déduits de l'extension (``tasks.csv.gz``...)."""
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    compress = bool(suffixes) and suffixes[-1] == ".gz"
+    if compress:
+        suffixes.pop()
+    if not suffixes:
+        return None, compress
+    if suffixes[-1] in NDJSON_SUFFIXES:
+        return "ndjson", compress
+    return {".json": "json", ".csv": "csv"}.get(suffixes[-1]), compress
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer retourne la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def _encode(rows: Iterable[tuple], fmt: str) -> Iterator[str]:
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for title, complete in rows:
+            yield writer.writerow((title, "true" if complete else "false"))
+    elif fmt == "ndjson":
+        for title, complete in rows:
+            title = json.dumps(title, ensure_ascii=False)
+            complete = "true" if complete else "false"
+            yield f'{{"title": {title}, "complete": {complete}}}\n'
+    elif fmt == "json":
+        # Même mise en forme que dataset.json (json.dumps(..., indent=2)),
+        # écrite directement : plusieurs fois plus rapide
+        yield "["
+        separator = "\n"
+        for title, complete in rows:
+            title = json.dumps(title, ensure_ascii=False)
+            complete = "true" if complete else "false"
+            yield (
+                f'{separator}  {{\n    "title": {title},\n'
+                f'    "complete": {complete}\n  }}'
+            )
+            separator = ",\n"
+        yield "\n]\n"
+    else:
+        raise ValueError(f"Format d'export inconnu : {fmt!r}")
+
+
+def _blocks(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Regroupe les morceaux en blocs d'environ ``EXPORT_BLOCK_SIZE`` octets."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_BLOCK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _gzip(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 : en-tête et CRC gzip (fichier .gz lisible par gunzip)
+    compressor = zlib.compressobj(wbits=31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_rows(queryset=None, chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE):
+    """
+    Lignes à exporter, lues par paquets de ``chunk_size`` (par id). Sans
+    ``queryset`` : les tâches de tous les shards, un shard après l'autre.
+    """
+    if queryset is None:
+        return itertools.chain.from_iterable(
+            export_rows(Task.objects.using(read_db(alias)), chunk_size)
+            for alias in task_shards()
         )
-        created_count += 1
+    rows = queryset.order_by("id").values_list(*EXPORT_FIELDS)
+    return rows.iterator(chunk_size=chunk_size)
 
-    return created_count
+
+def iter_export(
+    fmt: str = "json",
+    compress: bool = False,
+    rows: Optional[Iterable[tuple]] = None,
+) -> Iterator[bytes]:
+    """
+    Export des tâches en blocs d'octets, au fil de la lecture de la base :
+    la mémoire utilisée ne dépend pas de la taille de la table.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt!r}")
+    if rows is None:
+        rows = export_rows()
+    blocks = _blocks(_encode(rows, fmt))
+    return _gzip(blocks) if compress else blocks
+
+
+def export_tasks(
+    out: BinaryIO,
+    fmt: str = "json",
+    compress: bool = False,
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+) -> int:
+    """Écrit l'export dans ``out`` (binaire). Retourne le nombre de tâches."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in export_rows(chunk_size=chunk_size):
+            count += 1
+            yield row
+
+    for block in iter_export(fmt, compress, counted()):
+        out.write(block)
+    return count
+
+
+async def aiter_sync(iterator: Iterator) -> AsyncIterator:
+    """
+    Consomme un itérateur synchrone (qui lit la base) depuis du code async,
+    un élément à la fois : sous ASGI, StreamingHttpResponse chargerait
+    sinon tout l'itérateur en mémoire avant d'envoyer la réponse.
+    """
+    done = object()
+    while True:
+        item = await sync_to_async(next)(iterator, done)
+        if item is done:
+            return
+        yield item
@@ -1,46 +1,308 @@
 from django.conf import settings
-from django.shortcuts import redirect, render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition, require_GET, require_POST
 
+from .cache import cached_fragment
+from .changes import latest_seq
+from .counters import list_summary
 from .forms import TaskForm
 from .models import Task
+from .pagination import InvalidCursor, KeysetPaginator
+from .replicas import snapshot_stamp
+from .search import search_tasks
+from .shards import (
+    assign_list,
+    current_list,
+    list_archive,
+    list_tasks,
+    read_db,
+    shard_for,
+)
+from .utils import EXPORT_FORMATS, aiter_sync, export_rows, iter_export
+from .writebehind import save_task
+
+# Ordre d'affichage de la liste, aussi utilisé comme clé de pagination
+LIST_ORDERING = tuple(Task._meta.ordering)
+
+
+def list_paginator(queryset):
+    return KeysetPaginator(
+        queryset, ordering=LIST_ORDERING, per_page=settings.TASKS_PAGE_SIZE
+    )
+
+
+def paginate_tasks(request, paginator):
+    try:
+        return paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Curseur de pagination invalide")
+
+
+def list_read_db(request):
+    """
+    Base lue pour la liste de la requête (une réplique possible), choisie
+    une seule fois : le fragment rendu et l'ETag désignent la même base.
+    """
+    if not hasattr(request, "_tasks_read_db"):
+        request._tasks_read_db = read_db(shard_for(current_list(request)))
+    return request._tasks_read_db
+
+
+def list_seq(request) -> int:
+    """
+    Position du journal des modifications (tasks.changes) de la base lue
+    pour la liste, lue une seule fois par requête : ETag et fragment rendu
+    désignent le même état.
+    """
+    if not hasattr(request, "_tasks_list_seq"):
+        request._tasks_list_seq = latest_seq(list_read_db(request))
+    return request._tasks_list_seq
+
+
+def list_variant(request):
+    """Ce qui distingue deux pages de liste à une même position du journal."""
+    task_list = current_list(request)
+    using = list_read_db(request)
+    # Une réplique en retard ne sert que ses propres fragments, jusqu'à sa
+    # prochaine synchronisation
+    return "{}:{}@{}:{}:{}:{}".format(
+        task_list.id if task_list is not None else "public",
+        using,
+        snapshot_stamp(using),
+        settings.TASKS_PAGE_SIZE,
+        request.GET.get("cursor", ""),
+        request.GET.get("q", "").strip(),
+    )
+
+
+def task_list_html(request, tasks, page, seq=None, summary=None):
+    # ``seq`` : position du journal des modifications (tasks.changes) à
+    # partir de laquelle la page suit les mises à jour en direct ;
+    # ``summary`` : compteurs de la liste (tasks.counters)
+    html = render_to_string(
+        "tasks/_task_list.html",
+        {"tasks": tasks, "page": page, "seq": seq, "summary": summary},
+        request=request,
+    )
+    return mark_safe(html)
+
+
+def render_task_list(request):
+    """
+    Fragment HTML de la page de liste demandée, servi depuis le cache tant
+    que le journal des modifications de sa base n'a pas avancé (une seule
+    requête SQL dans ce cas, celle de ``list_seq``).
+    """
+    query = request.GET.get("q", "").strip()
+    task_list = current_list(request)
+
+    def render():
+        using = list_read_db(request)
+        if query:
+            # Résultats de recherche classés par pertinence, sans pagination
+            tasks = search_tasks(
+                query, limit=settings.TASKS_PAGE_SIZE, using=using, task_list=task_list
+            )
+            return task_list_html(request, tasks, None)
+        # Lu avant la page : une écriture entre les deux sera rejouée
+        seq = list_seq(request)
+        page = paginate_tasks(request, list_paginator(list_tasks(task_list, using)))
+        summary = list_summary(task_list, using)
+        return task_list_html(request, page, page, seq, summary)
+
+    html = cached_fragment(list_seq(request), list_variant(request), render)
+    return mark_safe(html)
+
+
+def wants_fragment(request):
+    """
+    Requête de l'amélioration progressive de ``list.html`` (en-tête
+    ``HX-Request``, comme htmx) : après une écriture, on répond par la
+    ligne concernée ou un 204 au lieu d'une redirection vers la liste.
+    """
+    return request.headers.get("HX-Request") == "true"
+
+
+def task_row(request, task, status=200):
+    return render(request, "tasks/_task_row.html", {"task": task}, status=status)
+
+
+def list_etag(request, *args, **kwargs):
+    """
+    Validateur de la page de liste : la position du journal des
+    modifications de la base lue, en une requête sur sa clé primaire. Le
+    journal est écrit avec les tâches (triggers sur SQLite), il suit donc
+    aussi les écritures des autres processus (commandes, autres workers).
+    Faible (W/) car le jeton CSRF du formulaire change à chaque rendu sans
+    changer le sens de la page. Pas de Last-Modified : le journal ne date
+    pas ses entrées.
+    """
+    return f'W/"{settings.VERSION}-{list_seq(request)}-{list_variant(request)}"'
+
+
+def task_etag(request, pk):
+    # Toute écriture avance le journal : valide aussi pour une seule tâche
+    return f'W/"{settings.VERSION}-{list_seq(request)}-task-{pk}"'
 
 
 # Create your views here.
+@condition(etag_func=list_etag)
 def index(request):
-    tasks = Task.objects.all()
     form = TaskForm()
 
     if request.method == "POST":
         form = TaskForm(request.POST)
         if form.is_valid():
             # adds to the database if valid
-            form.save()
+            task = form.save(commit=False)
+            using = assign_list(task, current_list(request))
+            task = save_task(task, using)
+            if wants_fragment(request):
+                return task_row(request, task, status=201)
             return redirect("/")
+        if wants_fragment(request):
+            return HttpResponseBadRequest(form.errors.as_text())
 
-    context = {"tasks": tasks, "form": form, "Version": settings.VERSION}
+    context = {
+        "task_list": render_task_list(request),
+        "form": form,
+        "query": request.GET.get("q", ""),
+        "Version": settings.VERSION,
+    }
     return render(request, "tasks/list.html", context)
 
 
+@condition(etag_func=task_etag)
 def updateTask(request, pk):
-    task = Task.objects.get(id=pk)
+    task = get_object_or_404(list_tasks(current_list(request)), id=pk)
     form = TaskForm(instance=task)
 
     if request.method == "POST":
         form = TaskForm(request.POST, instance=task)
         if form.is_valid():
-            form.save()
+            using = shard_for(current_list(request))
+            task = save_task(form.save(commit=False), using)
+            if wants_fragment(request):
+                return task_row(request, task)
             return redirect("/")
+        if wants_fragment(request):
+            return HttpResponseBadRequest(form.errors.as_text())
 
     context = {"form": form}
     return render(request, "tasks/update_task.html", context)
 
 
+@condition(etag_func=task_etag)
 def deleteTask(request, pk):
-    item = Task.objects.get(id=pk)
+    item = get_object_or_404(list_tasks(current_list(request)), id=pk)
 
     if request.method == "POST":
         item.delete()
+        if wants_fragment(request):
+            return HttpResponse(status=204)
         return redirect("/")
 
     context = {"item": item}
     return render(request, "tasks/delete.html", context)
+
+
+@require_POST
+def bulkTasks(request):
+    """
+    Actions groupées du formulaire de la liste, chacune en une seule
+    requête SQL (``UPDATE`` / ``DELETE ... WHERE``) quel que soit le nombre
+    de tâches concernées.
+    """
+    action = request.POST.get("action")
+    ids = []
+    for pk in request.POST.getlist("ids"):
+        # Identifiant invalide (formulaire forgé) : ignoré comme inconnu
+        try:
+            ids.append(int(pk))
+        except ValueError:
+            continue
+    tasks = list_tasks(current_list(request))
+    selected = tasks.filter(id__in=ids)
+
+    if action == "complete_selected":
+        selected.bulk_complete()
+    elif action == "complete_all":
+        tasks.bulk_complete()
+    elif action == "delete_selected":
+        selected.bulk_delete()
+    elif action == "delete_completed":
+        tasks.filter(complete=True).bulk_delete()
+    else:
+        return HttpResponseBadRequest("Action inconnue")
+    return redirect("/")
+
+
+@require_POST
+def moveTask(request, pk):
+    """
+    Glisser-déposer : place la tâche juste après la tâche ``after`` (vide :
+    en tête de son groupe de priorité). Seul le rang de la tâche déplacée
+    est écrit.
+    """
+    tasks = list_tasks(current_list(request))
+    task = get_object_or_404(tasks, id=pk)
+    after = request.POST.get("after", "")
+    try:
+        after = int(after) if after else None
+    except ValueError:
+        return HttpResponseBadRequest("Tâche précédente invalide")
+    previous = get_object_or_404(tasks, id=after) if after is not None else None
+    if previous is not None and previous.id == task.id:
+        return HttpResponseBadRequest("Tâche précédente invalide")
+
+    task.move_after(previous)
+    if wants_fragment(request):
+        return task_row(request, task)
+    return redirect("/")
+
+
+@require_GET
+def archiveTasks(request):
+    """Tâches archivées (table froide), dernières archivées d'abord."""
+    archived = list_archive(current_list(request))
+    paginator = KeysetPaginator(
+        archived,
+        ordering=tuple(archived.model._meta.ordering),
+        per_page=settings.TASKS_PAGE_SIZE,
+    )
+    page = paginate_tasks(request, paginator)
+    return render(request, "tasks/archive.html", {"page": page})
+
+
+@require_GET
+def exportTasks(request):
+    """
+    Téléchargement de toutes les tâches (``?format=json|ndjson|csv``,
+    ``&gzip=1``), produit au fil de la lecture de la base.
+    """
+    fmt = request.GET.get("format", "json")
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Format d'export inconnu")
+    compress = request.GET.get("gzip") == "1"
+
+    # Base choisie maintenant : le flux est lu après la sortie des middlewares
+    rows = export_rows(list_tasks(current_list(request)))
+    content = iter_export(fmt, compress, rows)
+    if isinstance(request, ASGIRequest):
+        content = aiter_sync(content)
+    filename = f"tasks.{fmt}" + (".gz" if compress else "")
+    response = StreamingHttpResponse(
+        content,
+        content_type="application/gzip" if compress else EXPORT_FORMATS[fmt],
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,302 @@
+"""
+File d'écriture groupée (write coalescing) pour les créations et mises à
+jour de tâches.
+
+Sur SQLite chaque requête qui écrit paie son propre commit (fsync) et les
+écrivains passent l'un après l'autre. Quand ``TASKS_WRITE_BEHIND["ENABLED"]``
+est vrai, les vues déposent leurs écritures dans une file en mémoire ; un
+thread unique les regroupe et les valide par lots — toutes les
+``MAX_DELAY_MS`` millisecondes ou dès ``MAX_BATCH`` écritures — dans une
+seule transaction (un ``bulk_create`` pour les créations, un
+``bulk_update`` par ensemble de champs pour les mises à jour, suivis de
+``tasks_bulk_changed``). Deux mises à jour d'une même tâche dans un lot
+sont appliquées l'une après l'autre, dans l'ordre de la file : la
+dernière l'emporte.
+
+Durabilité : la requête attend le commit du lot qui contient son écriture
+avant de répondre. Une réponse réussie garantit donc, comme sans la file,
+que la tâche est en base, et le client reçoit l'id attribué (réponse de
+l'API, redirection de la vue HTML). Si le processus meurt avant le commit,
+les requêtes en attente échouent sans avoir été acquittées. Si un lot
+échoue, chaque écriture est rejouée seule, pour qu'une ligne invalide ne
+fasse pas échouer les autres ; une mise à jour qui ne trouve pas sa
+ligne échoue. La file est propre à chaque processus ; un
+lot contenant des tâches de plusieurs shards (tasks.shards) est validé en
+une transaction par base.
+
+Une écriture demandée dans une transaction déjà ouverte (``atomic``, tests
+``TestCase``) est faite directement : le thread d'écriture a sa propre
+connexion, il ne peut pas y participer, et sur SQLite il attendrait le
+verrou de cette transaction.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .counters import counts_changed, counts_of
+from .models import Task
+from .signals import tasks_bulk_changed
+
+
+# Champs d'une mise à jour complète : ceux que save() écrit
+UPDATE_FIELDS = tuple(
+    f.name for f in Task._meta.concrete_fields if not f.primary_key
+)
+
+
+class WriteBehindTimeout(Exception):
+    """Le lot contenant l'écriture n'a pas été validé à temps."""
+
+
+@dataclass
+class PendingWrite:
+    instance: Task
+    using: str = DEFAULT_DB_ALIAS
+    # Champs enregistrés par une mise à jour, None : tous (comme save())
+    update_fields: Optional[Tuple[str, ...]] = None
+    future: Future = field(default_factory=Future)
+    # Création (pk None au dépôt) : bulk_create lui donne un pk, à retirer
+    # si la transaction du lot est annulée
+    create: bool = field(init=False)
+
+    def __post_init__(self):
+        self.create = self.instance.pk is None
+
+    def reset(self):
+        """Remet une création dans son état de dépôt, avant de la rejouer."""
+        if self.create:
+            self.instance.pk = None
+            self.instance._state.adding = True
+
+
+class WriteBehindQueue:
+    def __init__(self, max_batch=200, max_delay_ms=10, autostart=True):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.autostart = autostart
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    # --- Côté requêtes ------------------------------------------------
+
+    def submit(
+        self, instance: Task, using: str = DEFAULT_DB_ALIAS, update_fields=None
+    ) -> Future:
+        """Dépose une tâche à créer (pk None) ou à mettre à jour sur ``using``."""
+        if update_fields is not None:
+            update_fields = tuple(update_fields)
+        write = PendingWrite(instance, using, update_fields)
+        self._queue.put(write)
+        if self.autostart:
+            self.start()
+        return write.future
+
+    # --- Côté thread d'écriture --------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="tasks-write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _collect(self, block: bool):
+        """Attend la première écriture puis regroupe jusqu'au lot ou délai."""
+        try:
+            if block:
+                first = self._queue.get(timeout=0.1)
+            else:
+                first = self._queue.get_nowait()
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._collect(block=True)
+                if batch:
+                    self._commit(batch)
+        finally:
+            # Connexions propres à ce thread
+            connections.close_all()
+
+    def flush(self) -> int:
+        """Valide immédiatement tout ce qui est en attente (thread courant)."""
+        written = 0
+        while True:
+            batch = self._collect(block=False)
+            if not batch:
+                return written
+            self._commit(batch)
+            written += len(batch)
+
+    def _commit(self, batch):
+        by_db = {}
+        for write in batch:
+            by_db.setdefault(write.using, []).append(write)
+        for using, writes in by_db.items():
+            try:
+                self._write(writes, using)
+            except Exception:
+                # Rejoue chaque écriture seule pour isoler celle qui échoue
+                for write in writes:
+                    write.reset()
+                for write in writes:
+                    try:
+                        self._write([write], using)
+                    except Exception as exc:
+                        write.reset()
+                        _resolve(write.future, exception=exc)
+                    else:
+                        _resolve(write.future, result=write.instance.pk)
+            else:
+                for write in writes:
+                    _resolve(write.future, result=write.instance.pk)
+
+    def _write(self, writes, using):
+        with transaction.atomic(using=using):
+            for round_ in _rounds(writes):
+                self._write_round(round_, using)
+
+    def _write_round(self, writes, using):
+        creates = [w.instance for w in writes if w.create]
+        updates = {}
+        for write in writes:
+            if not write.create:
+                fields = write.update_fields or UPDATE_FIELDS
+                updates.setdefault(fields, []).append(write.instance)
+        if creates:
+            Task.objects.using(using).bulk_create(creates)
+            tasks_bulk_changed.send(
+                sender=Task,
+                op="create",
+                count=len(creates),
+                using=using,
+                counts=counts_of(creates, using),
+            )
+        for fields, tasks in updates.items():
+            counts = counts_changed(tasks, using)
+            if Task.objects.using(using).bulk_update(tasks, fields) < len(tasks):
+                raise Task.DoesNotExist("Tâche à mettre à jour introuvable")
+            tasks_bulk_changed.send(
+                sender=Task,
+                op="update",
+                count=len(tasks),
+                using=using,
+                counts=counts,
+            )
+
+
+def _rounds(writes):
+    """
+    Découpe les écritures d'une base en tours sans deux mises à jour de la
+    même tâche : un ``bulk_update`` n'appliquerait que la première.
+    """
+    rounds = [[]]
+    seen = set()
+    for write in writes:
+        if not write.create:
+            if write.instance.pk in seen:
+                rounds.append([])
+                seen = set()
+            seen.add(write.instance.pk)
+        rounds[-1].append(write)
+    return rounds
+
+
+def _resolve(future, result=None, exception=None):
+    # Le demandeur a pu abandonner (timeout async) : l'écriture reste validée
+    if future.cancelled():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def write_behind_enabled() -> bool:
+    return settings.TASKS_WRITE_BEHIND.get("ENABLED", False)
+
+
+def get_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            config = settings.TASKS_WRITE_BEHIND
+            _queue = WriteBehindQueue(
+                max_batch=config.get("MAX_BATCH", 200),
+                max_delay_ms=config.get("MAX_DELAY_MS", 10),
+            )
+        return _queue
+
+
+def _in_transaction(using) -> bool:
+    return transaction.get_connection(using).in_atomic_block
+
+
+def save_task(task: Task, using: str = DEFAULT_DB_ALIAS, update_fields=None) -> Task:
+    """
+    Enregistre ``task`` sur ``using`` directement, ou via la file
+    d'écriture groupée si elle est activée (en attendant le commit du lot).
+    """
+    if not write_behind_enabled() or _in_transaction(using):
+        task.save(using=using, update_fields=update_fields)
+        return task
+    future = get_queue().submit(task, using, update_fields)
+    try:
+        future.result(timeout=settings.TASKS_WRITE_BEHIND.get("TIMEOUT", 10))
+    except FutureTimeoutError as exc:
+        raise WriteBehindTimeout(task) from exc
+    return task
+
+
+async def asave_task(
+    task: Task, using: str = DEFAULT_DB_ALIAS, update_fields=None
+) -> Task:
+    """Variante async de ``save_task`` : attend le lot sans bloquer la boucle."""
+    if not write_behind_enabled() or await sync_to_async(_in_transaction)(using):
+        await task.asave(using=using, update_fields=update_fields)
+        return task
+    future = get_queue().submit(task, using, update_fields)
+    timeout = settings.TASKS_WRITE_BEHIND.get("TIMEOUT", 10)
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError as exc:
+        raise WriteBehindTimeout(task) from exc
+    return task
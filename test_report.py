@@ -1,12 +1,23 @@
+import argparse
 import json
+from collections import Counter
 from pathlib import Path
 
 import yaml  # nécessite pyyaml
 
+from tasks.datasets import iter_dataset_items
+
 
 BASE_DIR = Path(__file__).resolve().parent
 TEST_LIST_PATH = BASE_DIR / "test_list.yaml"
 RESULT_AUTO_PATH = BASE_DIR / "result_test_auto.json"
+RESULT_SELENIUM_PATH = BASE_DIR / "result_test_selenium.json"
+REPORT_PATH = BASE_DIR / "test_report.json"
+# Index des fichiers de résultats déjà lus (mode incrémental)
+CACHE_PATH = BASE_DIR / ".cache" / "test_report.json"
+
+# Fichiers de résultats lus par défaut (tests Django + tests Selenium)
+RESULT_PATHS = [RESULT_AUTO_PATH, RESULT_SELENIUM_PATH]
 
 
 def load_test_list():
@@ -15,19 +26,78 @@ def load_test_list():
     return data.get("tests", [])
 
 
-def load_auto_results():
-    if not RESULT_AUTO_PATH.exists():
-        return []
-    with RESULT_AUTO_PATH.open(encoding="utf-8") as f:
-        return json.load(f)
+def iter_results(path: Path):
+    """
+    Parcourt un fichier de résultats (tableau JSON, ou un objet par ligne)
+    résultat par résultat, sans le charger entièrement en mémoire.
+    """
+    if path.exists():
+        yield from iter_dataset_items(path)
+
+
+def index_results(results):
+    """
+    Index ``test_case_id -> Counter des statuts``, construit en un seul
+    passage : seuls les statuts servent au calcul, les résultats eux-mêmes
+    ne sont pas conservés.
+    """
+    index = {}
+    for result in results:
+        tc_id = result.get("test_case_id")
+        if tc_id is None:
+            continue
+        index.setdefault(tc_id, Counter())[result["status"]] += 1
+    return index
 
 
-def compute_status_for_test(test_case, auto_results):
+def index_result_files(paths=None, cache=None):
+    """
+    Index de tous les fichiers de résultats. Avec ``cache`` (mode
+    incrémental : chemin -> taille, date et index du fichier), un fichier
+    inchangé depuis sa dernière lecture n'est pas relu ; ``cache`` est mis
+    à jour. Retourne (index, nombre de fichiers lus).
+    """
+    index = {}
+    read = 0
+    for path in paths or RESULT_PATHS:
+        path = Path(path)
+        if not path.exists():
+            continue
+        stat = path.stat()
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        entry = cache.get(str(path)) if cache is not None else None
+        if entry is None or entry["stamp"] != stamp:
+            entry = {"stamp": stamp, "index": index_results(iter_results(path))}
+            read += 1
+            if cache is not None:
+                cache[str(path)] = entry
+        for tc_id, statuses in entry["index"].items():
+            index.setdefault(tc_id, Counter()).update(statuses)
+    return index, read
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with Path(path).open(encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+
+def compute_status_for_test(test_case, results_index):
     """
     Détermine le statut global du cas de test (PASS/FAIL/NOT_IMPLEMENTED/MANUAL_ONLY)
     en fonction :
     - du type (auto / manuel)
-    - des résultats JSON (pour les auto uniquement)
+    - des résultats JSON (pour les auto uniquement), indexés par
+      ``index_results``
     """
 
     tc_id = test_case["id"]
@@ -37,39 +107,70 @@ def compute_status_for_test(test_case, auto_results):
     if tc_type in ("manuel", "manual"):
         return "MANUAL_ONLY"
 
-    # Tests auto : on regarde dans result_test_auto.json
-    matching_results = [
-        r for r in auto_results if r.get("test_case_id") == tc_id
-    ]
+    # Tests auto : on regarde les résultats de ce cas dans l'index
+    statuses = results_index.get(tc_id)
 
-    if not matching_results:
+    if not statuses:
         return "NOT_IMPLEMENTED"
 
     # S'il y a au moins un failed/error -> FAIL
-    if any(r["status"] in {"failed", "error"} for r in matching_results):
+    if statuses["failed"] or statuses["error"]:
         return "FAIL"
 
     # S'il y a au moins un skipped et aucun failed/error -> SKIPPED
-    if any(r["status"] == "skipped" for r in matching_results):
+    if statuses["skipped"]:
         return "SKIPPED"
 
     # Si tous sont passed -> PASS
-    if all(r["status"] == "passed" for r in matching_results):
+    if set(statuses) == {"passed"}:
         return "PASS"
 
     # Cas par défaut de sécurité
     return "UNKNOWN"
 
 
+def build_row(test_case, results_index):
+    """Ligne du rapport pour ``test_case``."""
+    return {
+        "id": test_case["id"],
+        "type": test_case["type"],
+        "description": test_case.get("description", ""),
+        "results": dict(sorted(results_index.get(test_case["id"], {}).items())),
+        "status": compute_status_for_test(test_case, results_index),
+    }
+
+
 def percentage(part, total):
     if total == 0:
         return 0.0
     return round(part * 100.0 / total, 1)
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rapport des cas de test.")
+    parser.add_argument(
+        "results",
+        nargs="*",
+        type=Path,
+        help="Fichiers de résultats JSON (défaut : tests auto + Selenium).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Ne relit que les fichiers de résultats modifiés depuis le "
+        "rapport précédent (index mis en cache dans .cache/).",
+    )
+    parser.add_argument("--output", type=Path, default=REPORT_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     test_list = load_test_list()
-    auto_results = load_auto_results()
+    cache = load_cache() if args.incremental else None
+    results_index, files_read = index_result_files(args.results, cache)
+    if cache is not None:
+        save_cache(cache)
 
     total = len(test_list)
 
@@ -84,13 +185,8 @@ def main():
     }
 
     for tc in test_list:
-        status = compute_status_for_test(tc, auto_results)
-        row = {
-            "id": tc["id"],
-            "type": tc["type"],
-            "description": tc.get("description", ""),
-            "status": status,
-        }
+        row = build_row(tc, results_index)
+        status = row["status"]
         report_rows.append(row)
         if status in status_counts:
             status_counts[status] += 1
@@ -149,8 +245,11 @@ def main():
         f"({percentage(passed_plus_manual, total)}%)"
     )
 
+    if args.incremental:
+        print(f"Fichiers de résultats relus : {files_read}")
+
     # Export JSON détaillé (optionnel mais pratique)
-    output_path = BASE_DIR / "test_report.json"
+    output_path = args.output
     with output_path.open("w", encoding="utf-8") as f:
         json.dump(report_rows, f, indent=2, ensure_ascii=False)
 
@@ -1,3 +1,6 @@
+import os
+from pathlib import Path
+
 VERSION = "1.2.0"
 """
 Django settings for todo project.
@@ -11,8 +14,6 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
-from pathlib import Path
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,9 +43,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Retiré de la chaîne au démarrage si TASKS_PROFILING['ENABLED'] est faux
+    'tasks.profiling.ProfilingMiddleware',
+    'tasks.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Retiré de la chaîne au démarrage si aucune réplique n'est configurée
+    'tasks.replicas.ReplicaMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -79,7 +85,93 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexions réutilisées entre requêtes, vérifiées avant réemploi
+        'CONN_MAX_AGE': int(os.environ.get('TODO_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Attente (s) du verrou d'écriture avant « database is locked »
+            'timeout': 20,
+        },
+    }
+}
+
+# Répliques de lecture (voir tasks/replicas.py) : TODO_REPLICAS=N déclare N
+# copies de la base (db.replicaN.sqlite3), rafraîchies par
+# `manage.py sync_replica --every 1`. Les lectures des requêtes GET y sont
+# envoyées tant que leur retard ne dépasse pas MAX_LAG_SECONDS ; un client
+# reste sur la base principale STICKY_SECONDS s après une écriture.
+TASKS_REPLICAS = {
+    'ALIASES': [
+        f'replica{n}' for n in range(1, int(os.environ.get('TODO_REPLICAS', 0)) + 1)
+    ],
+    'MAX_LAG_SECONDS': 5.0,
+    'STICKY_SECONDS': 10,
+    'CHECK_INTERVAL': 1.0,
+}
+
+for alias in TASKS_REPLICAS['ALIASES']:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        # En test, les lectures « réplique » passent par la base de test
+        'TEST': {'MIRROR': 'default'},
     }
+
+# Listes de tâches réparties entre plusieurs bases (voir tasks/shards.py) :
+# TODO_SHARDS=N ajoute N-1 bases (db.shardN.sqlite3) à la base principale.
+# Chaque base reçoit les migrations : `migrate --database shardN`.
+TASK_SHARDS = ['default'] + [
+    f'shard{n}' for n in range(2, int(os.environ.get('TODO_SHARDS', 1)) + 1)
+]
+
+for alias in TASK_SHARDS[1:]:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+    }
+
+DATABASE_ROUTERS = ['tasks.shards.ShardRouter', 'tasks.replicas.ReplicaRouter']
+
+# PRAGMA appliqués à chaque connexion SQLite (voir tasks/db.py).
+# Lancer `python manage.py bench_sqlite` pour comparer les profils.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,
+        'cache_size': -32000,  # en KiB, soit ~32 Mo
+        'mmap_size': 268435456,  # 256 Mo
+        'temp_store': 'MEMORY',
+    },
+}
+
+SQLITE_PROFILE = os.environ.get('TODO_SQLITE_PROFILE', 'production')
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Choix du backend via TODO_CACHE_BACKEND : locmem (défaut, par processus),
+# file (partagé entre workers d'une même machine) ou redis (tout serveur
+# compatible Redis, par ex. lancé en local).
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('TODO_CACHE_DIR', BASE_DIR / '.cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('TODO_REDIS_URL', 'redis://127.0.0.1:6379'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('TODO_CACHE_BACKEND', 'locmem')],
 }
 
 
@@ -125,3 +217,72 @@ STATIC_URL = '/static/'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Tasks app
+
+# Nombre de tâches affichées par page sur la liste (pagination par curseur)
+TASKS_PAGE_SIZE = 50
+
+# Nombre maximal d'opérations acceptées par /api/tasks/batch/
+TASKS_API_MAX_BATCH = 1000
+
+# Alias de CACHES utilisé pour le fragment de liste et sa durée de vie (s)
+TASKS_CACHE_ALIAS = 'default'
+TASKS_LIST_CACHE_TIMEOUT = 300
+
+# "sync" (WSGI) ou "async" (vues async, à servir via todo.asgi)
+TASKS_VIEWS_MODE = os.environ.get('TASKS_VIEWS_MODE', 'sync')
+
+# Écritures groupées (voir tasks/writebehind.py) : les créations et mises
+# à jour sont validées par lots de MAX_BATCH ou toutes les MAX_DELAY_MS ms.
+# La requête attend le commit de son lot (au plus TIMEOUT secondes).
+TASKS_WRITE_BEHIND = {
+    'ENABLED': os.environ.get('TODO_WRITE_BEHIND') == '1',
+    'MAX_BATCH': 200,
+    'MAX_DELAY_MS': 10,
+    'TIMEOUT': 10,
+}
+
+# Profilage des requêtes (voir tasks/profiling.py) : en-tête Server-Timing et
+# agrégats par vue sur /_profiling/. CPROFILE garde le profil des requêtes
+# de plus de SLOW_MS ms (les KEEP_PROFILES dernières).
+TASKS_PROFILING = {
+    'ENABLED': os.environ.get('TODO_PROFILING') == '1',
+    'SERVER_TIMING': True,
+    'CPROFILE': os.environ.get('TODO_PROFILING_CPROFILE') == '1',
+    'SLOW_MS': 200,
+    'KEEP_PROFILES': 20,
+}
+
+# Flux SSE des modifications de tâches (voir tasks/changes.py) sur /events/ :
+# journal relu toutes les POLL_INTERVAL s, rechargement de la page au-delà
+# de BATCH modifications de retard, reconnexion après MAX_STREAM_SECONDS s.
+TASKS_EVENTS = {
+    'POLL_INTERVAL': 1.0,
+    'BATCH': 200,
+    'MAX_STREAM_SECONDS': 300,
+    'RETRY_MS': 3000,
+}
+
+# Archivage des tâches terminées (voir tasks/archive.py) : celles créées il y
+# a plus de AFTER_DAYS jours passent dans la table d'archive, par lots de
+# BATCH_SIZE, via `manage.py archive_tasks` (--every pour le relancer).
+TASKS_ARCHIVE = {
+    'AFTER_DAYS': 30,
+    'BATCH_SIZE': 500,
+}
+
+# Métriques Prometheus (voir tasks/metrics.py) sur /metrics. Avec plusieurs
+# workers (gunicorn), DIR doit être un répertoire partagé par les workers et
+# vidé au démarrage : chaque processus y tient ses compteurs (fichier mmap).
+# Désactivées par défaut ; /metrics ne répond qu'aux adresses (ou réseaux)
+# de ALLOWED_IPS, séparées par des virgules dans TODO_METRICS_ALLOWED_IPS,
+# et au staff.
+TASKS_METRICS = {
+    'ENABLED': os.environ.get('TODO_METRICS') == '1',
+    'DIR': os.environ.get('TODO_METRICS_DIR'),
+    'ALLOWED_IPS': os.environ.get(
+        'TODO_METRICS_ALLOWED_IPS', '127.0.0.1,::1'
+    ).split(','),
+}